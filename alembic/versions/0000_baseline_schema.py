@@ -0,0 +1,107 @@
+"""Baseline schema: users, tasks, chats, questionnaires and MBTI personas
+
+Revision ID: 0000
+Revises: 
+Create Date: 2026-10-19 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0000'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def timestamps():
+    return [
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    # IF NOT EXISTS throughout, so databases created by init_db.py can be upgraded too
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("email", sa.String(255), nullable=False, unique=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        *timestamps(),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "tasks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("is_completed", sa.Boolean(), nullable=True),
+        sa.Column("priority", sa.Integer(), nullable=True),
+        *timestamps(),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "chat_histories",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("messages", sa.Text(), nullable=True),
+        sa.Column("model_used", sa.String(100), nullable=True),
+        sa.Column("tokens_used", sa.Integer(), nullable=True),
+        *timestamps(),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "questions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("question", sa.String(500), nullable=False),
+        *timestamps(),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "answers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), nullable=False),
+        sa.Column("answer", sa.Text(), nullable=False),
+        *timestamps(),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "mbti_types",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("persona_id", sa.String(10), nullable=False, unique=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        *timestamps(),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "user_mbti_types",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("mbti_type_id", sa.Integer(), sa.ForeignKey("mbti_types.id"), nullable=False),
+        *timestamps(),
+        sa.PrimaryKeyConstraint("user_id", "mbti_type_id"),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "chat_styles",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("mbti_type_id", sa.Integer(), sa.ForeignKey("mbti_types.id"), nullable=False),
+        sa.Column("keywords", sa.Text(), nullable=True),
+        sa.Column("temperature", sa.Float(), nullable=False),
+        *timestamps(),
+        if_not_exists=True,
+    )
+    for table in ("tasks", "chat_histories", "questions", "answers", "mbti_types", "chat_styles"):
+        op.create_index(f"ix_{table}_id", table, ["id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    for table in ("chat_styles", "user_mbti_types", "mbti_types", "answers", "questions", "chat_histories", "tasks", "users"):
+        op.drop_table(table)
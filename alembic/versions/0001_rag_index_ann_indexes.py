@@ -0,0 +1,28 @@
+"""ANN and per-user indexes for the rag_index collection
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-19 10:00:00
+
+"""
+from alembic import op
+from app.config import settings
+from rag.ann_index import ann_index_sql, drop_ann_index_statements
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = '0000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The langchain_pg_* tables are created by PGVector on first use; until then this
+    # is a no-op and the indexer builds the indexes when it creates them
+    op.execute(ann_index_sql(settings.RAG_ANN_METHOD, settings.EMBEDDING_DIMENSIONS))
+
+
+def downgrade() -> None:
+    for statement in drop_ann_index_statements():
+        op.execute(statement)
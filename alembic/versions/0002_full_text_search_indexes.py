@@ -0,0 +1,27 @@
+"""GIN full-text indexes for hybrid task and chat retrieval
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 11:00:00
+
+"""
+from alembic import op
+from rag.hybrid import CHAT_DOCUMENT_SQL, TASK_DOCUMENT_SQL, tsvector_sql
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Same expressions as rag.hybrid's queries, so the planner can use them
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_tasks_fts ON tasks USING gin ({tsvector_sql(TASK_DOCUMENT_SQL)})")
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_chat_histories_fts ON chat_histories USING gin ({tsvector_sql(CHAT_DOCUMENT_SQL)})")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_chat_histories_fts")
+    op.execute("DROP INDEX IF EXISTS ix_tasks_fts")
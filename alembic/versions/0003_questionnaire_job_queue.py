@@ -0,0 +1,59 @@
+"""questionnaire_jobs table for the batch pipeline and the online job queue
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def later_columns():
+    """Columns added after the table first shipped; databases created by init_db.py before then lack them."""
+    return [
+        sa.Column("input_file", sa.String(255), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("run_after", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("webhook_url", sa.String(2000), nullable=True),
+        sa.Column("webhook_delivered_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "questionnaire_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("question_answers", sa.Text(), nullable=False),
+        sa.Column("model", sa.String(100), nullable=False),
+        sa.Column("max_tokens", sa.Integer(), nullable=False),
+        sa.Column("temperature", sa.Float(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("batch_id", sa.String(100), nullable=True),
+        sa.Column("prompt", sa.Text(), nullable=True),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("usage", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        *later_columns(),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        if_not_exists=True,
+    )
+    for column in later_columns():
+        op.add_column("questionnaire_jobs", column, if_not_exists=True)
+    for column in ("id", "user_id", "status", "batch_id"):
+        op.create_index(f"ix_questionnaire_jobs_{column}", "questionnaire_jobs", [column], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_table("questionnaire_jobs")
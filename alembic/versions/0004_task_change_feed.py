@@ -0,0 +1,37 @@
+"""Task versions and the task_events log behind the change feed
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("version", sa.Integer(), nullable=False, server_default="1"), if_not_exists=True)
+    op.create_table(
+        "task_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("deleted", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_task_events_user_id_id", "task_events", ["user_id", "id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_events_user_id_id", table_name="task_events")
+    op.drop_table("task_events")
+    op.drop_column("tasks", "version")
@@ -0,0 +1,30 @@
+"""Rolling summary columns on chat_histories
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-20 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("chat_histories", sa.Column("summary", sa.Text(), nullable=True), if_not_exists=True)
+    op.add_column(
+        "chat_histories",
+        sa.Column("summary_message_count", sa.Integer(), nullable=False, server_default="0"),
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("chat_histories", "summary_message_count")
+    op.drop_column("chat_histories", "summary")
@@ -0,0 +1,48 @@
+"""Task start/due times, open-task partial indexes and checkin_nudges
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-20 09:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("start_time", sa.DateTime(timezone=True), nullable=True), if_not_exists=True)
+    op.add_column("tasks", sa.Column("due_at", sa.DateTime(timezone=True), nullable=True), if_not_exists=True)
+    # Partial indexes over open tasks only, used by the check-in scheduler
+    open_tasks = sa.text("is_completed = false")
+    op.create_index("ix_tasks_open_due_at", "tasks", ["due_at", "id"], postgresql_where=open_tasks, if_not_exists=True)
+    op.create_index("ix_tasks_open_start_time", "tasks", ["start_time", "id"], postgresql_where=open_tasks, if_not_exists=True)
+
+    op.create_table(
+        "checkin_nudges",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("kind", sa.String(20), nullable=False),
+        sa.Column("scheduled_for", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("delivered_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("task_id", "kind", "scheduled_for"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_checkin_nudges_id", "checkin_nudges", ["id"], if_not_exists=True)
+    op.create_index("ix_checkin_nudges_user_id", "checkin_nudges", ["user_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_table("checkin_nudges")
+    op.drop_index("ix_tasks_open_start_time", table_name="tasks")
+    op.drop_index("ix_tasks_open_due_at", table_name="tasks")
+    op.drop_column("tasks", "due_at")
+    op.drop_column("tasks", "start_time")
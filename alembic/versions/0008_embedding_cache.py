@@ -0,0 +1,34 @@
+"""embedding_cache table keyed by model and content hash
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-20 09:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "embedding_cache",
+        sa.Column("model", sa.String(100), nullable=False),
+        sa.Column("text_hash", sa.String(64), nullable=False),
+        sa.Column("dtype", sa.String(10), nullable=False),
+        sa.Column("dimensions", sa.Integer(), nullable=False),
+        sa.Column("vector", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("model", "text_hash"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("embedding_cache")
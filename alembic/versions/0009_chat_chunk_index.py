@@ -0,0 +1,32 @@
+"""chat_chunk_index table tracking indexed chat chunks
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-20 09:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_chunk_index",
+        sa.Column("chunk_id", sa.String(100), primary_key=True),
+        sa.Column("chat_id", sa.Integer(), nullable=False),
+        sa.Column("content_hash", sa.String(64), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_chat_chunk_index_chat_id", "chat_chunk_index", ["chat_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_table("chat_chunk_index")
@@ -1,17 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Header, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.schemas import (
     HealthResponse, ErrorResponse, 
     QuestionnaireRequest, QuestionnaireResponse,
+    QuestionnaireJobRequest, JobAccepted, Job,
     Task, TaskCreate, TaskUpdate,
     ChatHistory, ChatHistoryCreate, ChatHistoryUpdate, ChatHistoryUpdateMessages,
     UserMBTIType, UserMBTITypeCreate, UserMBTITypeUpdate
 )
 from app.services.openai_service import get_openai_service, OpenAIService
 from app.services.question_service import get_question_service, QuestionService
-from app.database import get_db
+from app.services.index_outbox import record_index_change
+from app.services.task_events import record_task_event
+from app.services.task_feed import get_task_feed_hub
+from app.services.task_update_service import notify_tasks_changed, task_change
+from app.services.chat_summary_service import get_chat_summary_service, reset_summary_if_rewritten
+from app.services.chat_session import ChatSession
+from app.services.job_queue import enqueue_questionnaire, job_payload, webhook_url_error, workers_available
+from app.services.batch_service import enqueue_batch_questionnaire
+from app.database import get_db, SessionLocal
 from app.config import settings
+from app.deadline import Deadline, DeadlineExceeded
 from app.models.database_models import (
     Task as TaskModel, 
     ChatHistory as ChatHistoryModel,
@@ -19,11 +31,18 @@ from app.models.database_models import (
     Answer as AnswerModel,
     MBTIType as MBTITypeModel,
     UserMBTIType as UserMBTITypeModel,
-    ChatStyle as ChatStyleModel
+    ChatStyle as ChatStyleModel,
+    QuestionnaireJob as QuestionnaireJobModel
 )
 
 router = APIRouter()
 
+def schedule_chat_summary(background_tasks: BackgroundTasks, chat_id: int) -> None:
+    """Refresh a chat's rolling summary after the response is sent, if it has grown enough."""
+    if settings.CHAT_SUMMARY_ENABLED and settings.is_openai_configured:
+        summary_service = get_chat_summary_service(get_openai_service())
+        background_tasks.add_task(summary_service.summarize_if_needed, chat_id)
+
 @router.get("/health", response_model=HealthResponse)
 def health_check():
     """
@@ -47,7 +66,9 @@ def process_questionnaire(
     
     This endpoint takes a user ID and a map of question IDs to answers,
     builds a prompt from the answers, and returns an AI-generated analysis.
+    The whole request, including OpenAI retries, runs within LLM_DEADLINE_SECONDS.
     """
+    deadline = Deadline.after(settings.LLM_DEADLINE_SECONDS)
     try:
         # Get question service
         question_service = get_question_service(openai_service)
@@ -59,7 +80,8 @@ def process_questionnaire(
             model=request.model,
             max_tokens=request.max_tokens,
             temperature=request.temperature,
-            db=db
+            db=db,
+            deadline=deadline
         )
         
         return QuestionnaireResponse(
@@ -70,11 +92,89 @@ def process_questionnaire(
             usage=result["usage"]
         )
         
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Background Job Endpoints
+
+@router.post("/jobs/process-answers", response_model=JobAccepted, status_code=202)
+def queue_questionnaire(
+    request: QuestionnaireJobRequest,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a questionnaire analysis and return at once with the job ID.
+    
+    The analysis runs on the job workers, so it survives the client
+    disconnecting. Poll GET /jobs/{job_id} for the result, or pass a
+    webhook_url to have the finished job POSTed to it.
+    """
+    if not request.question_answers:
+        raise HTTPException(status_code=400, detail="Question answers cannot be empty")
+    if request.webhook_url:
+        error = webhook_url_error(request.webhook_url)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+    if not workers_available():
+        raise HTTPException(status_code=503, detail="No job workers are running")
+    try:
+        job = enqueue_questionnaire(db, request)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error queueing job: {str(e)}")
+    
+    status_url = f"{settings.API_V1_STR}/jobs/{job.id}"
+    response.headers["Location"] = status_url
+    return JobAccepted(job_id=job.id, status=job.status, status_url=status_url)
+
+@router.post("/jobs/process-answers/batch", response_model=JobAccepted, status_code=202)
+def queue_batch_questionnaire(
+    request: QuestionnaireRequest,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a questionnaire analysis for the offline batch pipeline.
+    
+    Batch jobs cost less but finish within BATCH_COMPLETION_WINDOW rather
+    than seconds: they stay pending until run_batch.py submits them. Poll
+    GET /jobs/{job_id} for the result.
+    """
+    if not request.question_answers:
+        raise HTTPException(status_code=400, detail="Question answers cannot be empty")
+    try:
+        job = enqueue_batch_questionnaire(db, request)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error queueing job: {str(e)}")
+    
+    status_url = f"{settings.API_V1_STR}/jobs/{job.id}"
+    response.headers["Location"] = status_url
+    return JobAccepted(job_id=job.id, status=job.status, status_url=status_url)
+
+@router.get("/jobs/{job_id}", response_model=Job)
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Get a job's status and, once it has completed, its result.
+    """
+    try:
+        job = db.query(QuestionnaireJobModel).filter(QuestionnaireJobModel.id == job_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job_payload(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching job: {str(e)}")
+
 # Task Management Endpoints
 
 @router.post("/tasks", response_model=Task)
@@ -91,11 +191,17 @@ def create_task(
             description=task.description,
             user_id=task.user_id,
             priority=task.priority,
+            start_time=task.start_time,
+            due_at=task.due_at,
             is_completed=False
         )
         db.add(db_task)
+        db.flush()
+        record_index_change(db, "task", db_task.id, db_task.user_id)
+        record_task_event(db, task_change(db_task))
         db.commit()
         db.refresh(db_task)
+        notify_tasks_changed([task_change(db_task)])
         return db_task
     except Exception as e:
         db.rollback()
@@ -115,6 +221,46 @@ def list_tasks(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching tasks: {str(e)}")
 
+@router.get("/tasks/changes")
+async def task_changes(
+    user_id: int,
+    since: Optional[int] = None,
+    last_event_id: Optional[int] = Header(default=None)
+):
+    """
+    Stream a user's task changes as Server-Sent Events.
+
+    Each `task` event carries the task ID, its new version and whether it was
+    deleted; its SSE id is a resume token. Pass the last one seen as `since`,
+    or let EventSource send it as Last-Event-ID when it reconnects, to receive
+    the changes missed in between. A `ready` event marks the switch to live
+    changes; a `reset` event means the missed changes could not be replayed and
+    the task list should be fetched again.
+    """
+    if not settings.TASK_FEED_ENABLED:
+        raise HTTPException(status_code=503, detail="Task change feed is disabled")
+    hub = get_task_feed_hub()
+    # Subscribe before reading the backlog so nothing committed in between is lost
+    subscription = hub.subscribe(user_id)
+
+    def load_backlog():
+        db = SessionLocal()
+        try:
+            return hub.backlog(db, user_id, last_event_id if last_event_id is not None else since)
+        finally:
+            db.close()
+
+    try:
+        backlog, head = await run_in_threadpool(load_backlog)
+    except Exception as e:
+        hub.unsubscribe(subscription)
+        raise HTTPException(status_code=500, detail=f"Error reading task changes: {str(e)}")
+    return StreamingResponse(
+        hub.stream(subscription, backlog, head),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/tasks/{task_id}", response_model=Task)
 def get_task(
     task_id: int,
@@ -147,8 +293,13 @@ def complete_task(
             raise HTTPException(status_code=404, detail="Task not found")
         
         task.is_completed = True
+        task.version = TaskModel.version + 1
+        db.flush()
+        record_index_change(db, "task", task.id, task.user_id)
+        record_task_event(db, task_change(task))
         db.commit()
         db.refresh(task)
+        notify_tasks_changed([task_change(task)])
         return task
     except HTTPException:
         raise
@@ -179,9 +330,18 @@ def update_task(
             task.is_completed = task_update.is_completed
         if task_update.priority is not None:
             task.priority = task_update.priority
+        if task_update.start_time is not None:
+            task.start_time = task_update.start_time
+        if task_update.due_at is not None:
+            task.due_at = task_update.due_at
+        task.version = TaskModel.version + 1
+        db.flush()
         
+        record_index_change(db, "task", task.id, task.user_id)
+        record_task_event(db, task_change(task))
         db.commit()
         db.refresh(task)
+        notify_tasks_changed([task_change(task)])
         return task
     except HTTPException:
         raise
@@ -202,8 +362,12 @@ def delete_task(
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
         
+        change = task_change(task, deleted=True)
         db.delete(task)
+        record_index_change(db, "task", task.id, task.user_id, operation="delete")
+        record_task_event(db, change)
         db.commit()
+        notify_tasks_changed([change])
         return {"message": "Task deleted successfully"}
     except HTTPException:
         raise
@@ -217,6 +381,7 @@ def delete_task(
 def update_chat_history_messages(
     chat_id: int,
     update_data: ChatHistoryUpdateMessages,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -231,14 +396,17 @@ def update_chat_history_messages(
             raise HTTPException(status_code=404, detail="Chat history not found")
         
         # Update the messages and related fields
+        reset_summary_if_rewritten(chat_history, update_data.messages)
         chat_history.messages = update_data.messages
         if update_data.model_used is not None:
             chat_history.model_used = update_data.model_used
         if update_data.tokens_used is not None:
             chat_history.tokens_used = update_data.tokens_used
         
+        record_index_change(db, "chat", chat_history.id, chat_history.user_id)
         db.commit()
         db.refresh(chat_history)
+        schedule_chat_summary(background_tasks, chat_history.id)
         return chat_history
     except HTTPException:
         raise
@@ -246,6 +414,74 @@ def update_chat_history_messages(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error updating chat history messages: {str(e)}")
 
+@router.websocket("/chat-history/{chat_id}/ws")
+async def chat_session_websocket(
+    websocket: WebSocket,
+    chat_id: int,
+    model: str = "gpt-3.5-turbo",
+    max_tokens: int = 1000,
+    temperature: float = 0.7
+):
+    """
+    Chat over a WebSocket, with the history kept and saved on the server.
+    
+    The server answers the connection with {"type": "ready"}. Each turn, the
+    client sends {"type": "message", "content": "..."}; the server streams
+    {"type": "delta", "content": "..."} frames and ends the turn with
+    {"type": "done", "message": {...}, "usage": {...}} once the reply is saved.
+    Problems with a turn are reported as {"type": "error", "detail": "..."}
+    and the session stays open. A reply that is streaming when the client
+    disconnects is still completed and saved. If the OpenAI service cannot
+    be created, the connection is closed with code 1011.
+    """
+    await websocket.accept()
+    try:
+        # Resolved here rather than as a dependency, so failures reach the client as a close code
+        openai_service = get_openai_service()
+    except Exception as e:
+        await websocket.close(code=1011, reason=f"OpenAI service unavailable: {str(e)}"[:120])
+        return
+    session = ChatSession(chat_id, openai_service, model=model, max_tokens=max_tokens, temperature=temperature)
+    db = SessionLocal()
+    try:
+        await run_in_threadpool(session.open, db)
+    except ValueError as e:
+        await websocket.close(code=4404, reason=str(e))
+        return
+    finally:
+        db.close()
+    
+    connected = True
+    try:
+        await websocket.send_json({"type": "ready", "chat_id": chat_id, "messages": len(session.messages)})
+        while connected:
+            frame = await websocket.receive_json()
+            content = frame.get("content") if isinstance(frame, dict) and frame.get("type") == "message" else None
+            if not isinstance(content, str) or not content.strip():
+                await websocket.send_json({"type": "error", "detail": 'Expected {"type": "message", "content": "..."}'})
+                continue
+            try:
+                async for event in iterate_in_threadpool(session.reply(content)):
+                    if not connected:
+                        continue
+                    try:
+                        await websocket.send_json(event)
+                    except Exception:
+                        # Keep consuming so the reply is still saved
+                        connected = False
+            except DeadlineExceeded as e:
+                if connected:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+            except Exception as e:
+                # Nobody to tell once the client is gone; the loop then ends
+                if connected:
+                    await websocket.send_json({"type": "error", "detail": f"Error generating reply: {str(e)}"})
+    except (WebSocketDisconnect, ValueError):
+        # ValueError: a frame that is not JSON; the client is misbehaving
+        pass
+    finally:
+        session.close()
+
 @router.get("/chat-history/{chat_id}", response_model=ChatHistory)
 def get_chat_history(
     chat_id: int,
@@ -296,6 +532,8 @@ def create_chat_history(
             tokens_used=chat_history.tokens_used
         )
         db.add(db_chat_history)
+        db.flush()
+        record_index_change(db, "chat", db_chat_history.id, db_chat_history.user_id)
         db.commit()
         db.refresh(db_chat_history)
         return db_chat_history
@@ -307,6 +545,7 @@ def create_chat_history(
 def update_chat_history(
     chat_id: int,
     chat_history_update: ChatHistoryUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -323,14 +562,18 @@ def update_chat_history(
         if chat_history_update.description is not None:
             chat_history.description = chat_history_update.description
         if chat_history_update.messages is not None:
+            reset_summary_if_rewritten(chat_history, chat_history_update.messages)
             chat_history.messages = chat_history_update.messages
         if chat_history_update.model_used is not None:
             chat_history.model_used = chat_history_update.model_used
         if chat_history_update.tokens_used is not None:
             chat_history.tokens_used = chat_history_update.tokens_used
         
+        record_index_change(db, "chat", chat_history.id, chat_history.user_id)
         db.commit()
         db.refresh(chat_history)
+        if chat_history_update.messages is not None:
+            schedule_chat_summary(background_tasks, chat_history.id)
         return chat_history
     except HTTPException:
         raise
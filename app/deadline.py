@@ -0,0 +1,38 @@
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's latency budget has been used up."""
+
+
+class Deadline:
+    """Absolute point in time by which a unit of work must finish."""
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """Create a deadline `seconds` from now."""
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.remaining() <= 0.0
+
+    def check(self, what: str = "request") -> float:
+        """
+        Return the remaining budget, raising if it has run out.
+
+        Args:
+            what: Description of the work, used in the error message
+        """
+        remaining = self.remaining()
+        if remaining <= 0.0:
+            raise DeadlineExceeded(f"Deadline exceeded before {what} could complete")
+        return remaining
+
@@ -1,10 +1,66 @@
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import List
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.config import settings
 from app.api.endpoints import router
 from app.database import engine
+from app.metrics import render_prometheus
 from app.models.database_models import Base
+from app.services.http_client import get_http_client, warm_up, pool_stats
+from app.services.openai_service import get_openai_service, close_openai_service
+from app.services.checkin_scheduler import CheckInScheduler
+from app.services.job_queue import get_job_worker_pool
+from app.services.task_feed import get_task_feed_hub
+from app.telemetry import RequestMetricsMiddleware, instrument_engine
+from app.query_budget import QueryBudgetMiddleware
+from app.tracing import TracingMiddleware, get_tracer, trace_engine
+
+def join_threads(threads: List[threading.Thread], timeout: float) -> None:
+    """Wait up to `timeout` seconds in total for the threads to exit."""
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    running = [thread.name for thread in threads if thread.is_alive()]
+    if running:
+        print(f"Background threads still running at shutdown: {', '.join(running)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create and warm the shared OpenAI transport and start background workers; stop them at shutdown."""
+    client = get_http_client()
+    if settings.is_openai_configured:
+        get_openai_service()
+        await run_in_threadpool(warm_up, client, settings.OPENAI_BASE_URL)
+    stop = threading.Event()
+    threads: List[threading.Thread] = []
+    services = []
+    if settings.CHECKIN_SCHEDULER_ENABLED:
+        scheduler = CheckInScheduler()
+        thread = threading.Thread(target=scheduler.run_forever, args=(stop,), name="checkin-scheduler", daemon=True)
+        thread.start()
+        threads.append(thread)
+        services.append(scheduler)
+    if settings.JOBS_WORKER_ENABLED and settings.is_openai_configured:
+        pool = get_job_worker_pool()
+        threads.extend(pool.start(stop))
+        services.append(pool)
+    if settings.TASK_FEED_ENABLED:
+        hub = get_task_feed_hub()
+        threads.append(hub.start(stop))
+        services.append(hub)
+    yield
+    stop.set()
+    for service in services:
+        service.wake()
+    # Workers may be mid-request; close the client they share only once they are done
+    await run_in_threadpool(join_threads, threads, settings.SHUTDOWN_TIMEOUT_SECONDS)
+    close_openai_service()
+    get_tracer().shutdown()
 
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application."""
@@ -14,7 +70,8 @@ def create_app() -> FastAPI:
         version=settings.VERSION,
         description="A simple backend service with OpenAI integration and PostgreSQL database",
         docs_url="/docs",
-        redoc_url="/redoc"
+        redoc_url="/redoc",
+        lifespan=lifespan
     )
     
     # Add CORS middleware
@@ -26,6 +83,18 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Per-route latency, status, size, SQL and OpenAI time, served at /metrics
+    instrument_engine(engine)
+    app.add_middleware(RequestMetricsMiddleware)
+    
+    # Spans for each request and SQL statement, exported per TRACING_EXPORTER
+    trace_engine(engine)
+    app.add_middleware(TracingMiddleware)
+    
+    # Warn about requests over the SQL statement budget (staging)
+    if settings.QUERY_BUDGET_PER_REQUEST:
+        app.add_middleware(QueryBudgetMiddleware)
+    
     # Include API routes
     app.include_router(router, prefix=settings.API_V1_STR)
     
@@ -44,9 +113,15 @@ def create_app() -> FastAPI:
             "status": "healthy",
             "version": settings.VERSION,
             "openai_configured": settings.is_openai_configured,
-            "database_configured": settings.is_database_configured
+            "database_configured": settings.is_database_configured,
+            "openai_pool": pool_stats()
         }
     
+    # Prometheus scrape endpoint
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+    
     return app
 
 # Create the application instance
@@ -0,0 +1,215 @@
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """Monotonically increasing counter with optional labels."""
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter for the given label values."""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the current value for the given label values."""
+        return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def values(self) -> Dict[LabelValues, float]:
+        """Return the current value of every label combination."""
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge:
+    """Value that can go up and down, optionally read from a callback."""
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge for the given label values."""
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the gauge for the given label values."""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """Decrease the gauge for the given label values."""
+        self.inc(-amount, **labels)
+
+    def set_function(self, callback: Callable[[], Dict[LabelValues, float]]) -> None:
+        """Read values from `callback` (label values -> value) at collection time."""
+        self._callback = callback
+
+    def values(self) -> Dict[LabelValues, float]:
+        """Return the current value for every label combination."""
+        if self._callback is not None:
+            return dict(self._callback())
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    """Latency-style histogram that also keeps a recent window for quantiles."""
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+        window: int = 1000
+    ):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+        self._recent: Dict[LabelValues, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation."""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+            self._recent.setdefault(key, deque(maxlen=self.window)).append(value)
+
+    def count(self, **labels: str) -> int:
+        """Return the number of observations for the given label values."""
+        return sum(self._counts.get(_label_key(self.labelnames, labels), ()))
+
+    def snapshot(self) -> Dict[LabelValues, Tuple[List[int], float]]:
+        """Return per-bucket counts (the last one is +Inf) and the sum, for every label combination."""
+        with self._lock:
+            return {key: (list(counts), self._sums.get(key, 0.0)) for key, counts in self._counts.items()}
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """
+        Estimate a quantile from the recent observation window.
+
+        Returns:
+            The quantile, or None if nothing has been observed yet
+        """
+        with self._lock:
+            recent = self._recent.get(_label_key(self.labelnames, labels))
+            if not recent:
+                return None
+            ordered = sorted(recent)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class MetricsRegistry:
+    """Process-wide collection of named metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._get_or_create(name, lambda: Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """Get or create a gauge."""
+        return self._get_or_create(name, lambda: Gauge(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Iterable[str] = (), **kwargs) -> Histogram:
+        """Get or create a histogram."""
+        return self._get_or_create(name, lambda: Histogram(name, description, labelnames, **kwargs))
+
+    def collect(self) -> List[object]:
+        """Return every registered metric."""
+        with self._lock:
+            return list(self._metrics.values())
+
+    def _get_or_create(self, name, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+
+def _label_key(labelnames: LabelValues, labels: Dict[str, str]) -> LabelValues:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: LabelValues, values: LabelValues, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus(metrics_registry: Optional["MetricsRegistry"] = None) -> str:
+    """
+    Render every metric in the Prometheus text exposition format (version 0.0.4).
+
+    Args:
+        metrics_registry: Registry to render (defaults to the global registry)
+    """
+    lines: List[str] = []
+    for metric in (metrics_registry or registry).collect():
+        if isinstance(metric, Histogram):
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} histogram")
+            for key, (counts, total) in sorted(metric.snapshot().items()):
+                cumulative = 0
+                for bound, count in zip(list(metric.buckets) + ["+Inf"], counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _format_value(bound)
+                    lines.append(f"{metric.name}_bucket{_format_labels(metric.labelnames, key, {'le': le})} {cumulative}")
+                lines.append(f"{metric.name}_sum{_format_labels(metric.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{_format_labels(metric.labelnames, key)} {cumulative}")
+        else:
+            kind = "counter" if isinstance(metric, Counter) else "gauge"
+            values = metric.values()
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            for key, value in sorted(values.items()):
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Global metrics registry
+registry = MetricsRegistry()
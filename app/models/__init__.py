@@ -1,6 +1,6 @@
 # Models package
-from app.models.database_models import User, Goal, Task, ChatHistory
+from app.models.database_models import User, Task, ChatHistory, QuestionnaireJob
 
 __all__ = [
-    "User", "Goal", "Task", "ChatHistory"
+    "User", "Task", "ChatHistory", "QuestionnaireJob"
 ] 
\ No newline at end of file
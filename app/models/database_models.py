@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, PrimaryKeyConstraint
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, LargeBinary, PrimaryKeyConstraint, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -29,9 +29,18 @@ class Task(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_completed = Column(Boolean, default=False)
     priority = Column(Integer, default=1)  # 1=Low, 2=Medium, 3=High
+    start_time = Column(DateTime(timezone=True), nullable=True)
+    due_at = Column(DateTime(timezone=True), nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # bumped on every change, see TaskEvent
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Partial indexes over open tasks only, used by the check-in scheduler
+    __table_args__ = (
+        Index("ix_tasks_open_due_at", "due_at", "id", postgresql_where=(is_completed == False), sqlite_where=(is_completed == False)),
+        Index("ix_tasks_open_start_time", "start_time", "id", postgresql_where=(is_completed == False), sqlite_where=(is_completed == False)),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="tasks")
 
@@ -46,6 +55,8 @@ class ChatHistory(Base):
     messages = Column(Text, nullable=True)  # JSON string of chat messages
     model_used = Column(String(100), nullable=True)
     tokens_used = Column(Integer, nullable=True)
+    summary = Column(Text, nullable=True)  # Rolling summary of the older messages
+    summary_message_count = Column(Integer, nullable=False, default=0, server_default="0")  # Messages covered by summary
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -124,3 +135,103 @@ class ChatStyle(Base):
     # Relationships
     mbti_type = relationship("MBTIType", back_populates="chat_styles")
 
+
+class QuestionnaireJob(Base):
+    """Questionnaire Job model representing a queued questionnaire analysis."""
+    __tablename__ = "questionnaire_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    question_answers = Column(Text, nullable=False)  # JSON string of question ID to answer
+    model = Column(String(100), nullable=False, default="gpt-3.5-turbo")
+    max_tokens = Column(Integer, nullable=False, default=1000)
+    temperature = Column(Float, nullable=False, default=0.7)
+    status = Column(String(20), nullable=False, default="pending", index=True)  # batch: pending, submitting, submitted; online: queued, running; completed, failed
+    batch_id = Column(String(100), nullable=True, index=True)
+    input_file = Column(String(255), nullable=True)  # batch input file, recorded before it is submitted
+    prompt = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    usage = Column(Text, nullable=True)  # JSON string of token usage
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")  # online worker claims
+    run_after = Column(DateTime(timezone=True), nullable=True)  # retry backoff for online jobs
+    webhook_url = Column(String(2000), nullable=True)
+    webhook_delivered_at = Column(DateTime(timezone=True), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    user = relationship("User")
+
+class IndexOutbox(Base):
+    """Index Outbox model recording task and chat changes still to be embedded."""
+    __tablename__ = "index_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String(20), nullable=False)  # task, chat
+    entity_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False, default="upsert")  # upsert, delete
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class EmbeddingCacheEntry(Base):
+    """Embedding Cache model storing embeddings by model and content hash."""
+    __tablename__ = "embedding_cache"
+    
+    model = Column(String(100), nullable=False)
+    text_hash = Column(String(64), nullable=False)  # sha256 of the normalized text
+    dtype = Column(String(10), nullable=False)  # float32, float16
+    dimensions = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Composite primary key
+    __table_args__ = (
+        PrimaryKeyConstraint('model', 'text_hash'),
+    )
+
+class ChatChunkIndex(Base):
+    """Chat Chunk Index model tracking which chat chunks are in the vector store."""
+    __tablename__ = "chat_chunk_index"
+    
+    chunk_id = Column(String(100), primary_key=True)  # chat:<chat_id>:<seq_start>-<seq_end>
+    chat_id = Column(Integer, nullable=False, index=True)  # no FK: rows outlive the chat until its chunks are removed
+    content_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class CheckInNudge(Base):
+    """Check-In Nudge model queueing proactive assistant check-ins for tasks."""
+    __tablename__ = "checkin_nudges"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    kind = Column(String(20), nullable=False)  # start, due
+    scheduled_for = Column(DateTime(timezone=True), nullable=False)  # the task's start_time or due_at
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # One nudge per task time, however many schedulers fire it
+    __table_args__ = (
+        UniqueConstraint("task_id", "kind", "scheduled_for"),
+    )
+
+class TaskEvent(Base):
+    """Task Event model logging task changes for the per-user change feed."""
+    __tablename__ = "task_events"
+    
+    id = Column(Integer, primary_key=True)  # resume token of the change feed
+    user_id = Column(Integer, nullable=False)
+    task_id = Column(Integer, nullable=False)  # no FK: deletions are logged too
+    version = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Catch-up reads one user's events after a resume token
+    __table_args__ = (
+        Index("ix_task_events_user_id_id", "user_id", "id"),
+    )
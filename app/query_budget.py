@@ -0,0 +1,194 @@
+import functools
+import inspect
+import re
+import threading
+from collections import Counter as TallyCounter
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.config import settings
+from app.database import engine as app_engine
+from app.metrics import registry
+from app.telemetry import route_template
+
+query_budget_violations = registry.counter(
+    "query_budget_violations_total", "Requests that exceeded the SQL statement budget", ["method", "route"]
+)
+
+# Budgets watching the current request or code block, and budgets watching every thread
+_context_budgets: ContextVar[Tuple["QueryBudget", ...]] = ContextVar("query_budgets", default=())
+_global_budgets: List["QueryBudget"] = []
+_global_lock = threading.Lock()
+
+_PARAMETER = re.compile(r"%\(\w+\)s|%s|\?|:\w+|\$\d+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block of code issues more SQL statements than its budget allows."""
+
+
+def statement_shape(statement: str) -> str:
+    """Statement with parameters, literals and IN-lists collapsed, so repeats of one query compare equal."""
+    shape = _PARAMETER.sub("?", statement)
+    shape = _LITERAL.sub("?", shape)
+    shape = _LIST.sub("(?)", shape)
+    return " ".join(shape.split())
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    budgets = _context_budgets.get()
+    if _global_budgets:
+        with _global_lock:
+            budgets = budgets + tuple(b for b in _global_budgets if b not in budgets)
+    for budget in budgets:
+        budget.record(statement)
+
+
+def watch_engine(engine: Engine) -> None:
+    """Make statements executed on the engine count against active budgets."""
+    if not event.contains(engine, "before_cursor_execute", _record_statement):
+        event.listen(engine, "before_cursor_execute", _record_statement)
+
+
+class QueryBudget:
+    """
+    Counts the SQL statements a block of code issues and enforces a limit.
+
+    Use as a context manager or a decorator. Statements are grouped by shape,
+    and a shape that keeps repeating, typically a lazy-loaded relationship
+    touched once per row, is reported as a likely N+1 pattern.
+    """
+
+    def __init__(
+        self,
+        max_statements: Optional[int] = None,
+        max_repeats: Optional[int] = None,
+        name: str = "block",
+        on_exceed: str = "raise",
+        all_threads: bool = False,
+        engine: Optional[Engine] = None
+    ):
+        """
+        Args:
+            max_statements: Statements allowed in total (None for no limit)
+            max_repeats: Times one statement shape may run (None for no limit)
+            name: Label used in reports
+            on_exceed: "raise" to raise QueryBudgetExceeded, "warn" to print the report
+            all_threads: Count statements from every thread, e.g. a TestClient's
+                server thread, instead of only the current context
+            engine: Engine to watch (defaults to the application engine)
+        """
+        if on_exceed not in ("raise", "warn"):
+            raise ValueError(f"on_exceed must be 'raise' or 'warn', not {on_exceed!r}")
+        self.max_statements = max_statements
+        self.max_repeats = max_repeats
+        self.name = name
+        self.on_exceed = on_exceed
+        self.all_threads = all_threads
+        self.engine = engine or app_engine
+        self.statements: List[str] = []
+        self._lock = threading.Lock()
+        self._token = None
+        watch_engine(self.engine)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def record(self, statement: str) -> None:
+        with self._lock:
+            self.statements.append(statement)
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Statement shapes run at least `threshold` times (defaults to QUERY_BUDGET_REPEAT_THRESHOLD), most frequent first."""
+        threshold = threshold or settings.QUERY_BUDGET_REPEAT_THRESHOLD
+        tally = TallyCounter(statement_shape(s) for s in self.statements)
+        return [(shape, n) for shape, n in tally.most_common() if n >= threshold]
+
+    def exceeded(self) -> bool:
+        if self.max_statements is not None and self.count > self.max_statements:
+            return True
+        if self.max_repeats is not None:
+            return any(n > self.max_repeats for _, n in self.repeated(self.max_repeats + 1))
+        return False
+
+    def report(self) -> str:
+        limit = "unlimited" if self.max_statements is None else self.max_statements
+        lines = [f"{self.name}: {self.count} SQL statements (budget {limit})"]
+        for shape, n in self.repeated():
+            lines.append(f"  likely N+1, {n}x: {shape}")
+        return "\n".join(lines)
+
+    def check(self) -> None:
+        """Raise or warn if the budget was exceeded."""
+        if not self.exceeded():
+            return
+        if self.on_exceed == "raise":
+            raise QueryBudgetExceeded(self.report())
+        print(f"Query budget exceeded: {self.report()}")
+
+    def __enter__(self) -> "QueryBudget":
+        self.statements = []
+        if self.all_threads:
+            with _global_lock:
+                _global_budgets.append(self)
+        else:
+            self._token = _context_budgets.set(_context_budgets.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.all_threads:
+            with _global_lock:
+                _global_budgets.remove(self)
+        else:
+            _context_budgets.reset(self._token)
+        # Don't mask the block's own error with a budget report
+        if exc_type is None:
+            self.check()
+
+    def __call__(self, func: Callable) -> Callable:
+        """Decorate a function (sync or async) so every call runs under a fresh copy of this budget."""
+        def fresh() -> "QueryBudget":
+            return QueryBudget(self.max_statements, self.max_repeats, self.name, self.on_exceed, self.all_threads, self.engine)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with fresh():
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with fresh():
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class QueryBudgetMiddleware:
+    """
+    Warns about requests that exceed QUERY_BUDGET_PER_REQUEST statements or repeat a statement shape.
+
+    Meant for staging: the response has already been sent when the budget is
+    checked, so violations are printed and counted instead of failing the request.
+    """
+
+    def __init__(self, app: ASGIApp, max_statements: Optional[int] = None, max_repeats: Optional[int] = None):
+        self.app = app
+        self.max_statements = max_statements or settings.QUERY_BUDGET_PER_REQUEST
+        self.max_repeats = settings.QUERY_BUDGET_REPEAT_THRESHOLD if max_repeats is None else max_repeats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = route_template(scope)
+        budget = QueryBudget(self.max_statements, self.max_repeats, name=f"{scope['method']} {route}", on_exceed="warn")
+        with budget:
+            await self.app(scope, receive, send)
+        if budget.exceeded():
+            query_budget_violations.inc(method=scope["method"], route=route)
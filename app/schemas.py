@@ -1,14 +1,48 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
+from datetime import datetime
 
 class QuestionnaireRequest(BaseModel):
     """Model for questionnaire processing request."""
     user_id: int = Field(..., description="User ID")
     question_answers: Dict[str, str] = Field(..., description="Map of question ID to answer")
+    model: str = Field(default="gpt-3.5-turbo", description="OpenAI model to use")
+    max_tokens: int = Field(default=1000, description="Maximum tokens to generate")
+    temperature: float = Field(default=0.7, description="Sampling temperature")
 
 class QuestionnaireResponse(BaseModel):
     """Model for questionnaire processing response."""
     user_id: int = Field(..., description="User ID")
+    prompt: str = Field(..., description="Prompt built from the answers")
+    response: str = Field(..., description="Generated analysis")
+    model: str = Field(..., description="Model used")
+    usage: Optional[Dict[str, Any]] = Field(default=None, description="Token usage")
+
+class QuestionnaireJobRequest(QuestionnaireRequest):
+    """Model for queueing a questionnaire analysis."""
+    webhook_url: Optional[str] = Field(default=None, description="URL that receives the finished job as a POST")
+
+class JobAccepted(BaseModel):
+    """Model for the response to a queued job."""
+    job_id: int = Field(..., description="Job ID")
+    status: str = Field(..., description="Job status")
+    status_url: str = Field(..., description="Where to poll for the result")
+
+class Job(BaseModel):
+    """Model for a queued job and, once finished, its result."""
+    job_id: int = Field(..., description="Job ID")
+    user_id: int = Field(..., description="User ID")
+    status: str = Field(..., description="queued, running, completed or failed (pending, submitting or submitted for batch jobs)")
+    model: str = Field(..., description="Model used")
+    prompt: Optional[str] = Field(default=None, description="Prompt built from the answers")
+    response: Optional[str] = Field(default=None, description="Generated analysis")
+    usage: Optional[Dict[str, Any]] = Field(default=None, description="Token usage")
+    error: Optional[str] = Field(default=None, description="Why the job failed")
+    attempts: int = Field(..., description="Times a worker picked the job up")
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    webhook_delivered_at: Optional[datetime] = None
 
 class HealthResponse(BaseModel):
     """Model for health check response."""
@@ -52,6 +86,8 @@ class TaskBase(BaseModel):
     """Base Task schema."""
     name: str = Field(..., description="Task name")
     description: Optional[str] = Field(None, description="Task description")
+    start_time: Optional[datetime] = Field(None, description="When the user plans to start the task")
+    due_at: Optional[datetime] = Field(None, description="Task deadline")
 
 class TaskCreate(TaskBase):
     """Schema for creating a task."""
@@ -64,6 +100,8 @@ class TaskUpdate(BaseModel):
     description: Optional[str] = None
     is_completed: Optional[bool] = None
     priority: Optional[int] = None
+    start_time: Optional[datetime] = None
+    due_at: Optional[datetime] = None
 
 class Task(TaskBase):
     """Schema for task response."""
@@ -71,6 +109,7 @@ class Task(TaskBase):
     user_id: int
     is_completed: bool
     priority: int
+    version: int = Field(default=1, description="Incremented on every change; matches the change feed")
     
     class Config:
         from_attributes = True
@@ -0,0 +1,402 @@
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.database_models import User, QuestionnaireJob
+from app.schemas import QuestionnaireRequest
+from app.services.question_service import QuestionService
+
+BATCH_ENDPOINT = "/v1/completions"
+CUSTOM_ID_PREFIX = "questionnaire-job-"
+
+# Terminal states reported by the OpenAI Batch API
+FINISHED_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def enqueue_batch_questionnaire(db: Session, request: QuestionnaireRequest) -> QuestionnaireJob:
+    """
+    Queue a questionnaire analysis for the next batch submission.
+
+    The job stays pending until `python run_batch.py submit` (or `run`)
+    picks it up; poll GET /jobs/{id} for the result.
+
+    Returns:
+        The committed job
+    """
+    job = QuestionnaireJob(
+        user_id=request.user_id,
+        question_answers=json.dumps(request.question_answers),
+        model=request.model,
+        max_tokens=request.max_tokens,
+        temperature=request.temperature,
+        status="pending"
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+class BatchTransport(ABC):
+    """Interface for submitting batch files and fetching their results."""
+
+    @abstractmethod
+    def submit(self, path: str) -> str:
+        """Submit a JSONL batch file and return the batch ID."""
+
+    @abstractmethod
+    def find(self, path: str) -> Optional[str]:
+        """Return the ID of a batch already created from this file, if any."""
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Return the batch status using OpenAI Batch API status names."""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yield output lines of a finished batch.
+
+        Expired and cancelled batches yield the requests that did finish;
+        a batch without any output yields nothing.
+        """
+
+
+class OpenAIBatchTransport(BatchTransport):
+    """Transport backed by the OpenAI Files and Batches APIs."""
+
+    def __init__(self, client=None):
+        """Initialize with an OpenAI client, defaulting to the shared service's client."""
+        if client is None:
+            from app.services.openai_service import get_openai_service
+            client = get_openai_service().client
+        self.client = client
+
+    def submit(self, path: str) -> str:
+        with open(path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=settings.BATCH_COMPLETION_WINDOW,
+            metadata={"input_file": os.path.basename(path)}
+        )
+        return batch.id
+
+    def find(self, path: str) -> Optional[str]:
+        # Only the most recent batches are checked; resumes follow soon after the interruption
+        name = os.path.basename(path)
+        for batch in self.client.batches.list(limit=100).data:
+            if (batch.metadata or {}).get("input_file") == name:
+                return batch.id
+        return None
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LocalBatchTransport(BatchTransport):
+    """
+    In-process stand-in for the Batch API, used for testing and dry runs.
+
+    Each submitted file is answered immediately by `responder`, which maps a
+    request body to a completion body, and kept under `directory`.
+    """
+
+    def __init__(self, directory: Optional[str] = None, responder: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.directory = directory or os.path.join(settings.BATCH_DIR, "local")
+        self.responder = responder or self._echo
+        os.makedirs(self.directory, exist_ok=True)
+
+    def submit(self, path: str) -> str:
+        batch_id = self._batch_id(path)
+        with open(path) as src, open(self._output_path(batch_id), "w") as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                out.write(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": self.responder(request["body"])},
+                    "error": None
+                }) + "\n")
+        return batch_id
+
+    def find(self, path: str) -> Optional[str]:
+        batch_id = self._batch_id(path)
+        return batch_id if os.path.exists(self._output_path(batch_id)) else None
+
+    def status(self, batch_id: str) -> str:
+        return "completed" if os.path.exists(self._output_path(batch_id)) else "failed"
+
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self._output_path(batch_id)):
+            return
+        with open(self._output_path(batch_id)) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    @staticmethod
+    def _batch_id(path: str) -> str:
+        # Input file names are unique per chunk, so a file always maps to the same batch
+        return f"batch_local_{os.path.splitext(os.path.basename(path))[0]}"
+
+    def _output_path(self, batch_id: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}_output.jsonl")
+
+    @staticmethod
+    def _echo(body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = body.get("prompt", "")
+        return {
+            "model": body.get("model"),
+            "choices": [{"index": 0, "text": f"[local batch] {prompt[:80]}", "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": 0, "total_tokens": len(prompt.split())}
+        }
+
+
+class QuestionnaireBatchService:
+    """Service class for analysing queued questionnaires through the batch API."""
+
+    def __init__(self, transport: BatchTransport, chunk_size: Optional[int] = None):
+        """
+        Initialize the batch service.
+
+        Args:
+            transport: Where batch files are submitted
+            chunk_size: Maximum jobs per batch file (defaults to BATCH_CHUNK_SIZE)
+        """
+        self.transport = transport
+        self.chunk_size = chunk_size or settings.BATCH_CHUNK_SIZE
+        self.question_service = QuestionService(openai_service=None)
+
+    def requeue_latest(self, db: Session) -> int:
+        """
+        Queue a fresh analysis of every user's most recent questionnaire.
+
+        Used to re-analyse existing users, for example after a prompt change.
+
+        Returns:
+            Number of jobs queued
+        """
+        latest = (
+            db.query(func.max(QuestionnaireJob.id))
+            .filter(QuestionnaireJob.status == "completed")
+            .group_by(QuestionnaireJob.user_id)
+        )
+        sources = db.query(QuestionnaireJob).filter(QuestionnaireJob.id.in_(latest)).all()
+        db.add_all([
+            QuestionnaireJob(
+                user_id=job.user_id,
+                question_answers=job.question_answers,
+                model=job.model,
+                max_tokens=job.max_tokens,
+                temperature=job.temperature,
+                status="pending"
+            )
+            for job in sources
+        ])
+        db.commit()
+        return len(sources)
+
+    def submit_pending(self, db: Session) -> List[str]:
+        """
+        Write pending jobs to JSONL batch files and submit them chunk by chunk.
+
+        A chunk's jobs are marked submitting, with their input file, and
+        committed before the file goes to the transport. If a run dies before
+        the batch ID is recorded, the next run asks the transport whether that
+        file was already submitted instead of submitting and paying for it twice.
+
+        Returns:
+            IDs of the submitted batches
+        """
+        batch_ids = [self._resume(db, input_file) for input_file in self._interrupted_files(db)]
+        while True:
+            jobs = (
+                db.query(QuestionnaireJob)
+                .filter(QuestionnaireJob.status == "pending")
+                .order_by(QuestionnaireJob.id)
+                .limit(self.chunk_size)
+                .all()
+            )
+            if not jobs:
+                return batch_ids
+
+            path = self.write_batch_file(db, jobs)
+            for job in jobs:
+                job.status = "submitting"
+                job.input_file = os.path.basename(path)
+            db.commit()
+            batch_ids.append(self._mark_submitted(db, jobs, self.transport.submit(path)))
+
+    def _interrupted_files(self, db: Session) -> List[str]:
+        return [
+            input_file for (input_file,) in
+            db.query(QuestionnaireJob.input_file)
+            .filter(QuestionnaireJob.status == "submitting")
+            .distinct()
+        ]
+
+    def _resume(self, db: Session, input_file: str) -> str:
+        """Finish submitting a chunk left submitting by an interrupted run."""
+        jobs = (
+            db.query(QuestionnaireJob)
+            .filter(QuestionnaireJob.status == "submitting", QuestionnaireJob.input_file == input_file)
+            .order_by(QuestionnaireJob.id)
+            .all()
+        )
+        batch_id = self.transport.find(os.path.join(settings.BATCH_DIR, input_file))
+        if batch_id is None:
+            # Rewritten in case the file did not survive the interruption
+            batch_id = self.transport.submit(self.write_batch_file(db, jobs))
+        return self._mark_submitted(db, jobs, batch_id)
+
+    def _mark_submitted(self, db: Session, jobs: List[QuestionnaireJob], batch_id: str) -> str:
+        for job in jobs:
+            job.status = "submitted"
+            job.batch_id = batch_id
+        db.commit()
+        return batch_id
+
+    def write_batch_file(self, db: Session, jobs: List[QuestionnaireJob]) -> str:
+        """
+        Write jobs as an OpenAI batch input file.
+
+        Returns:
+            Path of the written file
+        """
+        user_ids = {job.user_id for job in jobs}
+        names = dict(db.query(User.id, User.name).filter(User.id.in_(user_ids)).all())
+
+        os.makedirs(settings.BATCH_DIR, exist_ok=True)
+        path = os.path.join(settings.BATCH_DIR, f"questionnaires_{jobs[0].id}_{jobs[-1].id}.jsonl")
+        with open(path, "w") as f:
+            for job in jobs:
+                job.prompt = self.question_service.build_prompt_from_answers(
+                    json.loads(job.question_answers), names.get(job.user_id, "User")
+                )
+                f.write(json.dumps({
+                    "custom_id": f"{CUSTOM_ID_PREFIX}{job.id}",
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": {
+                        "model": job.model,
+                        "prompt": job.prompt,
+                        "max_tokens": job.max_tokens,
+                        "temperature": job.temperature
+                    }
+                }) + "\n")
+        return path
+
+    def collect(self, db: Session, poll_interval: Optional[float] = None, timeout: Optional[float] = None) -> int:
+        """
+        Poll every submitted batch and write finished results back.
+
+        Batches are found from the jobs table, so collection resumes after a
+        restart without resubmitting anything.
+
+        Args:
+            db: Database session
+            poll_interval: Seconds between status checks (defaults to BATCH_POLL_INTERVAL_SECONDS)
+            timeout: Give up after this many seconds, leaving jobs submitted (optional)
+
+        Returns:
+            Number of jobs updated
+        """
+        poll_interval = settings.BATCH_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        started = time.monotonic()
+        updated = 0
+        outstanding = {
+            batch_id for (batch_id,) in
+            db.query(QuestionnaireJob.batch_id)
+            .filter(QuestionnaireJob.status == "submitted")
+            .distinct()
+        }
+        while outstanding:
+            for batch_id in list(outstanding):
+                status = self.transport.status(batch_id)
+                if status not in FINISHED_STATUSES:
+                    continue
+                updated += self._write_results(db, batch_id, status)
+                outstanding.discard(batch_id)
+            if not outstanding or (timeout is not None and time.monotonic() - started >= timeout):
+                break
+            time.sleep(poll_interval)
+        return updated
+
+    def _write_results(self, db: Session, batch_id: str, status: str) -> int:
+        """
+        Bulk-write the results of one finished batch.
+
+        Whatever output the batch has is used, so the requests an expired or
+        cancelled batch did finish keep their results.
+        """
+        mappings = {}
+        for line in self.transport.results(batch_id):
+            try:
+                job_id = int(str(line.get("custom_id"))[len(CUSTOM_ID_PREFIX):])
+            except ValueError:
+                # Not one of ours; its job, if any, fails below as missing from the output
+                print(f"Skipping batch {batch_id} output line with custom_id {line.get('custom_id')!r}")
+                continue
+            response = line.get("response") or {}
+            body = response.get("body") or {}
+            if line.get("error") or response.get("status_code") != 200:
+                mappings[job_id] = {
+                    "id": job_id,
+                    "status": "failed",
+                    "error": json.dumps(line.get("error") or body.get("error"))
+                }
+                continue
+            try:
+                text = body["choices"][0]["text"].strip()
+            except (KeyError, IndexError, TypeError, AttributeError):
+                mappings[job_id] = {"id": job_id, "status": "failed", "error": f"Malformed batch output: {json.dumps(body)[:500]}"}
+                continue
+            mappings[job_id] = {
+                "id": job_id,
+                "status": "completed",
+                "result": text,
+                "usage": json.dumps(body.get("usage")),
+                "error": None
+            }
+
+        # Only jobs missing from the output failed along with the batch
+        job_ids = [job_id for (job_id,) in db.query(QuestionnaireJob.id).filter(
+            QuestionnaireJob.batch_id == batch_id,
+            QuestionnaireJob.status == "submitted"
+        )]
+        missing_error = "Missing from batch output" if status == "completed" else f"Batch {status}"
+        for job_id in job_ids:
+            mappings.setdefault(job_id, {"id": job_id, "status": "failed", "error": missing_error})
+
+        db.bulk_update_mappings(QuestionnaireJob, [mappings[job_id] for job_id in job_ids])
+        db.commit()
+        return len(job_ids)
+
+    def run(self, db: Session, poll_interval: Optional[float] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Submit all pending jobs and collect every outstanding batch.
+
+        Returns:
+            Dictionary with the submitted batch IDs and the number of jobs updated
+        """
+        batch_ids = self.submit_pending(db)
+        updated = self.collect(db, poll_interval=poll_interval, timeout=timeout)
+        return {"batch_ids": batch_ids, "jobs_updated": updated}
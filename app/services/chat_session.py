@@ -0,0 +1,254 @@
+import datetime
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.deadline import Deadline
+from app.metrics import registry
+from app.models.database_models import (
+    ChatHistory as ChatHistoryModel,
+    ChatStyle as ChatStyleModel,
+    MBTIType as MBTITypeModel,
+    Task as TaskModel,
+    User as UserModel,
+    UserMBTIType as UserMBTITypeModel
+)
+from app.services.chat_summary_service import context_lines, get_chat_summary_service, load_messages
+from app.services.index_outbox import record_index_change
+from app.services.openai_service import OpenAIService
+from app.services.task_update_service import on_tasks_changed, remove_tasks_changed_listener
+from rag.context_packer import pack_recent
+from rag.prompt_assembly import get_prompt_assembler
+
+# Attempts to append a message while other writers keep replacing the history
+MAX_APPEND_ATTEMPTS = 3
+
+chat_sessions_open = registry.gauge("chat_sessions_open", "Chat sessions with a connected WebSocket")
+chat_turns = registry.counter("chat_turns_total", "Chat turns handled over WebSocket sessions", ["outcome"])
+
+# Summaries are written off the socket's turn so the next reply never waits for one
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+
+
+class ChatHistoryConflict(RuntimeError):
+    """Raised when a message could not be appended because the history kept changing underneath."""
+
+
+def utc_timestamp() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class ChatSession:
+    """
+    Server-side state of one chat history while a client is connected to it.
+
+    The user, persona prefix, open tasks and parsed messages are loaded once
+    when the session opens. A turn then needs one frame from the client, and
+    the database work is two small writes: the user's message and the
+    assistant's finished reply are each appended as soon as they complete. The
+    task block is reloaded only after this user's tasks change, and the
+    summary only after a background summary has been written.
+    """
+
+    def __init__(
+        self,
+        chat_id: int,
+        openai_service: OpenAIService,
+        model: str = "gpt-3.5-turbo",
+        max_tokens: int = 1000,
+        temperature: float = 0.7
+    ):
+        self.chat_id = chat_id
+        self.openai_service = openai_service
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.user_id: Optional[int] = None
+        self.user_name = "User"
+        self.persona_id: Optional[str] = None
+        self.keywords: Optional[str] = None
+        self.messages: List[Dict[str, Any]] = []
+        self.summary: Optional[str] = None
+        self.summary_message_count = 0
+        self._raw_messages: Optional[str] = None
+        self._tasks_block: Optional[str] = None
+        self._summary_stale = False
+
+    def open(self, db: Session) -> None:
+        """Load the chat, its user and persona, and start watching the user's tasks."""
+        chat = db.query(ChatHistoryModel).filter(ChatHistoryModel.id == self.chat_id).first()
+        if chat is None:
+            raise ValueError("Chat history not found")
+        self.user_id = chat.user_id
+        self._set_history(chat.messages, chat.summary, chat.summary_message_count)
+
+        name = db.query(UserModel.name).filter(UserModel.id == self.user_id).scalar()
+        self.user_name = name or "User"
+        persona = (
+            db.query(MBTITypeModel.persona_id, ChatStyleModel.keywords)
+            .join(UserMBTITypeModel, UserMBTITypeModel.mbti_type_id == MBTITypeModel.id)
+            .outerjoin(ChatStyleModel, ChatStyleModel.mbti_type_id == MBTITypeModel.id)
+            .filter(UserMBTITypeModel.user_id == self.user_id)
+            .order_by(MBTITypeModel.id, ChatStyleModel.id)
+            .first()
+        )
+        if persona is not None:
+            self.persona_id, self.keywords = persona
+        self.tasks_block(db)
+        on_tasks_changed(self.handle_task_changes)
+        chat_sessions_open.inc()
+
+    def close(self) -> None:
+        remove_tasks_changed_listener(self.handle_task_changes)
+        chat_sessions_open.dec()
+
+    def handle_task_changes(self, changes: List[Dict[str, Any]]) -> None:
+        """Task change listener: drop the cached task block when this user's tasks change."""
+        if any(change.get("user_id") == self.user_id for change in changes):
+            self._tasks_block = None
+
+    def tasks_block(self, db: Session) -> str:
+        """The user's open tasks, soonest due first, packed to PROMPT_BUDGET_TASKS_TOKENS."""
+        if self._tasks_block is None:
+            rows = (
+                db.query(TaskModel.id, TaskModel.name, TaskModel.due_at)
+                .filter(TaskModel.user_id == self.user_id, TaskModel.is_completed == False)
+                .order_by(TaskModel.due_at.is_(None), TaskModel.due_at, TaskModel.id)
+                .all()
+            )
+            lines = [
+                f"- {name} (id: {task_id}" + (f", due: {due_at.isoformat()})" if due_at else ")")
+                for task_id, name, due_at in rows
+            ]
+            # pack_recent keeps the tail of the list, so reverse it to keep the soonest-due tasks
+            self._tasks_block = "\n".join(pack_recent(lines[::-1], settings.PROMPT_BUDGET_TASKS_TOKENS)[::-1])
+        return self._tasks_block
+
+    def prompt_messages(self, db: Session, user_message: str) -> List[Dict[str, str]]:
+        """Chat messages for the next reply: the cached persona prefix, then tasks, conversation and the new message."""
+        if self._summary_stale:
+            self._summary_stale = False
+            self.summary, self.summary_message_count = (
+                db.query(ChatHistoryModel.summary, ChatHistoryModel.summary_message_count)
+                .filter(ChatHistoryModel.id == self.chat_id)
+                .one()
+            )
+        chat_lines = pack_recent(
+            context_lines(self.messages, self.summary, self.summary_message_count),
+            settings.PROMPT_BUDGET_CHAT_TOKENS
+        )
+        return get_prompt_assembler().build_messages(
+            self.persona_id,
+            self.user_name,
+            utc_timestamp(),
+            self.tasks_block(db),
+            "\n".join(chat_lines),
+            keywords=self.keywords,
+            user_message=user_message
+        )
+
+    def append_message(self, db: Session, message: Dict[str, Any], model_used: Optional[str] = None, tokens_used: int = 0) -> None:
+        """
+        Append one message to the stored history.
+
+        The write only applies if the history is still the one this session
+        last saw; if another writer replaced it, e.g. with a PUT, the session
+        adopts their version and appends to that instead.
+        """
+        for _ in range(MAX_APPEND_ATTEMPTS):
+            raw = json.dumps(self.messages + [message])
+            values: Dict[str, Any] = {"messages": raw}
+            if model_used is not None:
+                values["model_used"] = model_used
+            if tokens_used:
+                values["tokens_used"] = func.coalesce(ChatHistoryModel.tokens_used, 0) + tokens_used
+            unchanged = (
+                ChatHistoryModel.messages.is_(None) if self._raw_messages is None
+                else ChatHistoryModel.messages == self._raw_messages
+            )
+            updated = db.execute(
+                update(ChatHistoryModel)
+                .where(ChatHistoryModel.id == self.chat_id, unchanged)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if updated:
+                record_index_change(db, "chat", self.chat_id, self.user_id)
+                db.commit()
+                self.messages.append(message)
+                self._raw_messages = raw
+                return
+            db.rollback()
+            chat = db.query(ChatHistoryModel).filter(ChatHistoryModel.id == self.chat_id).first()
+            if chat is None:
+                raise ValueError("Chat history not found")
+            self._set_history(chat.messages, chat.summary, chat.summary_message_count)
+        raise ChatHistoryConflict(f"Chat history {self.chat_id} kept changing; message not saved")
+
+    def reply(self, content: str) -> Iterator[Dict[str, Any]]:
+        """
+        Handle one user message: save it, stream the assistant's reply, then save that.
+
+        Yields:
+            {"type": "delta", "content": ...} while the reply streams, then
+            {"type": "done", "message": ..., "usage": ...} once it is saved
+        """
+        deadline = Deadline.after(settings.LLM_DEADLINE_SECONDS)
+        db = SessionLocal()
+        try:
+            prompt = self.prompt_messages(db, content)
+            self.append_message(db, {"role": "user", "content": content, "timestamp": utc_timestamp()})
+        finally:
+            db.close()
+
+        done: Dict[str, Any] = {}
+        try:
+            for event in self.openai_service.stream_chat_completion(
+                prompt,
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                deadline=deadline
+            ):
+                if event["type"] == "delta":
+                    yield event
+                else:
+                    done = event
+        except Exception:
+            chat_turns.inc(outcome="error")
+            raise
+
+        message = {"role": "assistant", "content": done["response"], "timestamp": utc_timestamp()}
+        usage = done.get("usage") or {}
+        db = SessionLocal()
+        try:
+            self.append_message(db, message, model_used=done["model"], tokens_used=usage.get("total_tokens", 0))
+        finally:
+            db.close()
+        chat_turns.inc(outcome="ok")
+        self.schedule_summary()
+        yield {"type": "done", "message": message, "usage": done.get("usage")}
+
+    def schedule_summary(self) -> Optional[Future]:
+        """Refresh the rolling summary in the background if the conversation has grown enough."""
+        if not settings.CHAT_SUMMARY_ENABLED:
+            return None
+        summary_service = get_chat_summary_service(self.openai_service)
+        snapshot = ChatHistoryModel(messages=self._raw_messages, summary=self.summary, summary_message_count=self.summary_message_count)
+        if not summary_service.needs_summary(snapshot):
+            return None
+        future = _summary_executor.submit(summary_service.summarize_if_needed, self.chat_id)
+        future.add_done_callback(self._mark_summary_stale)
+        return future
+
+    def _mark_summary_stale(self, future: Future) -> None:
+        self._summary_stale = True
+
+    def _set_history(self, raw: Optional[str], summary: Optional[str], summary_message_count: Optional[int]) -> None:
+        self._raw_messages = raw
+        self.messages = load_messages(raw)
+        self.summary = summary
+        self.summary_message_count = summary_message_count or 0
@@ -0,0 +1,170 @@
+import json
+from typing import Any, Dict, List, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.database_models import ChatHistory
+from app.services.openai_service import OpenAIService
+from app.tokenizer import count_tokens
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a supportive conversation between a user and EmotiTask, "
+    "an assistant that helps them manage tasks and emotional well-being. "
+    "Update the summary with the new messages. Keep the user's goals, feelings, commitments, "
+    "task changes and anything they asked to be remembered; drop small talk. "
+    "Write in the third person, in at most {max_tokens} tokens."
+)
+
+
+def load_messages(raw: Optional[str]) -> List[Dict[str, Any]]:
+    """Parse a ChatHistory.messages JSON string, ignoring malformed content."""
+    try:
+        messages = json.loads(raw or "[]")
+    except ValueError:
+        return []
+    return [m for m in messages if isinstance(m, dict)] if isinstance(messages, list) else []
+
+
+def message_line(message: Dict[str, Any]) -> str:
+    return f"{message.get('role', 'user')}: {message.get('content', '')}"
+
+
+def conversation_context_lines(chat: ChatHistory) -> List[str]:
+    """
+    Prompt lines for a conversation: its rolling summary, then every message the summary does not cover.
+
+    Between summaries this is the last CHAT_SUMMARY_KEEP_MESSAGES messages plus
+    whatever has not reached the trigger threshold, so its size stays roughly constant.
+    """
+    return context_lines(load_messages(chat.messages), chat.summary, chat.summary_message_count)
+
+
+def context_lines(messages: List[Dict[str, Any]], summary: Optional[str], covered: Optional[int]) -> List[str]:
+    """conversation_context_lines for already parsed messages, e.g. ones cached by a chat session."""
+    covered = covered or 0
+    if summary and covered <= len(messages):
+        return [f"Summary of earlier conversation: {summary}"] + [message_line(m) for m in messages[covered:]]
+    return [message_line(m) for m in messages]
+
+
+def reset_summary_if_rewritten(chat: ChatHistory, raw: Optional[str]) -> None:
+    """
+    Drop the chat's summary if the new messages change any message it covers.
+
+    Call before storing `raw`; appending messages keeps the summary.
+    """
+    covered = chat.summary_message_count or 0
+    if covered and load_messages(raw)[:covered] != load_messages(chat.messages)[:covered]:
+        chat.summary = None
+        chat.summary_message_count = 0
+
+
+class ChatSummaryService:
+    """Keeps a rolling summary per chat history so prompts carry a bounded amount of chat."""
+
+    def __init__(
+        self,
+        openai_service: OpenAIService,
+        keep_messages: Optional[int] = None,
+        trigger_tokens: Optional[int] = None
+    ):
+        """
+        Args:
+            openai_service: Service used to write summaries
+            keep_messages: Most recent messages always kept verbatim (defaults to CHAT_SUMMARY_KEEP_MESSAGES)
+            trigger_tokens: Unsummarized tokens, beyond the kept messages, that trigger a
+                new summary (defaults to CHAT_SUMMARY_TRIGGER_TOKENS)
+        """
+        self.openai_service = openai_service
+        self.keep_messages = settings.CHAT_SUMMARY_KEEP_MESSAGES if keep_messages is None else keep_messages
+        self.trigger_tokens = settings.CHAT_SUMMARY_TRIGGER_TOKENS if trigger_tokens is None else trigger_tokens
+
+    def pending_messages(self, chat: ChatHistory) -> List[Dict[str, Any]]:
+        """Messages that are neither summarized nor among the most recent ones."""
+        messages = load_messages(chat.messages)
+        start = chat.summary_message_count or 0
+        if start > len(messages):
+            # History was rewritten shorter than what the summary covers; start over
+            start = 0
+        return messages[start:max(start, len(messages) - self.keep_messages)]
+
+    def needs_summary(self, chat: ChatHistory) -> bool:
+        pending = self.pending_messages(chat)
+        return bool(pending) and count_tokens("\n".join(message_line(m) for m in pending)) >= self.trigger_tokens
+
+    def summarize(self, db: Session, chat: ChatHistory) -> bool:
+        """
+        Fold the pending messages into the chat's summary.
+
+        Only messages not yet covered are sent, together with the previous
+        summary, so each call costs about the same however long the chat is.
+        The write is skipped if another worker updated the summary, or the
+        summarized messages were rewritten, meanwhile.
+
+        Returns:
+            Whether a new summary was stored
+        """
+        messages = load_messages(chat.messages)
+        covered = chat.summary_message_count or 0
+        previous = chat.summary if covered <= len(messages) else None
+        start = covered if previous is not None else 0
+        pending = messages[start:max(start, len(messages) - self.keep_messages)]
+        if not pending:
+            return False
+
+        result = self.openai_service.chat_completion(
+            messages=[
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS)},
+                {"role": "user", "content": (
+                    f"Current summary:\n{previous or '(none)'}\n\n"
+                    "New messages:\n" + "\n".join(message_line(m) for m in pending)
+                )},
+            ],
+            model=settings.CHAT_SUMMARY_MODEL,
+            max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS,
+            temperature=0.2
+        )
+
+        end = start + len(pending)
+        current = (
+            db.query(ChatHistory.messages, ChatHistory.summary_message_count)
+            .filter(ChatHistory.id == chat.id)
+            .with_for_update()
+            .first()
+        )
+        if current is None or current.summary_message_count != covered or load_messages(current.messages)[:end] != messages[:end]:
+            db.commit()  # Releases the row lock
+            return False
+        db.execute(
+            update(ChatHistory)
+            .where(ChatHistory.id == chat.id)
+            .values(summary=result["response"].strip(), summary_message_count=end)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return True
+
+    def summarize_if_needed(self, chat_id: int) -> None:
+        """Background entry point: summarize one chat in its own session if it crossed the threshold."""
+        db = SessionLocal()
+        try:
+            chat = db.query(ChatHistory).filter(ChatHistory.id == chat_id).first()
+            if chat is not None and self.needs_summary(chat):
+                self.summarize(db, chat)
+        except Exception as e:
+            db.rollback()
+            print(f"Error summarizing chat history {chat_id}: {e}")
+        finally:
+            db.close()
+
+
+# Global chat summary service instance
+chat_summary_service: Optional[ChatSummaryService] = None
+
+def get_chat_summary_service(openai_service: OpenAIService) -> ChatSummaryService:
+    """Get or create chat summary service instance."""
+    global chat_summary_service
+    if chat_summary_service is None:
+        chat_summary_service = ChatSummaryService(openai_service)
+    return chat_summary_service
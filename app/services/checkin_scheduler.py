@@ -0,0 +1,313 @@
+import datetime
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import registry
+from app.models.database_models import Task as TaskModel, CheckInNudge
+from app.services.task_update_service import on_tasks_changed, remove_tasks_changed_listener
+
+# Task columns that trigger a check-in, by event kind
+CHECKIN_COLUMNS = {"start": "start_time", "due": "due_at"}
+
+checkins_fired = registry.counter("checkins_fired_total", "Task check-ins fired", ["kind"])
+checkins_scheduled = registry.gauge("checkins_scheduled", "Check-ins waiting in the scheduler heap")
+
+
+class CheckInEvent:
+    """A task that is starting or due soon (or overdue) and deserves a check-in."""
+
+    def __init__(self, task_id: int, user_id: int, kind: str, scheduled_for: datetime.datetime):
+        self.task_id = task_id
+        self.user_id = user_id
+        self.kind = kind
+        self.scheduled_for = scheduled_for
+
+    def __repr__(self) -> str:
+        return f"CheckInEvent(task_id={self.task_id}, kind={self.kind}, scheduled_for={self.scheduled_for.isoformat()})"
+
+
+CheckInHandler = Callable[[List[CheckInEvent]], None]
+
+
+def to_epoch(value: datetime.datetime) -> float:
+    """Epoch seconds of a datetime, treating naive values as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def from_epoch(value: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+
+
+def enqueue_nudges(events: List[CheckInEvent]) -> None:
+    """Default handler: queue one CheckInNudge per event for delivery to the user."""
+    db = SessionLocal()
+    try:
+        for event in events:
+            db.add(CheckInNudge(task_id=event.task_id, user_id=event.user_id, kind=event.kind, scheduled_for=event.scheduled_for))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Already queued, e.g. by another scheduler or before a restart
+                db.rollback()
+    finally:
+        db.close()
+
+
+class CheckInScheduler:
+    """
+    Fires check-ins a fixed lead time before open tasks start or fall due.
+
+    Upcoming check-ins are loaded one time window at a time, in keyset-paginated
+    batches over the partial indexes on open tasks, into a min-heap. Scheduling,
+    rescheduling and firing are O(log n) in the number of loaded check-ins, and
+    the table is never scanned as a whole. Rescheduling is lazy: a changed task
+    gets a new heap entry and its old one is skipped when popped.
+
+    Changes made in this process arrive through the task change listener.
+    Changes made by other processes are found by reloading the loaded window
+    every `refresh_seconds`, and every check-in is re-checked against its
+    task before it fires.
+    """
+
+    def __init__(
+        self,
+        handler: Optional[CheckInHandler] = None,
+        lead_seconds: Optional[float] = None,
+        window_seconds: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        lookback_seconds: Optional[float] = None,
+        refresh_seconds: Optional[float] = None
+    ):
+        """
+        Args:
+            handler: Called with each batch of due events (defaults to enqueue_nudges)
+            lead_seconds: How long before start/due a check-in fires (defaults to CHECKIN_LEAD_MINUTES)
+            window_seconds: How far ahead each load reaches (defaults to CHECKIN_WINDOW_SECONDS)
+            batch_size: Tasks fetched per query while loading a window (defaults to CHECKIN_BATCH_SIZE)
+            lookback_seconds: On start, also fire check-ins missed this long ago (defaults to CHECKIN_LOOKBACK_SECONDS)
+            refresh_seconds: How often the loaded window is reloaded (defaults to CHECKIN_REFRESH_SECONDS)
+        """
+        self.handler = handler or enqueue_nudges
+        self.lead_seconds = settings.CHECKIN_LEAD_MINUTES * 60 if lead_seconds is None else lead_seconds
+        self.window_seconds = window_seconds or settings.CHECKIN_WINDOW_SECONDS
+        self.batch_size = batch_size or settings.CHECKIN_BATCH_SIZE
+        self.lookback_seconds = settings.CHECKIN_LOOKBACK_SECONDS if lookback_seconds is None else lookback_seconds
+        self.refresh_seconds = refresh_seconds or settings.CHECKIN_REFRESH_SECONDS
+        self._heap: List[Tuple[float, int, int, str]] = []
+        self._counter = itertools.count()
+        # Latest fire time per (task_id, kind); heap entries that disagree are stale
+        self._entries: Dict[Tuple[int, str], Tuple[float, int, datetime.datetime]] = {}
+        # Fire time per (task_id, kind) already fired, so reloading a window does not fire it again
+        self._fired: Dict[Tuple[int, str], float] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self.loaded_until: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def wake(self) -> None:
+        """Cut the current sleep short, e.g. so a newly set `stop` is seen at once."""
+        self._wakeup.set()
+
+    def schedule(self, task_id: int, user_id: int, kind: str, scheduled_for: datetime.datetime) -> None:
+        """Add or move the check-in for one task time."""
+        fire_at = to_epoch(scheduled_for) - self.lead_seconds
+        with self._lock:
+            if self._fired.get((task_id, kind)) == fire_at:
+                return
+            self._entries[(task_id, kind)] = (fire_at, user_id, scheduled_for)
+            heapq.heappush(self._heap, (fire_at, next(self._counter), task_id, kind))
+            checkins_scheduled.set(len(self._entries))
+        self._wakeup.set()
+
+    def cancel(self, task_id: int) -> None:
+        """Drop every pending check-in of a task."""
+        with self._lock:
+            for kind in CHECKIN_COLUMNS:
+                self._entries.pop((task_id, kind), None)
+            checkins_scheduled.set(len(self._entries))
+
+    def pop_due(self, now: float) -> List[CheckInEvent]:
+        """Remove and return every check-in whose fire time has passed."""
+        events = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, _, task_id, kind = heapq.heappop(self._heap)
+                entry = self._entries.get((task_id, kind))
+                if entry is None or entry[0] != fire_at:
+                    continue
+                del self._entries[(task_id, kind)]
+                self._fired[(task_id, kind)] = fire_at
+                events.append(CheckInEvent(task_id, entry[1], kind, entry[2]))
+            checkins_scheduled.set(len(self._entries))
+        return events
+
+    def next_fire_time(self) -> Optional[float]:
+        with self._lock:
+            while self._heap:
+                fire_at, _, task_id, kind = self._heap[0]
+                entry = self._entries.get((task_id, kind))
+                if entry is not None and entry[0] == fire_at:
+                    return fire_at
+                heapq.heappop(self._heap)
+        return None
+
+    def load_window(self, db: Session, start: float, end: float) -> int:
+        """
+        Schedule every open task whose check-in falls in [start, end).
+
+        Returns:
+            Number of check-ins scheduled
+        """
+        loaded = 0
+        for kind, column_name in CHECKIN_COLUMNS.items():
+            column = getattr(TaskModel, column_name)
+            lower, upper = from_epoch(start + self.lead_seconds), from_epoch(end + self.lead_seconds)
+            after: Optional[Tuple[datetime.datetime, int]] = None
+            while True:
+                query = db.query(TaskModel.id, TaskModel.user_id, column).filter(
+                    TaskModel.is_completed == False,
+                    column >= lower,
+                    column < upper
+                )
+                if after is not None:
+                    query = query.filter(or_(column > after[0], and_(column == after[0], TaskModel.id > after[1])))
+                rows = query.order_by(column, TaskModel.id).limit(self.batch_size).all()
+                for task_id, user_id, scheduled_for in rows:
+                    self.schedule(task_id, user_id, kind, scheduled_for)
+                loaded += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+                after = (rows[-1][2], rows[-1][0])
+        self.loaded_until = end
+        return loaded
+
+    def refresh(self, db: Session, now: float) -> int:
+        """
+        Reload the window from the previous refresh up to `loaded_until`.
+
+        Picks up tasks that other processes added or moved into the loaded
+        window; check-ins that already fired are not scheduled again.
+
+        Returns:
+            Number of check-ins scheduled
+        """
+        start = now if self.refreshed_at is None else self.refreshed_at
+        loaded = self.load_window(db, start, max(start, self.loaded_until or now))
+        with self._lock:
+            self._fired = {key: fire_at for key, fire_at in self._fired.items() if fire_at >= start}
+        self.refreshed_at = now
+        return loaded
+
+    def handle_task_changes(self, changes: List[Dict[str, Any]]) -> None:
+        """Task change listener: reschedule changed tasks whose check-ins fall in the loaded window."""
+        for change in changes:
+            self.cancel(change["id"])
+            if change.get("deleted") or change.get("is_completed") or self.loaded_until is None:
+                continue
+            for kind, column_name in CHECKIN_COLUMNS.items():
+                scheduled_for = change.get(column_name)
+                if scheduled_for is not None and to_epoch(scheduled_for) - self.lead_seconds < self.loaded_until:
+                    self.schedule(change["id"], change["user_id"], kind, scheduled_for)
+
+    def still_due(self, db: Session, events: List[CheckInEvent]) -> List[CheckInEvent]:
+        """Drop events whose task was completed, deleted or moved since it was scheduled."""
+        if not events:
+            return []
+        tasks = {
+            row.id: row for row in db.query(TaskModel.id, TaskModel.is_completed, TaskModel.start_time, TaskModel.due_at)
+            .filter(TaskModel.id.in_({event.task_id for event in events}))
+        }
+        current = []
+        for event in events:
+            task = tasks.get(event.task_id)
+            if task is None or task.is_completed:
+                continue
+            value = getattr(task, CHECKIN_COLUMNS[event.kind])
+            if value is not None and to_epoch(value) == to_epoch(event.scheduled_for):
+                current.append(event)
+        return current
+
+    def fire_due(self, now: Optional[float] = None) -> int:
+        """Hand every due check-in that is still current to the handler."""
+        events = self.pop_due(time.time() if now is None else now)
+        if events:
+            db = SessionLocal()
+            try:
+                events = self.still_due(db, events)
+            finally:
+                db.close()
+        if events:
+            try:
+                self.handler(events)
+                for event in events:
+                    checkins_fired.inc(kind=event.kind)
+            except Exception as e:
+                print(f"Error handling check-ins: {e}")
+        return len(events)
+
+    def run_forever(self, stop: Optional[threading.Event] = None) -> None:
+        """
+        Load windows ahead of time and fire check-ins until `stop` is set.
+
+        Sleeps until the next check-in, the next refresh or the end of the
+        loaded window, whichever is soonest; task changes made in this process
+        wake it up early. Changes made elsewhere are seen at the next refresh,
+        at most `refresh_seconds` later.
+        """
+        stop = stop or threading.Event()
+        on_tasks_changed(self.handle_task_changes)
+        try:
+            while not stop.is_set():
+                now = time.time()
+                if self.loaded_until is None or now >= self.loaded_until - self.window_seconds / 2:
+                    start = now - self.lookback_seconds if self.loaded_until is None else self.loaded_until
+                    db = SessionLocal()
+                    try:
+                        self.load_window(db, start, max(start, now) + self.window_seconds)
+                        if self.refreshed_at is None:
+                            self.refreshed_at = now
+                    except Exception as e:
+                        print(f"Error loading check-in window: {e}")
+                    finally:
+                        db.close()
+                elif self.refreshed_at is not None and now >= self.refreshed_at + self.refresh_seconds:
+                    db = SessionLocal()
+                    try:
+                        self.refresh(db, now)
+                    except Exception as e:
+                        print(f"Error refreshing check-in window: {e}")
+                    finally:
+                        db.close()
+                self.fire_due(now)
+
+                next_fire = self.next_fire_time()
+                wake_at = self.loaded_until - self.window_seconds / 2 if self.loaded_until is not None else now + 1
+                if next_fire is not None:
+                    wake_at = min(wake_at, next_fire)
+                if self.refreshed_at is not None:
+                    # A failed refresh is retried after a second rather than at once
+                    wake_at = min(wake_at, max(self.refreshed_at + self.refresh_seconds, now + 1))
+                self._wakeup.clear()
+                if stop.is_set():
+                    break
+                # Wake at least every few seconds so `stop` is noticed promptly
+                self._wakeup.wait(max(0.0, min(wake_at - time.time(), 5.0)))
+        finally:
+            remove_tasks_changed_listener(self.handle_task_changes)
+
+
+if __name__ == "__main__":
+    print("Starting task check-in scheduler...")
+    CheckInScheduler().run_forever()
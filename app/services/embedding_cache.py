@@ -0,0 +1,158 @@
+import hashlib
+import re
+import struct
+import unicodedata
+from typing import Callable, Dict, List, Optional
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import registry
+from app.models.database_models import EmbeddingCacheEntry
+
+ComputeFn = Callable[[List[str]], List[List[float]]]
+
+embedding_cache_lookups = registry.counter(
+    "embedding_cache_lookups_total", "Embedding cache lookups by outcome", ["model", "outcome"]
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different copies share one cache entry."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    """Content address of a text: sha256 of its normalized form."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def encode_vector(vector: List[float], dtype: str) -> bytes:
+    """Pack a vector as little-endian float32 or float16."""
+    code = "e" if dtype == "float16" else "f"
+    return struct.pack(f"<{len(vector)}{code}", *vector)
+
+
+def decode_vector(blob: bytes, dtype: str, dimensions: int) -> List[float]:
+    """Unpack a vector written by encode_vector."""
+    code = "e" if dtype == "float16" else "f"
+    return list(struct.unpack(f"<{dimensions}{code}", blob))
+
+
+class EmbeddingCache:
+    """Content-addressed cache that only sends unseen texts to the embedding model."""
+
+    def __init__(self, dtype: Optional[str] = None):
+        """
+        Args:
+            dtype: Storage precision, "float16" or "float32" (defaults to EMBEDDING_CACHE_DTYPE)
+        """
+        self.dtype = dtype or settings.EMBEDDING_CACHE_DTYPE
+        if self.dtype not in ("float16", "float32"):
+            raise ValueError(f"Unsupported embedding cache dtype: {self.dtype}")
+
+    def get_many(self, db: Session, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached embeddings in one query.
+
+        Returns:
+            Mapping of text hash to embedding for the hashes that were found
+        """
+        if not hashes:
+            return {}
+        rows = db.query(EmbeddingCacheEntry).filter(
+            EmbeddingCacheEntry.model == model,
+            EmbeddingCacheEntry.text_hash.in_(set(hashes))
+        ).all()
+        return {row.text_hash: decode_vector(row.vector, row.dtype, row.dimensions) for row in rows}
+
+    def put_many(self, db: Session, model: str, embeddings: Dict[str, List[float]]) -> None:
+        """
+        Store embeddings by text hash in the caller's transaction.
+
+        Entries another worker already wrote are skipped by the insert itself,
+        so a lost race neither raises nor aborts the transaction. Committing is
+        left to the caller.
+        """
+        if not embeddings:
+            return
+        rows = [
+            {
+                "model": model,
+                "text_hash": digest,
+                "dtype": self.dtype,
+                "dimensions": len(vector),
+                "vector": encode_vector(vector, self.dtype)
+            }
+            for digest, vector in embeddings.items()
+        ]
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            statement = postgresql_insert(EmbeddingCacheEntry).on_conflict_do_nothing()
+        elif dialect == "sqlite":
+            statement = sqlite_insert(EmbeddingCacheEntry).on_conflict_do_nothing()
+        else:
+            raise ValueError(f"Unsupported database for the embedding cache: {dialect}")
+        db.execute(statement, rows)
+
+    def get_or_compute(
+        self,
+        texts: List[str],
+        compute: ComputeFn,
+        model: Optional[str] = None,
+        db: Optional[Session] = None
+    ) -> List[List[float]]:
+        """
+        Embed texts, computing only the ones not already cached.
+
+        Duplicate texts in the batch are computed once.
+
+        Args:
+            texts: Texts to embed
+            compute: Batch embedding function called with the misses only
+            model: Embedding model name, part of the cache key (defaults to EMBEDDING_MODEL)
+            db: Database session; new entries join its transaction, and a
+                short-lived session is opened and committed if omitted
+
+        Returns:
+            One embedding per input text, in input order
+        """
+        model = model or settings.EMBEDDING_MODEL
+        if not texts:
+            return []
+        session = db or SessionLocal()
+        try:
+            hashes = [text_hash(t) for t in texts]
+            found = self.get_many(session, model, hashes)
+
+            misses: Dict[str, str] = {}
+            for digest, text in zip(hashes, texts):
+                if digest not in found and digest not in misses:
+                    misses[digest] = text
+            embedding_cache_lookups.inc(len(texts) - len(misses), model=model, outcome="hit")
+            embedding_cache_lookups.inc(len(misses), model=model, outcome="miss")
+
+            if misses:
+                computed = dict(zip(misses, compute(list(misses.values()))))
+                self.put_many(session, model, computed)
+                if db is None:
+                    session.commit()
+                found.update(computed)
+            return [found[digest] for digest in hashes]
+        finally:
+            if db is None:
+                session.close()
+
+
+# Global embedding cache instance
+embedding_cache: Optional[EmbeddingCache] = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get or create embedding cache instance."""
+    global embedding_cache
+    if embedding_cache is None:
+        embedding_cache = EmbeddingCache()
+    return embedding_cache
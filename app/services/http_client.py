@@ -0,0 +1,124 @@
+import warnings
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.metrics import registry
+
+openai_pool_connections = registry.gauge(
+    "openai_http_pool_connections", "Connections in the shared OpenAI HTTP pool", ["state"]
+)
+openai_pool_warmed = registry.gauge(
+    "openai_http_pool_warmed_connections", "Connections opened during start-up warm-up"
+)
+
+# Shared HTTP client used by the OpenAI SDK
+http_client: Optional[httpx.Client] = None
+
+
+def create_http_client() -> httpx.Client:
+    """
+    Build the pooled HTTP client described by the OPENAI_HTTP_* settings.
+
+    Returns:
+        A new httpx client
+    """
+    limits = httpx.Limits(
+        max_connections=settings.OPENAI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.OPENAI_HTTP_KEEPALIVE_EXPIRY_SECONDS
+    )
+    timeout = httpx.Timeout(
+        settings.OPENAI_HTTP_READ_TIMEOUT_SECONDS,
+        connect=settings.OPENAI_HTTP_CONNECT_TIMEOUT_SECONDS
+    )
+    try:
+        return httpx.Client(limits=limits, timeout=timeout, http2=settings.OPENAI_HTTP2)
+    except ImportError:
+        # HTTP/2 needs the optional `h2` package (httpx[http2])
+        warnings.warn("OPENAI_HTTP2 is enabled but h2 is not installed; falling back to HTTP/1.1", RuntimeWarning)
+        return httpx.Client(limits=limits, timeout=timeout)
+
+
+def get_http_client() -> httpx.Client:
+    """Get or create the shared HTTP client."""
+    global http_client
+    if http_client is None:
+        http_client = create_http_client()
+    return http_client
+
+
+def warm_up(client: httpx.Client, base_url: str, connections: Optional[int] = None) -> int:
+    """
+    Open keep-alive connections to `base_url` ahead of the first real request.
+
+    Requests are issued concurrently so each one lands on its own connection
+    and pays the TCP and TLS handshake now rather than on a user request.
+
+    Args:
+        client: Client whose pool is warmed
+        base_url: Upstream to connect to
+        connections: Number of connections to open (defaults to OPENAI_HTTP_WARMUP_CONNECTIONS)
+
+    Returns:
+        Number of connections that were established
+    """
+    connections = settings.OPENAI_HTTP_WARMUP_CONNECTIONS if connections is None else connections
+    if connections <= 0:
+        return 0
+
+    def touch(_):
+        try:
+            # Any response means the connection is up; the status is irrelevant
+            client.head(base_url)
+            return True
+        except httpx.HTTPError as e:
+            print(f"Error warming OpenAI connection: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        warmed = sum(executor.map(touch, range(connections)))
+    openai_pool_warmed.set(warmed)
+    return warmed
+
+
+def close_http_client() -> None:
+    """Close the shared HTTP client and release its connections."""
+    global http_client
+    if http_client is not None:
+        http_client.close()
+        http_client = None
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Describe the shared connection pool.
+
+    httpx has no public API for pool state, so this reads the httpcore
+    connection pool behind the default transport (httpx 0.24-0.28 with
+    httpcore 0.17-1.x: `Client._transport._pool.connections` and
+    `connection.is_idle()`). If that layout changes, or a custom transport is
+    mounted, the counts are reported as unavailable instead of failing.
+
+    Returns:
+        Dictionary with total, idle and active connection counts, and
+        whether they could be read
+    """
+    if http_client is None:
+        return {"total": 0, "idle": 0, "active": 0, "available": True}
+    try:
+        connections = list(http_client._transport._pool.connections)
+        idle = sum(1 for c in connections if c.is_idle())
+    except (AttributeError, TypeError):
+        return {"total": 0, "idle": 0, "active": 0, "available": False}
+    return {"total": len(connections), "idle": idle, "active": len(connections) - idle, "available": True}
+
+
+def _pool_gauge_values():
+    stats = pool_stats()
+    if not stats["available"]:
+        return {}
+    return {("idle",): stats["idle"], ("active",): stats["active"]}
+
+
+openai_pool_connections.set_function(_pool_gauge_values)
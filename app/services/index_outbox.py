@@ -0,0 +1,23 @@
+from sqlalchemy.orm import Session
+from app.models.database_models import IndexOutbox
+
+def record_index_change(db: Session, entity_type: str, entity_id: int, user_id: int, operation: str = "upsert") -> None:
+    """
+    Record that a task or chat history must be re-indexed.
+    
+    The row is added to the caller's session, so it commits (or rolls back)
+    in the same transaction as the change it describes.
+    
+    Args:
+        db: Session holding the write
+        entity_type: "task" or "chat"
+        entity_id: ID of the changed row
+        user_id: Owner of the changed row
+        operation: "upsert" or "delete"
+    """
+    db.add(IndexOutbox(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        user_id=user_id,
+        operation=operation
+    ))
@@ -0,0 +1,396 @@
+import datetime
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+import httpx
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.deadline import Deadline
+from app.metrics import registry
+from app.models.database_models import QuestionnaireJob
+from app.schemas import QuestionnaireJobRequest
+from app.services.question_service import QuestionService
+from app.tracing import get_tracer
+
+# Online job states; the batch pipeline uses pending and submitted instead
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+jobs_enqueued = registry.counter("jobs_enqueued_total", "Questionnaire jobs queued for the worker pool")
+jobs_finished = registry.counter("jobs_finished_total", "Questionnaire jobs the worker pool finished or requeued", ["status"])
+jobs_running = registry.gauge("jobs_running", "Questionnaire jobs being processed in this process")
+job_queue_wait = registry.histogram("job_queue_wait_seconds", "Time from queueing a job to a worker claiming it")
+job_webhook_failures = registry.counter("job_webhook_failures_total", "Webhook deliveries that failed after every retry")
+
+# Set when a job is queued in this process, so idle workers don't wait for the next poll
+_job_queued = threading.Event()
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _seconds_since(value: Optional[datetime.datetime], now: datetime.datetime) -> float:
+    """Seconds from `value` to `now`, treating naive values (SQLite) as UTC."""
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (now - value).total_seconds())
+
+
+def enqueue_questionnaire(db: Session, request: QuestionnaireJobRequest) -> QuestionnaireJob:
+    """
+    Queue a questionnaire analysis for the worker pool.
+
+    Returns:
+        The committed job
+    """
+    job = QuestionnaireJob(
+        user_id=request.user_id,
+        question_answers=json.dumps(request.question_answers),
+        model=request.model,
+        max_tokens=request.max_tokens,
+        temperature=request.temperature,
+        webhook_url=request.webhook_url,
+        status=QUEUED
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    jobs_enqueued.inc()
+    _job_queued.set()
+    return job
+
+
+def job_payload(job: QuestionnaireJob) -> Dict[str, Any]:
+    """A job as returned by GET /jobs/{id} and sent to its webhook."""
+    return {
+        "job_id": job.id,
+        "user_id": job.user_id,
+        "status": job.status,
+        "model": job.model,
+        "prompt": job.prompt,
+        "response": job.result,
+        "usage": json.loads(job.usage) if job.usage else None,
+        "error": job.error,
+        "attempts": job.attempts or 0,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "webhook_delivered_at": job.webhook_delivered_at,
+    }
+
+
+def webhook_url_error(url: str) -> Optional[str]:
+    """
+    Why a webhook URL may not be called, or None if it may.
+
+    Hosts in JOBS_WEBHOOK_ALLOWED_HOSTS, and their subdomains, are trusted as
+    configured. Without an allowlist every address the host resolves to must
+    be public, so a job can't be used to reach internal services.
+    """
+    parsed = urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return "webhook_url must be an http(s) URL"
+    host = parsed.hostname.lower()
+    allowed = [h.strip().lower() for h in settings.JOBS_WEBHOOK_ALLOWED_HOSTS.split(",") if h.strip()]
+    if allowed:
+        if any(host == h or host.endswith("." + h) for h in allowed):
+            return None
+        return f"webhook host {host} is not allowed"
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or 443, proto=socket.IPPROTO_TCP)}
+    except (OSError, UnicodeError, ValueError):
+        return f"webhook host {host} does not resolve"
+    for value in addresses:
+        address = ipaddress.ip_address(value.split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            return f"webhook host {host} resolves to a non-public address"
+    return None
+
+
+def workers_available() -> bool:
+    """Whether anything will run queued jobs: workers in this process, or standalone ones."""
+    return settings.JOBS_EXTERNAL_WORKERS or (job_worker_pool is not None and job_worker_pool.is_running)
+
+
+def sign_webhook(body: bytes, secret: str) -> str:
+    """Value of the X-Job-Signature header: an HMAC-SHA256 of the body."""
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+class JobWorkerPool:
+    """
+    Runs queued questionnaire jobs on a fixed number of worker threads.
+
+    Workers claim one job at a time with SELECT ... FOR UPDATE SKIP LOCKED, so
+    any number of pools, in the API processes or standalone, share one queue
+    without handing a job out twice. A running job whose worker died is
+    reclaimed once its lease expires; transient failures are retried with
+    backoff until JOBS_MAX_ATTEMPTS, and finished jobs are POSTed to their
+    webhook if they have one. Webhooks are delivered on their own threads so
+    a slow receiver never holds up a worker.
+    """
+
+    def __init__(
+        self,
+        question_service: Optional[QuestionService] = None,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        webhook_client: Optional[httpx.Client] = None
+    ):
+        """
+        Args:
+            question_service: Runs the analysis (defaults to the shared service and OpenAI client)
+            concurrency: Worker threads (defaults to JOBS_WORKER_CONCURRENCY)
+            poll_interval: Seconds an idle worker waits before looking again (defaults to JOBS_POLL_INTERVAL_SECONDS)
+            lease_seconds: How long a claimed job may run before it is reclaimed (defaults to JOBS_LEASE_SECONDS)
+            max_attempts: Claims per job before it fails for good (defaults to JOBS_MAX_ATTEMPTS)
+            webhook_client: HTTP client for webhook delivery
+        """
+        if question_service is None:
+            from app.services.openai_service import get_openai_service
+            from app.services.question_service import get_question_service
+            question_service = get_question_service(get_openai_service())
+        self.question_service = question_service
+        self.concurrency = concurrency or settings.JOBS_WORKER_CONCURRENCY
+        self.poll_interval = settings.JOBS_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        self.lease_seconds = lease_seconds or settings.JOBS_LEASE_SECONDS
+        self.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        self.webhook_client = webhook_client or httpx.Client(timeout=settings.JOBS_WEBHOOK_TIMEOUT_SECONDS)
+        self.webhook_executor = ThreadPoolExecutor(settings.JOBS_WEBHOOK_CONCURRENCY, thread_name_prefix="job-webhook")
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def claim(self, db: Session, limit: int = 1) -> List[int]:
+        """
+        Claim up to `limit` runnable jobs for this worker.
+
+        Jobs that were claimed too often already are failed instead.
+
+        Returns:
+            IDs of the claimed jobs, now running
+        """
+        now = utcnow()
+        candidates = (
+            db.query(QuestionnaireJob.id, QuestionnaireJob.status, QuestionnaireJob.attempts, QuestionnaireJob.created_at)
+            .filter(or_(
+                and_(QuestionnaireJob.status == QUEUED, or_(QuestionnaireJob.run_after == None, QuestionnaireJob.run_after <= now)),
+                and_(QuestionnaireJob.status == RUNNING, QuestionnaireJob.started_at < now - datetime.timedelta(seconds=self.lease_seconds))
+            ))
+            .order_by(QuestionnaireJob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+        claimed, exhausted = [], []
+        for job_id, status, attempts, created_at in candidates:
+            attempts = attempts or 0
+            if attempts >= self.max_attempts:
+                values = {"status": FAILED, "error": f"Gave up after {attempts} attempts", "finished_at": now}
+            else:
+                values = {"status": RUNNING, "attempts": attempts + 1, "started_at": now}
+            # Conditional on the state just read, which also keeps SQLite (no row locks) from double-claiming
+            updated = (
+                db.query(QuestionnaireJob)
+                .filter(QuestionnaireJob.id == job_id, QuestionnaireJob.status == status, QuestionnaireJob.attempts == attempts)
+                .update(values, synchronize_session=False)
+            )
+            if not updated:
+                continue
+            if values["status"] == RUNNING:
+                claimed.append(job_id)
+                job_queue_wait.observe(_seconds_since(created_at, now))
+            else:
+                exhausted.append(job_id)
+        db.commit()
+
+        for job_id in exhausted:
+            jobs_finished.inc(status=FAILED)
+            self.queue_webhook(job_id)
+        return claimed
+
+    def process(self, job_id: int) -> str:
+        """
+        Run one claimed job and store its result.
+
+        Returns:
+            The job's new status
+        """
+        db = SessionLocal()
+        jobs_running.inc()
+        try:
+            job = db.get(QuestionnaireJob, job_id)
+            with get_tracer().trace("job questionnaire", attributes={"job.id": job.id, "job.attempt": job.attempts}) as span:
+                try:
+                    result = self.question_service.process_question_answers(
+                        user_id=job.user_id,
+                        question_answers=json.loads(job.question_answers),
+                        model=job.model,
+                        max_tokens=job.max_tokens,
+                        temperature=job.temperature,
+                        db=db,
+                        deadline=Deadline.after(settings.LLM_DEADLINE_SECONDS)
+                    )
+                    job.status = COMPLETED
+                    job.prompt = result["prompt"]
+                    job.result = result["response"]
+                    job.usage = json.dumps(result["usage"])
+                    job.error = None
+                except ValueError as e:
+                    # Bad input fails the same way on every attempt
+                    span.record_exception(e)
+                    job.status, job.error = FAILED, str(e)
+                except Exception as e:
+                    span.record_exception(e)
+                    job.error = str(e)
+                    if job.attempts >= self.max_attempts:
+                        job.status = FAILED
+                    else:
+                        job.status = QUEUED
+                        job.run_after = utcnow() + datetime.timedelta(
+                            seconds=settings.JOBS_RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1)
+                        )
+                span.set_attribute("job.status", job.status)
+
+            if job.status != QUEUED:
+                job.finished_at = utcnow()
+            db.commit()
+            jobs_finished.inc(status=job.status)
+            if job.status != QUEUED and job.webhook_url:
+                self.queue_webhook(job.id)
+            return job.status
+        finally:
+            jobs_running.dec()
+            db.close()
+
+    def queue_webhook(self, job_id: int) -> "Future[bool]":
+        """Deliver a finished job's webhook on the webhook threads."""
+        return self.webhook_executor.submit(self.deliver_webhook, job_id)
+
+    def deliver_webhook(self, job_id: int) -> bool:
+        """
+        POST a finished job to its webhook URL, retrying with backoff.
+
+        The body is the same JSON as GET /jobs/{id}, signed in X-Job-Signature
+        when JOBS_WEBHOOK_SECRET is set. Delivery is at least once: receivers
+        should de-duplicate on job_id. The URL is checked again before sending,
+        since its host may resolve differently than when the job was queued.
+
+        Returns:
+            Whether the webhook accepted the job (False if there is none)
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(QuestionnaireJob, job_id)
+            if job is None or not job.webhook_url:
+                return False
+            error = webhook_url_error(job.webhook_url)
+            if error:
+                job_webhook_failures.inc()
+                print(f"Not delivering webhook for job {job.id}: {error}")
+                return False
+            body = json.dumps(job_payload(job), default=str).encode("utf-8")
+            headers = {"Content-Type": "application/json"}
+            if settings.JOBS_WEBHOOK_SECRET:
+                headers["X-Job-Signature"] = sign_webhook(body, settings.JOBS_WEBHOOK_SECRET)
+
+            for attempt in range(settings.JOBS_WEBHOOK_RETRIES + 1):
+                if attempt:
+                    time.sleep(min(0.5 * 2 ** attempt, 10.0))
+                try:
+                    response = self.webhook_client.post(job.webhook_url, content=body, headers=headers, follow_redirects=False)
+                    if response.status_code < 300:
+                        job.webhook_delivered_at = utcnow()
+                        db.commit()
+                        return True
+                    # Client errors won't go away on retry
+                    if response.status_code < 500 and response.status_code != 429:
+                        break
+                except httpx.HTTPError as e:
+                    print(f"Error delivering webhook for job {job.id}: {e}")
+            job_webhook_failures.inc()
+            print(f"Giving up on webhook for job {job.id}")
+            return False
+        finally:
+            db.close()
+
+    def run_once(self) -> Optional[str]:
+        """Claim and process one job; returns its new status, or None if nothing was runnable."""
+        db = SessionLocal()
+        try:
+            job_ids = self.claim(db)
+        finally:
+            db.close()
+        return self.process(job_ids[0]) if job_ids else None
+
+    def work(self, stop: threading.Event) -> None:
+        """Worker thread loop: run jobs until `stop` is set, waiting for new ones when idle."""
+        while not stop.is_set():
+            try:
+                if self.run_once() is not None:
+                    continue
+            except Exception as e:
+                print(f"Error running queued job: {e}")
+            _job_queued.wait(self.poll_interval)
+            _job_queued.clear()
+
+    def wake(self) -> None:
+        """Cut idle workers' sleep short, e.g. so a newly set `stop` is seen at once."""
+        _job_queued.set()
+
+    def start(self, stop: threading.Event) -> List[threading.Thread]:
+        """Start the worker threads; they exit once `stop` is set."""
+        threads = []
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self.work, args=(stop,), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        self._threads.extend(threads)
+        return threads
+
+    def run_forever(self, stop: Optional[threading.Event] = None) -> None:
+        """Run the worker threads in the foreground until `stop` is set."""
+        stop = stop or threading.Event()
+        self.start(stop)
+        try:
+            while not stop.is_set():
+                stop.wait(1.0)
+        except KeyboardInterrupt:
+            stop.set()
+        for thread in self._threads:
+            thread.join()
+        self.webhook_executor.shutdown(wait=True)
+
+
+# Global worker pool instance
+job_worker_pool: Optional[JobWorkerPool] = None
+
+def get_job_worker_pool() -> JobWorkerPool:
+    """Get or create the worker pool."""
+    global job_worker_pool
+    if job_worker_pool is None:
+        job_worker_pool = JobWorkerPool()
+    return job_worker_pool
+
+
+if __name__ == "__main__":
+    print(f"Starting {settings.JOBS_WORKER_CONCURRENCY} questionnaire job workers...")
+    get_job_worker_pool().run_forever()
@@ -1,23 +1,76 @@
 import openai
-from typing import List, Dict, Any, Optional
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Iterator, Optional, Callable
 from app.config import settings
+from app.deadline import Deadline, DeadlineExceeded
+from app.metrics import registry
+from app.telemetry import record_llm_time
+from app.tracing import current_span, get_tracer
+from app.services.http_client import get_http_client, close_http_client
+
+# Upstream failures that are worth retrying within the remaining budget
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+llm_latency = registry.histogram(
+    "llm_request_duration_seconds", "Latency of successful OpenAI calls", ["operation", "model"]
+)
+llm_retries = registry.counter(
+    "llm_retries_total", "OpenAI calls retried after a transient error", ["operation", "model"]
+)
+llm_hedges_fired = registry.counter(
+    "llm_hedges_fired_total", "Duplicate OpenAI calls issued after the hedge delay", ["operation", "model"]
+)
+llm_hedge_wins = registry.counter(
+    "llm_hedge_wins_total", "Hedged calls that answered before the original", ["operation", "model"]
+)
+llm_prompt_tokens = registry.counter(
+    "llm_prompt_tokens_total", "Prompt tokens sent to OpenAI", ["operation", "model"]
+)
+llm_cached_prompt_tokens = registry.counter(
+    "llm_cached_prompt_tokens_total", "Prompt tokens served from the provider's prompt cache", ["operation", "model"]
+)
+llm_hedge_wasted_tokens = registry.counter(
+    "llm_hedge_wasted_tokens_total", "Tokens billed for the losing side of a hedged call", ["operation", "model"]
+)
+
+# A losing hedged stream would hold its connection open, so streams are never hedged
+UNHEDGED_OPERATIONS = {"chat_stream"}
+
+# Shared pool used to race hedged calls
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=settings.LLM_HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge"
+)
 
 class OpenAIService:
     """Service class for OpenAI API interactions."""
     
     def __init__(self):
-        """Initialize OpenAI client with API key."""
+        """Initialize OpenAI client with API key and the shared pooled transport."""
         if not settings.is_openai_configured:
             raise ValueError("OpenAI API key not configured")
         
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Retries are handled here so they can respect the caller's deadline
+        self.client = openai.OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            max_retries=0,
+            http_client=get_http_client()
+        )
     
     def chat_completion(
         self,
         messages: List[Dict[str, str]],
         model: str = "gpt-3.5-turbo",
         max_tokens: int = 1000,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """
         Generate chat completion using OpenAI API.
@@ -27,37 +80,112 @@ class OpenAIService:
             model: OpenAI model to use
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
+            deadline: Latency budget for the call, including retries
             
         Returns:
             Dictionary containing response and usage information
         """
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature
+            response = self._call_with_budget(
+                "chat",
+                model,
+                deadline,
+                lambda client: client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
             )
             
             return {
                 "response": response.choices[0].message.content,
                 "model": model,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                } if response.usage else None
+                "usage": self._usage(response.usage, "chat", model)
             }
             
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+    
+    def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-3.5-turbo",
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Generate a chat completion, yielding the reply as it is produced.
+        
+        Opening the stream is retried like any other call; once tokens flow,
+        an error or the deadline ends the stream.
+        
+        Args:
+            messages: List of chat messages as dicts
+            model: OpenAI model to use
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            deadline: Latency budget for the whole reply
+            
+        Yields:
+            {"type": "delta", "content": ...} per chunk of text, then
+            {"type": "done", "response", "model", "usage"} like chat_completion
+        """
+        if deadline is None:
+            deadline = Deadline.after(settings.LLM_DEADLINE_SECONDS)
+        try:
+            stream = self._call_with_budget(
+                "chat_stream",
+                model,
+                deadline,
+                lambda client: client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+        
+        parts: List[str] = []
+        usage = None
+        try:
+            for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield {"type": "delta", "content": chunk.choices[0].delta.content}
+                deadline.check("OpenAI chat stream")
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
+        finally:
+            stream.close()
+        
+        yield {
+            "type": "done",
+            "response": "".join(parts),
+            "model": model,
+            "usage": self._usage(usage, "chat_stream", model)
+        }
     
     def text_completion(
         self,
         prompt: str,
         model: str = "gpt-3.5-turbo",
         max_tokens: int = 500,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """
         Generate text completion using OpenAI API.
@@ -67,31 +195,229 @@ class OpenAIService:
             model: OpenAI model to use
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
+            deadline: Latency budget for the call, including retries
             
         Returns:
             Dictionary containing generated text and usage information
         """
         try:
-            response = self.client.completions.create(
-                model=model,
-                prompt=prompt,
-                max_tokens=max_tokens,
-                temperature=temperature
+            response = self._call_with_budget(
+                "completion",
+                model,
+                deadline,
+                lambda client: client.completions.create(
+                    model=model,
+                    prompt=prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
             )
             
             return {
                 "generated_text": response.choices[0].text.strip(),
                 "model": model,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                } if response.usage else None
+                "usage": self._usage(response.usage, "completion", model)
             }
             
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+    
+    def create_embeddings(
+        self,
+        texts: List[str],
+        model: Optional[str] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[List[float]]:
+        """
+        Embed a batch of texts in a single OpenAI request.
+        
+        Args:
+            texts: Texts to embed
+            model: Embedding model to use (defaults to EMBEDDING_MODEL)
+            deadline: Latency budget for the call, including retries
+            
+        Returns:
+            One embedding per input text, in input order
+        """
+        model = model or settings.EMBEDDING_MODEL
+        if not texts:
+            return []
+        try:
+            response = self._call_with_budget(
+                "embeddings",
+                model,
+                deadline,
+                lambda client: client.embeddings.create(model=model, input=texts)
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
     
+    @staticmethod
+    def _usage(usage: Any, operation: str, model: str) -> Optional[Dict[str, int]]:
+        """Convert response usage to a dict, including prompt tokens served from cache."""
+        if not usage:
+            return None
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        llm_prompt_tokens.inc(usage.prompt_tokens, operation=operation, model=model)
+        llm_cached_prompt_tokens.inc(cached_tokens, operation=operation, model=model)
+        return {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+            "cached_tokens": cached_tokens
+        }
+    
+    def _call_with_budget(
+        self,
+        operation: str,
+        model: str,
+        deadline: Optional[Deadline],
+        request: Callable[[openai.OpenAI], Any]
+    ) -> Any:
+        """
+        Run an OpenAI request with exponential-backoff retries inside a deadline.
+        
+        Each attempt gets the remaining budget as its timeout, and a retry is
+        only scheduled if its backoff still fits in what is left.
+        
+        Args:
+            operation: Name of the API operation, used for metrics
+            model: OpenAI model being called
+            deadline: Latency budget; defaults to LLM_DEADLINE_SECONDS
+            request: Callable issuing the request with a configured client
+            
+        Returns:
+            The raw OpenAI response object
+        """
+        if deadline is None:
+            deadline = Deadline.after(settings.LLM_DEADLINE_SECONDS)
+        
+        # Charged to the current HTTP request, retries and backoff included
+        started = time.monotonic()
+        with get_tracer().span(f"openai.{operation}", {"llm.model": model}) as span:
+            try:
+                response = self._with_retries(operation, model, deadline, request)
+            finally:
+                record_llm_time(time.monotonic() - started)
+            usage = getattr(response, "usage", None)
+            if usage:
+                span.set_attributes({
+                    "llm.prompt_tokens": usage.prompt_tokens,
+                    "llm.completion_tokens": getattr(usage, "completion_tokens", None),
+                    "llm.total_tokens": usage.total_tokens,
+                })
+            return response
+    
+    def _with_retries(
+        self,
+        operation: str,
+        model: str,
+        deadline: Deadline,
+        request: Callable[[openai.OpenAI], Any]
+    ) -> Any:
+        """Retry loop behind _call_with_budget."""
+        attempt = 0
+        while True:
+            timeout = deadline.check(f"OpenAI {operation} call")
+            try:
+                return self._attempt(operation, model, timeout, request)
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > settings.LLM_MAX_RETRIES:
+                    raise
+                # Full jitter keeps concurrent retries from synchronising
+                delay = random.uniform(0, min(
+                    settings.LLM_BACKOFF_MAX_SECONDS,
+                    settings.LLM_BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))
+                ))
+                if delay >= deadline.remaining():
+                    raise DeadlineExceeded(
+                        f"Deadline exceeded while retrying OpenAI {operation} call: {str(e)}"
+                    ) from e
+                llm_retries.inc(operation=operation, model=model)
+                current_span().set_attribute("llm.retries", attempt)
+                time.sleep(delay)
+    
+    def _attempt(
+        self,
+        operation: str,
+        model: str,
+        timeout: float,
+        request: Callable[[openai.OpenAI], Any]
+    ) -> Any:
+        """Issue a single attempt, hedging it once the p95 latency has passed."""
+        client = self.client.with_options(timeout=timeout)
+        hedge_delay = self._hedge_delay(operation, model)
+        if hedge_delay is None or hedge_delay >= timeout:
+            return self._timed(operation, model, request, client)
+        
+        started = time.monotonic()
+        primary = _hedge_executor.submit(self._timed, operation, model, request, client)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+        
+        llm_hedges_fired.inc(operation=operation, model=model)
+        hedge = _hedge_executor.submit(self._timed, operation, model, request, client)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            remaining = timeout - (time.monotonic() - started)
+            done, pending = wait(pending, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                if future is hedge:
+                    llm_hedge_wins.inc(operation=operation, model=model)
+                # The loser keeps running; bill its tokens to the hedge cost
+                for loser in pending:
+                    loser.add_done_callback(
+                        lambda f: self._record_wasted_tokens(f, operation, model)
+                    )
+                return future.result()
+        
+        if error is not None:
+            raise error
+        raise DeadlineExceeded(f"Deadline exceeded waiting for hedged OpenAI {operation} call")
+    
+    def _timed(
+        self,
+        operation: str,
+        model: str,
+        request: Callable[[openai.OpenAI], Any],
+        client: openai.OpenAI
+    ) -> Any:
+        """Issue a request and record its latency if it succeeds."""
+        started = time.monotonic()
+        response = request(client)
+        llm_latency.observe(time.monotonic() - started, operation=operation, model=model)
+        return response
+    
+    def _hedge_delay(self, operation: str, model: str) -> Optional[float]:
+        """Latency after which a duplicate request is fired, or None to disable hedging."""
+        if not settings.LLM_HEDGE_ENABLED or operation in UNHEDGED_OPERATIONS:
+            return None
+        if llm_latency.count(operation=operation, model=model) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return llm_latency.quantile(settings.LLM_HEDGE_QUANTILE, operation=operation, model=model)
+    
+    @staticmethod
+    def _record_wasted_tokens(future: Future, operation: str, model: str) -> None:
+        if future.exception() is not None:
+            return
+        usage = getattr(future.result(), "usage", None)
+        if usage is not None:
+            llm_hedge_wasted_tokens.inc(usage.total_tokens, operation=operation, model=model)
+    
     def get_models(self) -> List[str]:
         """
         Get list of available OpenAI models.
@@ -113,4 +439,10 @@ def get_openai_service() -> OpenAIService:
     global openai_service
     if openai_service is None:
         openai_service = OpenAIService()
-    return openai_service 
\ No newline at end of file
+    return openai_service
+
+def close_openai_service() -> None:
+    """Drop the OpenAI service instance and close its shared transport."""
+    global openai_service
+    openai_service = None
+    close_http_client()
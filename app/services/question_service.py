@@ -1,7 +1,11 @@
 from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
+from app.config import settings
+from app.deadline import Deadline
+from app.tokenizer import count_tokens, truncate_to_tokens
 from app.models.database_models import User
 from app.services.openai_service import OpenAIService
+from app.tracing import get_tracer
 
 class QuestionService:
     """Service class for processing question-answer pairs and generating prompts."""
@@ -10,13 +14,22 @@ class QuestionService:
         """Initialize the question service with OpenAI service."""
         self.openai_service = openai_service
     
-    def build_prompt_from_answers(self, question_answers: Dict[str, str], user_name: str = "User") -> str:
+    def build_prompt_from_answers(
+        self,
+        question_answers: Dict[str, str],
+        user_name: str = "User",
+        max_answer_tokens: Optional[int] = None
+    ) -> str:
         """
         Build a prompt from question-answer pairs.
         
+        Each answer is capped at PROMPT_MAX_ITEM_TOKENS and answers are added
+        in order until the answers section budget is used up.
+        
         Args:
             question_answers: Dictionary mapping question IDs to answers
             user_name: Name of the user (optional)
+            max_answer_tokens: Token budget for all answers (defaults to PROMPT_BUDGET_ANSWERS_TOKENS)
             
         Returns:
             Formatted prompt string
@@ -31,9 +44,17 @@ class QuestionService:
             "Answers:"
         ]
         
-        # Add each question-answer pair
+        # Add each question-answer pair while it fits the budget
+        budget = max_answer_tokens if max_answer_tokens is not None else settings.PROMPT_BUDGET_ANSWERS_TOKENS
         for question_id, answer in question_answers.items():
-            prompt_parts.append(f"Question {question_id}: {answer}")
+            line = truncate_to_tokens(
+                f"Question {question_id}: {answer}",
+                min(settings.PROMPT_MAX_ITEM_TOKENS, budget)
+            )
+            if not line:
+                break
+            budget -= count_tokens(line) + 1
+            prompt_parts.append(line)
         
         prompt_parts.extend([
             "",
@@ -53,7 +74,8 @@ class QuestionService:
         model: str = "gpt-3.5-turbo",
         max_tokens: int = 1000,
         temperature: float = 0.7,
-        db: Optional[Session] = None
+        db: Optional[Session] = None,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """
         Process question-answer pairs and generate OpenAI response.
@@ -65,6 +87,7 @@ class QuestionService:
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
             db: Database session (optional)
+            deadline: Latency budget for the OpenAI call (optional)
             
         Returns:
             Dictionary containing prompt, response, and usage information
@@ -72,23 +95,26 @@ class QuestionService:
         # Get user information if database is available
         user_name = "User"
         if db:
-            try:
-                user = db.query(User).filter(User.id == user_id).first()
-                if user:
-                    user_name = user.name
-            except Exception as e:
-                # Log error but continue with default user name
-                print(f"Error fetching user: {e}")
+            with get_tracer().span("questionnaire.user_lookup", {"user.id": user_id}):
+                try:
+                    user = db.query(User).filter(User.id == user_id).first()
+                    if user:
+                        user_name = user.name
+                except Exception as e:
+                    # Log error but continue with default user name
+                    print(f"Error fetching user: {e}")
         
         # Build prompt from answers
-        prompt = self.build_prompt_from_answers(question_answers, user_name)
+        with get_tracer().span("questionnaire.build_prompt", {"questionnaire.answers": len(question_answers)}):
+            prompt = self.build_prompt_from_answers(question_answers, user_name)
         
         # Generate response using OpenAI
         result = self.openai_service.text_completion(
             prompt=prompt,
             model=model,
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            deadline=deadline
         )
         
         return {
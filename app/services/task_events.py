@@ -0,0 +1,41 @@
+import json
+from typing import Any, Dict
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.database_models import TaskEvent
+
+def event_payload(event: TaskEvent) -> Dict[str, Any]:
+    """A task event as sent in NOTIFY payloads and on the change feed."""
+    return {
+        "id": event.id,
+        "user_id": event.user_id,
+        "task_id": event.task_id,
+        "version": event.version,
+        "deleted": bool(event.deleted),
+    }
+
+def record_task_event(db: Session, change: Dict[str, Any]) -> TaskEvent:
+    """
+    Log a task change for the change feed.
+
+    Like record_index_change, the row is part of the caller's transaction. On
+    Postgres a NOTIFY with the event is issued too; it is only delivered if
+    the transaction commits, so listeners never see a change that was rolled back.
+
+    Args:
+        db: Session holding the write
+        change: The changed task as described by task_change or update_tasks;
+            deletions are logged one version past the task's last one
+    """
+    event = TaskEvent(
+        user_id=change["user_id"],
+        task_id=change["id"],
+        version=change["version"] + 1 if change.get("deleted") else change["version"],
+        deleted=bool(change.get("deleted"))
+    )
+    db.add(event)
+    db.flush()
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_notify(settings.TASK_FEED_CHANNEL, json.dumps(event_payload(event)))))
+    return event
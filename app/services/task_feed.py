@@ -0,0 +1,320 @@
+import asyncio
+import datetime
+import json
+import select
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, engine as app_engine
+from app.metrics import registry
+from app.models.database_models import TaskEvent
+from app.services.task_events import event_payload
+from app.services.task_update_service import on_tasks_changed, remove_tasks_changed_listener
+
+# How often the listener prunes task_events older than TASK_FEED_RETENTION_HOURS
+PRUNE_INTERVAL_SECONDS = 3600
+
+task_feed_subscribers = registry.gauge("task_feed_subscribers", "Open task change feed streams")
+task_feed_events = registry.counter("task_feed_events_total", "Task change events delivered to feed streams")
+task_feed_overflows = registry.counter("task_feed_overflows_total", "Feed streams closed because the client fell behind")
+
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """One Server-Sent Events message."""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """One open feed stream: a queue of a user's events, filled from the listener thread."""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, max_pending: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.max_pending = max_pending
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+        self.overflowed = False
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        """Queue an event; runs on the subscriber's event loop."""
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_pending:
+            # The client can't keep up; end its stream so it resumes from the log
+            self.overflowed = True
+            task_feed_overflows.inc()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+
+class TaskFeedHub:
+    """
+    Fans task change events out to the feed streams open in this process.
+
+    On Postgres a single connection LISTENs on TASK_FEED_CHANNEL, so each
+    worker needs one idle connection however many clients are subscribed. On
+    other databases the task_events table is polled instead, and writes made
+    in this process wake the poller at once. Either way, events missed while
+    the listener was down are read back from task_events when it recovers.
+    """
+
+    def __init__(self, engine: Optional[Engine] = None, poll_interval: Optional[float] = None, max_pending: Optional[int] = None):
+        """
+        Args:
+            engine: Database to listen on (defaults to the application engine)
+            poll_interval: Seconds between polls without LISTEN/NOTIFY (defaults to TASK_FEED_POLL_INTERVAL_SECONDS)
+            max_pending: Events a stream may fall behind, and catch up on, before it
+                is told to reset (defaults to TASK_FEED_MAX_PENDING)
+        """
+        self.engine = engine or app_engine
+        self.poll_interval = settings.TASK_FEED_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        self.max_pending = max_pending or settings.TASK_FEED_MAX_PENDING
+        self.lag_events = settings.TASK_FEED_POLL_LAG_EVENTS
+        self.last_event_id: Optional[int] = None
+        # Event IDs below last_event_id already seen by catch_up, to spot late commits
+        self._lag_seen: Optional[Set[int]] = None
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._last_prune = time.monotonic()
+
+    @property
+    def uses_notify(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Start receiving a user's events; call from the stream's event loop."""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        task_feed_subscribers.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+        task_feed_subscribers.dec()
+
+    def publish(self, events: List[Dict[str, Any]]) -> None:
+        """Hand events to the streams of their users; safe to call from any thread."""
+        for event in events:
+            with self._lock:
+                subscriptions = list(self._subscriptions.get(event["user_id"], ()))
+                self.last_event_id = max(self.last_event_id or 0, event["id"])
+            for subscription in subscriptions:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+    def backlog(self, db: Session, user_id: int, since: Optional[int]) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+        """
+        Events a resuming client missed, and the newest event ID.
+
+        Returns:
+            (events after `since`, or None if they can no longer all be replayed,
+            newest event ID); without a resume token the event list is empty
+        """
+        head = db.query(func.max(TaskEvent.id)).scalar() or 0
+        with self._lock:
+            if self.last_event_id is None:
+                self.last_event_id = head
+        if since is None or since >= head:
+            return [], head
+        oldest = db.query(func.min(TaskEvent.id)).scalar()
+        if oldest is not None and since < oldest - 1:
+            # Pruned by retention
+            return None, head
+        rows = (
+            db.query(TaskEvent)
+            .filter(TaskEvent.user_id == user_id, TaskEvent.id > since)
+            .order_by(TaskEvent.id)
+            .limit(self.max_pending + 1)
+            .all()
+        )
+        if len(rows) > self.max_pending:
+            return None, head
+        return [event_payload(row) for row in rows], head
+
+    async def stream(self, subscription: Subscription, backlog: Optional[List[Dict[str, Any]]], head: int) -> AsyncIterator[str]:
+        """
+        Server-Sent Events for one subscription.
+
+        Replayed events come first, or a reset if they could not be replayed,
+        then a ready message carrying the newest event ID, then live events
+        and a comment line every TASK_FEED_HEARTBEAT_SECONDS so proxies keep
+        the connection open. Ends if the client falls too far behind.
+        """
+        try:
+            replayed = set()
+            if backlog is None:
+                yield format_sse("reset", {"reason": "Missed changes are no longer available; fetch the task list again"})
+            else:
+                for event in backlog:
+                    replayed.add(event["id"])
+                    yield format_sse("task", event, event["id"])
+            yield format_sse("ready", {"last_event_id": head}, head)
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=settings.TASK_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                if event["id"] in replayed:
+                    continue
+                task_feed_events.inc()
+                yield format_sse("task", event, event["id"])
+        finally:
+            self.unsubscribe(subscription)
+
+    def catch_up(self) -> int:
+        """
+        Publish events committed since the last one seen, for subscribed users.
+
+        With several writers, event IDs can commit out of order: a transaction
+        holding ID 41 may commit after 42 was read. The last
+        TASK_FEED_POLL_LAG_EVENTS IDs are therefore re-read on every call and
+        any that appeared since the previous call are published late. An event
+        that commits after that many newer IDs is still missed; clients see it
+        on their next reload.
+
+        Returns:
+            Number of events published
+        """
+        with self._lock:
+            user_ids = list(self._subscriptions)
+            if not user_ids:
+                # Nobody to catch up; the next stream's backlog read sets the starting point
+                self.last_event_id = None
+                self._lag_seen = None
+            after = self.last_event_id
+        if after is None:
+            return 0
+        db = SessionLocal()
+        try:
+            window = (
+                db.query(TaskEvent.id, TaskEvent.user_id)
+                .filter(TaskEvent.id > after - self.lag_events, TaskEvent.id <= after)
+                .all()
+            )
+            late_ids = []
+            if self._lag_seen is not None:
+                subscribed = set(user_ids)
+                late_ids = [event_id for event_id, user_id in window if event_id not in self._lag_seen and user_id in subscribed]
+            late = db.query(TaskEvent).filter(TaskEvent.id.in_(late_ids)).order_by(TaskEvent.id).all() if late_ids else []
+            rows = (
+                db.query(TaskEvent)
+                .filter(TaskEvent.id > after, TaskEvent.user_id.in_(user_ids))
+                .order_by(TaskEvent.id)
+                .limit(self.max_pending)
+                .all()
+            )
+            latest = db.query(func.max(TaskEvent.id)).scalar() if len(rows) < self.max_pending else None
+        finally:
+            db.close()
+        self._lag_seen = {event_id for event_id, _ in window} | {row.id for row in rows}
+        self.publish([event_payload(row) for row in late + rows])
+        if latest is not None:
+            with self._lock:
+                self.last_event_id = max(self.last_event_id or 0, latest)
+        return len(late) + len(rows)
+
+    def prune(self) -> int:
+        """Delete events older than TASK_FEED_RETENTION_HOURS; clients behind them get a reset."""
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=settings.TASK_FEED_RETENTION_HOURS)
+        db = SessionLocal()
+        try:
+            deleted = db.query(TaskEvent).filter(TaskEvent.created_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def _maybe_prune(self) -> None:
+        if time.monotonic() - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+        try:
+            self.prune()
+        except Exception as e:
+            print(f"Error pruning task events: {e}")
+
+    def _listen(self, stop: threading.Event) -> None:
+        """Receive NOTIFYs on one dedicated connection, reconnecting after failures."""
+        while not stop.is_set():
+            try:
+                with self.engine.connect() as conn:
+                    conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+                    conn.exec_driver_sql(f'LISTEN "{settings.TASK_FEED_CHANNEL}"')
+                    raw = conn.connection.dbapi_connection
+                    # Anything committed before LISTEN took effect
+                    self.catch_up()
+                    while not stop.is_set():
+                        self._maybe_prune()
+                        if select.select([raw], [], [], 5.0) == ([], [], []):
+                            continue
+                        raw.poll()
+                        events = []
+                        while raw.notifies:
+                            events.append(json.loads(raw.notifies.pop(0).payload))
+                        self.publish(events)
+            except Exception as e:
+                print(f"Task feed listener error, reconnecting: {e}")
+                stop.wait(1.0)
+
+    def _poll(self, stop: threading.Event) -> None:
+        """Read new events from task_events until `stop` is set."""
+        wake = lambda changes: self._wakeup.set()
+        on_tasks_changed(wake)
+        try:
+            while not stop.is_set():
+                self._maybe_prune()
+                try:
+                    # Drain a backlog in full batches before waiting again
+                    while self.catch_up() >= self.max_pending:
+                        pass
+                except Exception as e:
+                    print(f"Error polling task events: {e}")
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+        finally:
+            remove_tasks_changed_listener(wake)
+
+    def run_forever(self, stop: Optional[threading.Event] = None) -> None:
+        stop = stop or threading.Event()
+        if self.uses_notify:
+            self._listen(stop)
+        else:
+            self._poll(stop)
+
+    def wake(self) -> None:
+        """Cut the poller's sleep short, e.g. so a newly set `stop` is seen at once."""
+        self._wakeup.set()
+
+    def start(self, stop: threading.Event) -> threading.Thread:
+        """Start the listener thread; it exits once `stop` is set."""
+        thread = threading.Thread(target=self.run_forever, args=(stop,), name="task-feed", daemon=True)
+        thread.start()
+        return thread
+
+
+# Global task feed hub instance
+task_feed_hub: Optional[TaskFeedHub] = None
+
+def get_task_feed_hub() -> TaskFeedHub:
+    """Get or create the task feed hub."""
+    global task_feed_hub
+    if task_feed_hub is None:
+        task_feed_hub = TaskFeedHub()
+    return task_feed_hub
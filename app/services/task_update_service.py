@@ -0,0 +1,133 @@
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import case, literal, update
+from sqlalchemy.orm import Session
+from app.models.database_models import Task as TaskModel
+from app.schemas import TaskUpdate
+from app.services.index_outbox import record_index_change
+from app.services.task_events import record_task_event
+
+# Fields an automated caller may change; the same ones the PUT /tasks endpoint accepts
+TASK_UPDATE_FIELDS = tuple(TaskUpdate.model_fields)
+
+# Columns reported for a changed task, both to callers and to change listeners
+TASK_CHANGE_COLUMNS = ("id", "user_id", "name", "description", "priority", "is_completed", "start_time", "due_at", "version")
+NULLABLE_TASK_FIELDS = ("description", "start_time", "due_at")
+
+TaskChangeListener = Callable[[List[Dict[str, Any]]], None]
+_listeners: List[TaskChangeListener] = []
+
+
+class TaskUpdateError(ValueError):
+    """Raised for a task update that names an unknown field or an invalid value."""
+
+
+def on_tasks_changed(listener: TaskChangeListener) -> TaskChangeListener:
+    """
+    Register a callback run after task updates commit, e.g. to drop cached tasks.
+
+    The callback receives task dicts with TASK_CHANGE_COLUMNS, plus
+    "deleted": True for removed tasks. Can be used as a decorator.
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def remove_tasks_changed_listener(listener: TaskChangeListener) -> None:
+    """Unregister a callback added with on_tasks_changed; unknown callbacks are ignored."""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def task_change(task: TaskModel, deleted: bool = False) -> Dict[str, Any]:
+    """Describe a task the way update_tasks reports it, for notify_tasks_changed."""
+    change = {column: getattr(task, column) for column in TASK_CHANGE_COLUMNS}
+    if deleted:
+        change["deleted"] = True
+    return change
+
+
+def notify_tasks_changed(tasks: List[Dict[str, Any]]) -> None:
+    """Run every registered task change listener, isolating their failures."""
+    for listener in list(_listeners):
+        try:
+            listener(tasks)
+        except Exception as e:
+            print(f"Error in task change listener: {e}")
+
+
+def parse_task_updates(params: Any) -> Dict[int, Dict[str, Any]]:
+    """
+    Validate one update or a list of updates of the form {task_id, field, value}.
+
+    Several updates to the same task are merged.
+
+    Returns:
+        Mapping of task ID to validated {field: value}
+    """
+    items = params if isinstance(params, list) else [params]
+    updates: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        try:
+            task_id, field, value = int(item["task_id"]), item["field"], item["value"]
+        except (KeyError, TypeError, ValueError):
+            raise TaskUpdateError("Each update needs task_id, field and value")
+        if field not in TASK_UPDATE_FIELDS:
+            raise TaskUpdateError(f"Field '{field}' cannot be updated; allowed: {', '.join(TASK_UPDATE_FIELDS)}")
+        try:
+            validated = getattr(TaskUpdate(**{field: value}), field)
+        except Exception as e:
+            raise TaskUpdateError(f"Invalid value for '{field}': {e}")
+        if validated is None and field not in NULLABLE_TASK_FIELDS:
+            raise TaskUpdateError(f"Field '{field}' cannot be null")
+        updates.setdefault(task_id, {})[field] = validated
+    return updates
+
+
+def update_tasks(db: Session, updates: Dict[int, Dict[str, Any]], user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Apply validated updates to any number of tasks in a single UPDATE ... RETURNING.
+
+    Each touched column is set with a CASE on the task ID, so different tasks
+    can receive different fields and values in the same statement, and every
+    version is bumped. Index outbox rows and change feed events are written
+    in the same transaction, and change listeners run after the commit.
+
+    Args:
+        db: Database session
+        updates: Output of parse_task_updates
+        user_id: Only update tasks owned by this user (optional)
+
+    Returns:
+        The updated tasks as dicts; IDs that did not match are left out
+    """
+    if not updates:
+        return []
+    fields = sorted({field for values in updates.values() for field in values})
+    assignments = {}
+    for field in fields:
+        column = getattr(TaskModel, field)
+        whens = {task_id: literal(values[field], column.type) for task_id, values in updates.items() if field in values}
+        assignments[field] = case(whens, value=TaskModel.id, else_=column)
+    assignments["version"] = TaskModel.version + 1
+
+    stmt = (
+        update(TaskModel)
+        .where(TaskModel.id.in_(list(updates)))
+        .values(**assignments)
+        .returning(*(getattr(TaskModel, column) for column in TASK_CHANGE_COLUMNS))
+        .execution_options(synchronize_session=False)
+    )
+    if user_id is not None:
+        stmt = stmt.where(TaskModel.user_id == user_id)
+
+    try:
+        tasks = [dict(row._mapping) for row in db.execute(stmt)]
+        for task in tasks:
+            record_index_change(db, "task", task["id"], task["user_id"])
+            record_task_event(db, task)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    notify_tasks_changed(tasks)
+    return tasks
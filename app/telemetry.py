@@ -0,0 +1,159 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.metrics import registry
+
+# Buckets for per-request SQL statement counts and response sizes
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request, until the last body byte is sent", ["method", "route"]
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests being handled", ["method", "route"]
+)
+http_response_size = registry.histogram(
+    "http_response_size_bytes", "HTTP response body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+http_request_db_statements = registry.histogram(
+    "http_request_db_statements", "SQL statements executed per HTTP request", ["method", "route"], buckets=STATEMENT_BUCKETS
+)
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds", "Time spent executing SQL per HTTP request", ["method", "route"]
+)
+http_request_llm_duration = registry.histogram(
+    "http_request_llm_duration_seconds", "Time spent waiting on OpenAI per HTTP request", ["method", "route"]
+)
+db_statements = registry.counter("db_statements_total", "SQL statements executed")
+db_statement_duration = registry.histogram("db_statement_duration_seconds", "SQL statement execution time")
+
+
+class RequestStats:
+    """Resources one request has used so far; shared by every thread working on it."""
+
+    def __init__(self):
+        self.db_statements = 0
+        self.db_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def server_timing(self, total_seconds: float) -> str:
+        """Server-Timing header value, so the split is visible in browser dev tools."""
+        return (
+            f'db;desc="{self.db_statements} queries";dur={self.db_seconds * 1000:.1f}, '
+            f'llm;desc="{self.llm_calls} calls";dur={self.llm_seconds * 1000:.1f}, '
+            f"total;dur={total_seconds * 1000:.1f}"
+        )
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Stats of the request being handled, or None outside a request."""
+    return _request_stats.get()
+
+
+def record_llm_time(seconds: float) -> None:
+    """Charge time spent in an OpenAI call to the current request, if any."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.llm_calls += 1
+        stats.llm_seconds += seconds
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    db_statements.inc()
+    db_statement_duration.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_statements += 1
+        stats.db_seconds += elapsed
+
+
+def _handle_error(context):
+    # after_cursor_execute doesn't run for a failed statement; drop its start time
+    starts = context.connection.info.get("query_start_time") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time every statement the engine executes."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the route that will handle a request, e.g. /api/v1/tasks/{task_id}."""
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    # Unmatched paths would otherwise give every 404 its own label
+    return "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, status, response size, SQL and OpenAI time per route template.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so streaming bodies
+    are measured through their last byte and the per-request stats set here
+    are visible to the endpoint, including when it runs in the thread pool.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = {"method": scope["method"], "route": route_template(scope)}
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing(time.perf_counter() - started).encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.inc(**labels)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(**labels)
+            _request_stats.reset(token)
+            http_requests.inc(status=str(status), **labels)
+            http_request_duration.observe(time.perf_counter() - started, **labels)
+            http_response_size.observe(size, **labels)
+            http_request_db_statements.observe(stats.db_statements, **labels)
+            http_request_db_duration.observe(stats.db_seconds, **labels)
+            http_request_llm_duration.observe(stats.llm_seconds, **labels)
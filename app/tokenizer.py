@@ -0,0 +1,75 @@
+from typing import Any, Dict, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Rough characters-per-token ratio for English text when tiktoken is unavailable
+APPROX_CHARS_PER_TOKEN = 4
+
+_encodings: Dict[str, Optional[Any]] = {}
+
+
+def get_encoding(model: str = DEFAULT_MODEL) -> Optional[Any]:
+    """
+    Get the local tiktoken encoding for a model.
+
+    Returns:
+        The encoding, or None if tiktoken or its BPE files are unavailable
+    """
+    if model not in _encodings:
+        encoding = None
+        if tiktoken is not None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = _load_encoding("cl100k_base")
+            except Exception:
+                encoding = None
+        _encodings[model] = encoding
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Count the tokens `text` will use for `model`."""
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // APPROX_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL, suffix: str = "…") -> str:
+    """
+    Truncate `text` so it fits in `max_tokens`, including the suffix.
+
+    Args:
+        text: Text to truncate
+        max_tokens: Token budget for the result
+        model: Model whose tokenizer is used
+        suffix: Marker appended when text is cut
+
+    Returns:
+        The original text if it fits, otherwise a truncated copy
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    keep = max(0, max_tokens - count_tokens(suffix, model))
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:keep * APPROX_CHARS_PER_TOKEN].rstrip() + suffix
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:keep]).rstrip() + suffix
+
+
+def _load_encoding(name: str) -> Optional[Any]:
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
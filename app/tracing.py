@@ -0,0 +1,346 @@
+import importlib
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.telemetry import route_template
+
+# W3C Trace Context: version-traceid-parentid-flags
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+MAX_STATEMENT_LENGTH = 1000
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Trace ID, parent span ID and sampled flag from a traceparent header, or None if absent or invalid."""
+    match = TRACEPARENT.match((header or "").strip().lower())
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """One timed operation in a trace."""
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        sampled: bool = True
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.sampled = sampled
+        self.status = "ok"
+        self.start_time = time.time()
+        self.duration: Optional[float] = None
+        self._started = time.perf_counter()
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.attributes["error.type"] = type(exc).__name__
+        self.attributes["error.message"] = str(exc)
+
+    def end(self) -> None:
+        """Stop the clock and export the span if its trace is sampled; later calls do nothing."""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if self.sampled:
+            self.tracer.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stands in for spans that are not recorded, so callers never need to check."""
+
+    sampled = False
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def set_status(self, status: str) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span():
+    """Innermost recorded span of the current context, or NOOP_SPAN."""
+    return _current_span.get() or NOOP_SPAN
+
+
+class SpanExporter:
+    """Receives every finished span of a sampled trace."""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps finished spans in a list, for tests."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def find(self, name: str) -> List[Span]:
+        """Finished spans with the given name, or whose name starts with it when it ends in '*'."""
+        if name.endswith("*"):
+            return [s for s in self.spans if s.name.startswith(name[:-1])]
+        return [s for s in self.spans if s.name == name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonLinesExporter(SpanExporter):
+    """Appends one JSON object per finished span to a local file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.TRACING_FILE
+        self._file = open(self.path, "a", buffering=1, encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def create_exporter(name: str) -> Optional[SpanExporter]:
+    """
+    Exporter for a TRACING_EXPORTER value.
+
+    Args:
+        name: "none", "jsonl", "memory", or "package.module:ClassName" for a custom
+            SpanExporter constructed without arguments
+    """
+    if name in ("", "none"):
+        return None
+    if name == "jsonl":
+        return JsonLinesExporter()
+    if name == "memory":
+        return InMemoryExporter()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown tracing exporter: {name}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class Tracer:
+    """
+    Creates spans and hands the finished ones of sampled traces to an exporter.
+
+    Sampling is decided once per trace, at the root, or taken from an incoming
+    traceparent. Spans of unsampled traces are not created at all, so their
+    cost is a context variable lookup.
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None, sample_rate: Optional[float] = None):
+        """
+        Args:
+            exporter: Where finished spans go; None disables tracing
+            sample_rate: Fraction of new traces recorded (defaults to TRACING_SAMPLE_RATE)
+        """
+        self.exporter = exporter
+        self.sample_rate = settings.TRACING_SAMPLE_RATE if sample_rate is None else sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def export(self, span: Span) -> None:
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            print(f"Error exporting span {span.name}: {e}")
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        """Start a root span, continuing the caller's trace if a valid traceparent is given."""
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = _new_id(128), None, random.random() < self.sample_rate
+        return Span(self, name, trace_id, parent_id, attributes, sampled)
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        """Start a child of the current span; outside a sampled trace this returns NOOP_SPAN."""
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, attributes)
+
+    @contextmanager
+    def trace(self, name: str, traceparent: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+        """Context manager around start_trace that makes the root span current."""
+        with self._activate(self.start_trace(name, traceparent, attributes)) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+        """Context manager around start_span that makes the span current and records errors."""
+        with self._activate(self.start_span(name, attributes)) as span:
+            yield span
+
+    @contextmanager
+    def _activate(self, span) -> Iterator[Any]:
+        token = _current_span.set(span) if span is not NOOP_SPAN else None
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            if token is not None:
+                _current_span.reset(token)
+            span.end()
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+# Global tracer instance
+tracer: Optional[Tracer] = None
+
+def get_tracer() -> Tracer:
+    """Get or create the tracer configured by TRACING_EXPORTER."""
+    global tracer
+    if tracer is None:
+        tracer = Tracer(create_exporter(settings.TRACING_EXPORTER))
+    return tracer
+
+def set_tracer(new_tracer: Tracer) -> Tracer:
+    """Replace the global tracer, e.g. with one using an InMemoryExporter in tests; returns the old one."""
+    global tracer
+    previous, tracer = get_tracer(), new_tracer
+    return previous
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = get_tracer().start_span("db.query", {"db.statement": statement[:MAX_STATEMENT_LENGTH]})
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        span = spans.pop()
+        span.set_attribute("db.rows", cursor.rowcount)
+        span.end()
+
+
+def _handle_error(context):
+    spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+    if spans:
+        span = spans.pop()
+        span.record_exception(context.original_exception)
+        span.end()
+
+
+def trace_engine(engine: Engine) -> None:
+    """Record a span for every statement the engine executes inside a sampled trace."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+class TracingMiddleware:
+    """Wraps each HTTP request in a root span and returns its traceparent to the caller."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not get_tracer().enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1")
+        route = route_template(scope)
+        attributes = {"http.method": scope["method"], "http.route": route, "http.target": scope["path"]}
+
+        with get_tracer().trace(f"{scope['method']} {route}", traceparent, attributes) as span:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status("error")
+                    if span.traceparent is not None:
+                        message = {**message, "headers": [*message.get("headers", []), (b"traceparent", span.traceparent.encode("latin-1"))]}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,23 @@
+import json
+import os
+import subprocess
+from typing import Any, Dict, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def write_run(run: Dict[str, Any], name: str, started_at, output: Optional[str] = None) -> str:
+    """Write a benchmark run as JSON, by default to benchmarks/results/<name>-<timestamp>.json."""
+    output = output or os.path.join(RESULTS_DIR, f"{name}-{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"Wrote {output}")
+    return output
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Load test for the HTTP API, run in-process against the ASGI app.
+
+Virtual users drive a realistic mix of traffic through an async HTTP client:
+polling task lists, appending to chats, submitting questionnaires and syncing
+task lists in bulk. The LLM is replaced with an in-process stub with a
+configurable latency, or served by benchmarks.openai_stub via --openai-base-url.
+Each concurrency level runs for a fixed time. The report gives throughput,
+p50/p95/p99 latency and error rate per level and scenario, plus the
+saturation point, and checks the SLO level against benchmarks/slo.json.
+Each run is written to benchmarks/results/ as JSON so PRs can be compared.
+
+The database defaults to a throwaway SQLite file; set DATABASE_URL to load a
+Postgres instance instead.
+
+Usage:
+    python -m benchmarks.load
+    python -m benchmarks.load --levels 1 4 16 64 --duration 10 --compare benchmarks/results/<previous>.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Never load-test whatever database .env points at by accident
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/emotitask-load.db")
+
+import httpx
+import numpy as np
+
+from benchmarks import git_commit, write_run
+from app.config import settings
+from app.database import Base, SessionLocal, engine
+from app.deadline import Deadline
+from app.main import create_app
+from app.models.database_models import User, Task as TaskModel, ChatHistory as ChatHistoryModel
+from app.services.openai_service import OpenAIService, get_openai_service
+
+SLO_FILE = os.path.join(os.path.dirname(__file__), "slo.json")
+
+# Share of operations per scenario
+DEFAULT_MIX = {"poll_tasks": 0.5, "chat_append": 0.25, "bulk_sync": 0.15, "questionnaire": 0.1}
+
+FEELINGS = ["stressed", "anxious", "tired", "motivated", "overwhelmed", "hopeful", "frustrated", "calm"]
+
+
+class StubOpenAIService(OpenAIService):
+    """Answers like OpenAIService after a lognormal delay, without network access."""
+
+    def __init__(self, median_ms: float = 300.0, sigma: float = 0.4, seed: int = 7):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self._random = random.Random(seed)
+
+    def _wait(self, deadline: Optional[Deadline]) -> None:
+        delay = self.median_ms / 1000 * self._random.lognormvariate(0, self.sigma)
+        if deadline is not None:
+            delay = min(delay, deadline.remaining())
+        time.sleep(delay)
+
+    @staticmethod
+    def _usage(prompt: str, completion: str) -> Dict[str, int]:
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(completion) // 4
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    def chat_completion(self, messages, model="gpt-3.5-turbo", max_tokens=1000, temperature=0.7, deadline=None, **kwargs):
+        self._wait(deadline)
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        text = "It sounds like a lot is on your plate. Let's pick one small next step together."
+        return {"response": text, "model": model, "usage": self._usage(prompt, text)}
+
+    def stream_chat_completion(self, messages, model="gpt-3.5-turbo", max_tokens=1000, temperature=0.7, deadline=None, **kwargs):
+        result = self.chat_completion(messages, model=model, deadline=deadline)
+        for i, word in enumerate(result["response"].split(" ")):
+            yield {"type": "delta", "content": word if i == 0 else " " + word}
+        yield {"type": "done", **result}
+
+    def text_completion(self, prompt, model="gpt-3.5-turbo", max_tokens=1000, temperature=0.7, deadline=None, **kwargs):
+        self._wait(deadline)
+        text = "You value structure and respond well to short, concrete plans with room for rest."
+        return {"generated_text": text, "model": model, "usage": self._usage(prompt, text)}
+
+    def create_embeddings(self, texts, model=None, deadline=None):
+        self._wait(deadline)
+        return [[0.0] * 8 for _ in texts]
+
+
+class VirtualUser:
+    """One simulated client, with the state it needs to issue realistic requests."""
+
+    def __init__(self, index: int, user_id: int, chat_id: int, seed: int):
+        self.index = index
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.messages: List[Dict[str, str]] = []
+        self.random = random.Random(seed * 1000 + index)
+
+
+class Sample:
+    """Outcome of one scenario run."""
+
+    def __init__(self, scenario: str, latency: float, ok: bool, requests: int):
+        self.scenario = scenario
+        self.latency = latency
+        self.ok = ok
+        self.requests = requests
+
+
+async def poll_tasks(client: httpx.AsyncClient, vu: VirtualUser) -> Tuple[bool, int]:
+    response = await client.get("/api/v1/tasks", params={"user_id": vu.user_id})
+    return response.status_code == 200, 1
+
+
+async def chat_append(client: httpx.AsyncClient, vu: VirtualUser) -> Tuple[bool, int]:
+    vu.messages.append({"role": "user", "content": f"I feel {vu.random.choice(FEELINGS)} about my tasks today"})
+    vu.messages.append({"role": "assistant", "content": "Thanks for sharing. What would make today feel lighter?"})
+    response = await client.put(f"/api/v1/chat-history/{vu.chat_id}/messages", json={"messages": json.dumps(vu.messages)})
+    return response.status_code == 200, 1
+
+
+async def bulk_sync(client: httpx.AsyncClient, vu: VirtualUser) -> Tuple[bool, int]:
+    """A client coming back online: pull the task list, then push its offline edits one by one."""
+    response = await client.get("/api/v1/tasks", params={"user_id": vu.user_id})
+    if response.status_code != 200:
+        return False, 1
+    tasks = response.json()
+    edits = vu.random.sample(tasks, min(len(tasks), 5))
+    responses = await asyncio.gather(*(
+        client.put(f"/api/v1/tasks/{task['id']}", json={"priority": vu.random.randint(1, 3)}) for task in edits
+    ))
+    return all(r.status_code == 200 for r in responses), 1 + len(responses)
+
+
+async def questionnaire(client: httpx.AsyncClient, vu: VirtualUser) -> Tuple[bool, int]:
+    answers = {str(q): f"Mostly {vu.random.choice(FEELINGS)}, sometimes fine" for q in range(1, 11)}
+    response = await client.post("/api/v1/process-answers", json={"user_id": vu.user_id, "question_answers": answers})
+    return response.status_code == 200, 1
+
+
+SCENARIOS: Dict[str, Callable[[httpx.AsyncClient, VirtualUser], Awaitable[Tuple[bool, int]]]] = {
+    "poll_tasks": poll_tasks,
+    "chat_append": chat_append,
+    "bulk_sync": bulk_sync,
+    "questionnaire": questionnaire,
+}
+
+
+def seed_database(users: int, tasks: int) -> List[Tuple[int, int]]:
+    """Create users, each with open tasks and an empty chat; returns (user_id, chat_id) pairs."""
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        run = int(time.time() * 1000)
+        created = []
+        for i in range(users):
+            user = User(name=f"Load {i}", email=f"load-{run}-{i}@example.com")
+            user.tasks = [TaskModel(name=f"Task {j}", description="Load test task", priority=1) for j in range(tasks)]
+            chat = ChatHistoryModel(name="Load test chat", messages="[]")
+            user.chat_histories = [chat]
+            db.add(user)
+            created.append((user, chat))
+        db.commit()
+        return [(user.id, chat.id) for user, chat in created]
+    finally:
+        db.close()
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"latency_p50_ms": 0.0, "latency_p95_ms": 0.0, "latency_p99_ms": 0.0}
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {"latency_p50_ms": round(float(p50), 2), "latency_p95_ms": round(float(p95), 2), "latency_p99_ms": round(float(p99), 2)}
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {
+        "operations": len(samples),
+        "requests": sum(s.requests for s in samples),
+        "throughput_ops": round(len(samples) / elapsed, 2),
+        "throughput_rps": round(sum(s.requests for s in samples) / elapsed, 2),
+        "error_rate": round(sum(not s.ok for s in samples) / len(samples), 4) if samples else 0.0,
+        **percentiles([s.latency for s in samples]),
+        "scenarios": {},
+    }
+    for name in SCENARIOS:
+        runs = [s for s in samples if s.scenario == name]
+        if runs:
+            summary["scenarios"][name] = {
+                "operations": len(runs),
+                "error_rate": round(sum(not s.ok for s in runs) / len(runs), 4),
+                **percentiles([s.latency for s in runs]),
+            }
+    return summary
+
+
+async def run_level(app, virtual_users: List[VirtualUser], duration: float, mix: Dict[str, float]) -> Dict[str, Any]:
+    """Run every virtual user in a closed loop for `duration` seconds."""
+    names, weights = list(mix), list(mix.values())
+    samples: List[Sample] = []
+    transport = httpx.ASGITransport(app=app)
+
+    async def user_loop(client: httpx.AsyncClient, vu: VirtualUser, stop_at: float) -> None:
+        while time.perf_counter() < stop_at:
+            name = vu.random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok, requests = await SCENARIOS[name](client, vu)
+            except Exception as e:
+                print(f"Error in scenario {name}: {e}")
+                ok, requests = False, 1
+            samples.append(Sample(name, time.perf_counter() - started, ok, requests))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(user_loop(client, vu, started + duration) for vu in virtual_users))
+        elapsed = time.perf_counter() - started
+    return {"concurrency": len(virtual_users), "duration_s": round(elapsed, 2), **summarize(samples, elapsed)}
+
+
+def saturation_point(levels: List[Dict[str, Any]], min_gain: float) -> Optional[int]:
+    """
+    Concurrency beyond which throughput stops growing.
+
+    Returns:
+        The last level that improved throughput by at least `min_gain` (a fraction)
+        over the one before, if a later level did not; None if throughput still scales
+    """
+    for previous, current in zip(levels, levels[1:]):
+        if current["throughput_ops"] < previous["throughput_ops"] * (1 + min_gain):
+            return previous["concurrency"]
+    return None
+
+
+def check_slo(levels: List[Dict[str, Any]], slo: Dict[str, Any]) -> List[str]:
+    """Violations of the SLO thresholds at the SLO's concurrency level."""
+    level = next((l for l in levels if l["concurrency"] == slo["concurrency"]), None)
+    if level is None:
+        return [f"concurrency {slo['concurrency']} was not run"]
+    violations = []
+    if level["throughput_ops"] < slo.get("min_throughput_ops", 0):
+        violations.append(f"throughput {level['throughput_ops']} ops/s < {slo['min_throughput_ops']}")
+    for name, limits in slo.get("scenarios", {}).items():
+        measured = level["scenarios"].get(name)
+        if measured is None:
+            continue
+        for metric in ("latency_p95_ms", "latency_p99_ms"):
+            if metric in limits and measured[metric] > limits[metric]:
+                violations.append(f"{name} {metric} {measured[metric]} > {limits[metric]}")
+        if measured["error_rate"] > limits.get("max_error_rate", 0.0):
+            violations.append(f"{name} error rate {measured['error_rate']} > {limits.get('max_error_rate', 0.0)}")
+    return violations
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"\nCompared with {previous.get('started_at')} ({previous.get('commit')}):")
+    before = {l["concurrency"]: l for l in previous.get("levels", [])}
+    for level in current["levels"]:
+        old = before.get(level["concurrency"])
+        if old:
+            print(f"  c={level['concurrency']:<4} throughput {level['throughput_ops'] - old['throughput_ops']:+.1f} ops/s, "
+                  f"p95 {level['latency_p95_ms'] - old['latency_p95_ms']:+.1f}ms, "
+                  f"p99 {level['latency_p99_ms'] - old['latency_p99_ms']:+.1f}ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="In-process API load test")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Concurrency levels to sweep")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per level")
+    parser.add_argument("--tasks", type=int, default=30, help="Tasks per virtual user")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Median latency of the stubbed LLM")
+    parser.add_argument("--openai-base-url", default=None,
+                        help="Call this OpenAI-compatible API (e.g. benchmarks.openai_stub) instead of the in-process stub")
+    parser.add_argument("--mix", default=None, help='Scenario weights as JSON, e.g. \'{"poll_tasks": 1}\'')
+    parser.add_argument("--saturation-gain", type=float, default=0.1, help="Throughput gain below which a level counts as saturated")
+    parser.add_argument("--slo", default=SLO_FILE, help="SLO thresholds file")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Result file (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Previous result file to compare against")
+    args = parser.parse_args(argv)
+
+    with open(args.slo) as f:
+        slo = json.load(f)
+    levels = sorted(set(args.levels) | {slo["concurrency"]})
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    users = seed_database(max(levels), args.tasks)
+    app = create_app()
+    if args.openai_base_url:
+        # Exercise the real client, retries and hedging against a local upstream
+        settings.OPENAI_BASE_URL = args.openai_base_url
+        settings.OPENAI_API_KEY = settings.OPENAI_API_KEY or "stub"
+    else:
+        app.dependency_overrides[get_openai_service] = lambda: StubOpenAIService(args.llm_latency_ms, seed=args.seed)
+
+    results = []
+    for concurrency in levels:
+        virtual_users = [VirtualUser(i, user_id, chat_id, args.seed) for i, (user_id, chat_id) in enumerate(users[:concurrency])]
+        level = asyncio.run(run_level(app, virtual_users, args.duration, mix))
+        results.append(level)
+        print(f"  c={concurrency:<4} {level['throughput_ops']:8.1f} ops/s {level['throughput_rps']:8.1f} req/s "
+              f"p50={level['latency_p50_ms']:.1f}ms p95={level['latency_p95_ms']:.1f}ms p99={level['latency_p99_ms']:.1f}ms "
+              f"errors={level['error_rate']:.2%}")
+
+    saturation = saturation_point(results, args.saturation_gain)
+    violations = check_slo(results, slo)
+    print(f"Saturation point: {saturation if saturation is not None else 'not reached'}")
+    print(f"SLO at concurrency {slo['concurrency']}: " + ("met" if not violations else "VIOLATED"))
+    for violation in violations:
+        print(f"  {violation}")
+
+    run = {
+        "started_at": started_at.isoformat(),
+        "commit": git_commit(),
+        "config": {k: getattr(args, k) for k in ("duration", "tasks", "llm_latency_ms", "openai_base_url", "seed")},
+        "mix": mix,
+        "database": engine.dialect.name,
+        "levels": results,
+        "saturation_concurrency": saturation,
+        "slo": slo,
+        "slo_violations": violations,
+    }
+    write_run(run, "load", started_at, args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(run, json.load(f))
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
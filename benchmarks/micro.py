@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the hot pure-Python paths, checked against stored baselines.
+
+Each case is timed at several input sizes, timeit-style: a call is repeated
+until one measurement takes at least --min-time, the measurement is repeated
+--repeat times with the garbage collector off, and the fastest per-call time
+is kept, as it is the least disturbed by other load on the machine. Results
+are compared with benchmarks/baselines/micro.json and the run fails if any
+case is still more than --threshold slower after being re-measured --confirm
+times. Baselines are only comparable on the machine that
+recorded them; refresh them with --update-baseline when that changes or
+after an intended slowdown.
+
+Usage:
+    python -m benchmarks.micro
+    python -m benchmarks.micro --only encode_messages validate_tasks --threshold 0.1
+    python -m benchmarks.micro --update-baseline
+"""
+
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from pydantic import TypeAdapter
+
+from benchmarks import git_commit, write_run
+from app.api.endpoints import router
+from app.models.database_models import Task as TaskModel, ChatHistory as ChatHistoryModel
+from app.schemas import Task, ChatHistory
+from app.services.chat_summary_service import load_messages
+from app.services.question_service import QuestionService
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+SIZES = [10, 100, 1000]
+WORDS = "today I finally started the report but felt anxious about the deadline and the meeting".split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_tasks(n: int) -> List[TaskModel]:
+    """Transient ORM rows shaped like what the task list endpoint loads."""
+    rng = random.Random(n)
+    now = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        TaskModel(id=i, user_id=1, name=f"Task {i}", description=_sentence(rng, 20), is_completed=i % 3 == 0,
+                  priority=i % 3 + 1, version=1, start_time=now, due_at=now, created_at=now, updated_at=now)
+        for i in range(n)
+    ]
+
+
+def make_messages(n: int) -> List[Dict[str, Any]]:
+    rng = random.Random(n)
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": _sentence(rng, 40), "timestamp": f"2024-01-01T10:{i % 60:02d}:00Z"}
+        for i in range(n)
+    ]
+
+
+def make_chats(n: int, messages: int = 20) -> List[ChatHistoryModel]:
+    now = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    blob = json.dumps(make_messages(messages))
+    return [
+        ChatHistoryModel(id=i, user_id=1, name=f"Chat {i}", description=None, messages=blob,
+                         model_used="gpt-3.5-turbo", tokens_used=1200, created_at=now, updated_at=now)
+        for i in range(n)
+    ]
+
+
+def _list_response(path: str, rows: List[Any]) -> Callable[[], Any]:
+    """Convert ORM rows to the JSON body the list endpoint at `path` sends, as FastAPI does."""
+    route = next(r for r in router.routes if r.path == path and "GET" in r.methods)
+    loop = asyncio.new_event_loop()
+
+    def run():
+        content = loop.run_until_complete(serialize_response(field=route.response_field, response_content=rows, is_coroutine=True))
+        return JSONResponse(content).body
+    return run
+
+
+def case_build_prompt(size: int) -> Callable[[], Any]:
+    rng = random.Random(size)
+    answers = {str(i): _sentence(rng, 25) for i in range(size)}
+    service = QuestionService(openai_service=None)
+    return lambda: service.build_prompt_from_answers(answers, "Alex")
+
+
+def case_docs_to_block(size: int) -> Callable[[], Any]:
+    from langchain.schema import Document
+    from rag.langchain_rag_tools import docs_to_block
+    rng = random.Random(size)
+    docs = [Document(page_content=_sentence(rng, 30), metadata={"type": "task", "task_id": i, "timestamp": float(i)}) for i in range(size)]
+    return lambda: docs_to_block(docs, "### OPEN TASKS", max_tokens=600)
+
+
+def case_validate_tasks(size: int) -> Callable[[], Any]:
+    adapter, rows = TypeAdapter(List[Task]), make_tasks(size)
+    return lambda: adapter.validate_python(rows, from_attributes=True)
+
+
+def case_serialize_tasks(size: int) -> Callable[[], Any]:
+    adapter = TypeAdapter(List[Task])
+    tasks = adapter.validate_python(make_tasks(size), from_attributes=True)
+    return lambda: adapter.dump_json(tasks)
+
+
+def case_validate_chat_histories(size: int) -> Callable[[], Any]:
+    adapter, rows = TypeAdapter(List[ChatHistory]), make_chats(size)
+    return lambda: adapter.validate_python(rows, from_attributes=True)
+
+
+def case_serialize_chat_histories(size: int) -> Callable[[], Any]:
+    adapter = TypeAdapter(List[ChatHistory])
+    chats = adapter.validate_python(make_chats(size), from_attributes=True)
+    return lambda: adapter.dump_json(chats)
+
+
+def case_encode_messages(size: int) -> Callable[[], Any]:
+    messages = make_messages(size)
+    return lambda: json.dumps(messages)
+
+
+def case_decode_messages(size: int) -> Callable[[], Any]:
+    blob = json.dumps(make_messages(size))
+    return lambda: load_messages(blob)
+
+
+def case_list_tasks_response(size: int) -> Callable[[], Any]:
+    return _list_response("/tasks", make_tasks(size))
+
+
+def case_list_chat_histories_response(size: int) -> Callable[[], Any]:
+    return _list_response("/chat-history", make_chats(size))
+
+
+CASES: Dict[str, Callable[[int], Callable[[], Any]]] = {
+    "build_prompt_from_answers": case_build_prompt,
+    "docs_to_block": case_docs_to_block,
+    "validate_tasks": case_validate_tasks,
+    "serialize_tasks": case_serialize_tasks,
+    "validate_chat_histories": case_validate_chat_histories,
+    "serialize_chat_histories": case_serialize_chat_histories,
+    "encode_messages": case_encode_messages,
+    "decode_messages": case_decode_messages,
+    "list_tasks_response": case_list_tasks_response,
+    "list_chat_histories_response": case_list_chat_histories_response,
+}
+
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, float]:
+    """Per-call time in microseconds: fastest and median of `repeat` measurements of at least `min_time` seconds."""
+    func()
+    gc_was_enabled = gc.isenabled()
+    # Like timeit, keep collections triggered by earlier cases out of the numbers
+    gc.disable()
+    try:
+        loops = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+            loops = loops * 10 if elapsed < min_time / 10 else max(loops + 1, int(loops * min_time / elapsed * 1.2))
+
+        timings = [elapsed / loops]
+        for _ in range(repeat - 1):
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            timings.append((time.perf_counter() - started) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {"min_us": round(min(timings) * 1e6, 3), "median_us": round(statistics.median(timings) * 1e6, 3), "loops": loops}
+
+
+def find_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Benchmarks whose fastest time exceeds the baseline's by more than `threshold` (a fraction)."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before and result["min_us"] > before["min_us"] * (1 + threshold):
+            regressions.append(f"{name}: {before['min_us']:.1f}us -> {result['min_us']:.1f}us (+{result['min_us'] / before['min_us'] - 1:.0%})")
+    return regressions
+
+
+def machine() -> Dict[str, str]:
+    return {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor() or platform.machine()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks with baseline regression checks")
+    parser.add_argument("--only", nargs="*", help="Run only these cases")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Input sizes per case")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per measurement")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Slowdown over the baseline that fails the run")
+    parser.add_argument("--confirm", type=int, default=3, help="Times a case over the threshold is re-measured before it counts")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--output", default=None, help="Result file (default: benchmarks/results/micro-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    results: Dict[str, Dict[str, float]] = {}
+    skipped: Dict[str, str] = {}
+    for case, factory in CASES.items():
+        if args.only and case not in args.only:
+            continue
+        for size in args.sizes:
+            name = f"{case}[{size}]"
+            try:
+                func = factory(size)
+            except ImportError as e:
+                skipped[case] = str(e)
+                print(f"  {case:32} skipped: {e}")
+                break
+            results[name] = measure(func, args.repeat, args.min_time)
+            print(f"  {name:38} {results[name]['min_us']:12.1f}us  (median {results[name]['median_us']:.1f}us)")
+
+    baseline: Dict[str, Any] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = find_regressions(results, baseline.get("results", {}), args.threshold)
+    # A slowdown must survive re-measurement, so a noisy neighbour doesn't fail the run
+    for _ in range(args.confirm):
+        if not regressions:
+            break
+        for name in [r.split(":")[0] for r in regressions]:
+            case, size = name[:-1].split("[")
+            again = measure(CASES[case](int(size)), args.repeat, args.min_time)
+            if again["min_us"] < results[name]["min_us"]:
+                results[name] = again
+        regressions = find_regressions(results, baseline.get("results", {}), args.threshold)
+    if baseline:
+        print(f"\nCompared with baseline from {baseline.get('recorded_at')} ({baseline.get('commit')}), threshold {args.threshold:.0%}:")
+        for name, result in results.items():
+            before = baseline["results"].get(name)
+            if before:
+                print(f"  {name:38} {result['min_us'] / before['min_us'] - 1:+7.1%}")
+    for regression in regressions:
+        print(f"  REGRESSION {regression}")
+
+    run = {
+        "started_at": started_at.isoformat(),
+        "commit": git_commit(),
+        "machine": machine(),
+        "threshold": args.threshold,
+        "results": results,
+        "skipped": skipped,
+        "regressions": regressions,
+    }
+    write_run(run, "micro", started_at, args.output)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"recorded_at": started_at.isoformat(), "commit": run["commit"], "machine": run["machine"], "results": results}, f, indent=2)
+        print(f"Updated baseline {args.baseline}")
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
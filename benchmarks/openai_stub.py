@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub server for offline testing and benchmarking.
+
+Serves /v1/chat/completions, /v1/completions, /v1/embeddings and /v1/models
+with deterministic outputs: the same request always gets the same text or
+vector. Latency follows a named profile, with time to first token, a token
+rate for streaming and an optional slow tail. 429 and 500 responses can be
+injected at fixed rates. In record mode, requests are forwarded to the real
+API and saved to a JSON-lines cassette. In replay mode they are answered from
+that cassette with the recorded latency.
+
+Point the app at it with:
+    OPENAI_BASE_URL=http://localhost:8100/v1 OPENAI_API_KEY=stub python run.py
+
+Usage:
+    python -m benchmarks.openai_stub --profile realistic --error-429 0.02
+    python -m benchmarks.openai_stub --mode record --cassette sessions.jsonl
+    python -m benchmarks.openai_stub --mode replay --cassette sessions.jsonl
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.tokenizer import count_tokens
+
+MODELS = ["gpt-3.5-turbo", "gpt-4o-mini", "gpt-4o", "text-embedding-3-small", "text-embedding-3-large"]
+EMBEDDING_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+WORDS = (
+    "you have been carrying a lot lately and it makes sense to feel tired let us pick one small "
+    "step for today maybe start with the task that feels lightest and take a short break after "
+    "progress matters more than perfection remember to rest drink water and be kind to yourself"
+).split()
+
+# Time to first token (lognormal median/sigma, seconds), streaming rate and slow tail
+PROFILES: Dict[str, Dict[str, float]] = {
+    "instant": {"ttft": 0.0, "sigma": 0.0, "tokens_per_second": 0.0, "tail_probability": 0.0, "tail_multiplier": 1.0},
+    "fast": {"ttft": 0.05, "sigma": 0.2, "tokens_per_second": 500.0, "tail_probability": 0.0, "tail_multiplier": 1.0},
+    "realistic": {"ttft": 0.4, "sigma": 0.5, "tokens_per_second": 60.0, "tail_probability": 0.02, "tail_multiplier": 8.0},
+    "slow-tail": {"ttft": 0.3, "sigma": 0.3, "tokens_per_second": 60.0, "tail_probability": 0.1, "tail_multiplier": 20.0},
+}
+
+
+def request_key(path: str, body: Dict[str, Any]) -> str:
+    """Identity of a request for replay; streaming flags don't change the answer."""
+    canonical = {k: v for k, v in body.items() if k not in ("stream", "stream_options")}
+    return hashlib.sha256(f"{path} {json.dumps(canonical, sort_keys=True)}".encode("utf-8")).hexdigest()
+
+
+def deterministic_text(seed_text: str, max_tokens: Optional[int]) -> str:
+    """Reply text derived from the request, between 12 and 60 words, capped at max_tokens words."""
+    rng = random.Random(hashlib.sha256(seed_text.encode("utf-8")).hexdigest())
+    length = min(rng.randint(12, 60), max_tokens or 60)
+    return " ".join(rng.choice(WORDS) for _ in range(max(1, length))).capitalize() + "."
+
+
+def deterministic_embedding(text: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> Dict[str, Any]:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+class Cassette:
+    """Recorded responses by request key, stored as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def add(self, key: str, path: str, request: Dict[str, Any], status: int, response: Any, latency: float) -> None:
+        entry = {"key": key, "path": path, "request": request, "status": status, "response": response, "latency": latency}
+        with self._lock:
+            self.entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+class StubUpstream:
+    """Behaviour of the stub: latency, injected errors, and where answers come from."""
+
+    def __init__(
+        self,
+        profile: str = "fast",
+        error_429: float = 0.0,
+        error_500: float = 0.0,
+        seed: int = 7,
+        mode: str = "generate",
+        cassette: Optional[str] = None,
+        upstream_url: str = "https://api.openai.com/v1",
+        upstream_key: Optional[str] = None
+    ):
+        """
+        Args:
+            profile: Name in PROFILES
+            error_429: Fraction of requests answered with 429 and a Retry-After header
+            error_500: Fraction of requests answered with 500
+            seed: Seed for latency and error draws
+            mode: "generate" synthesises answers, "record" proxies to the upstream and
+                saves them, "replay" serves the cassette (and generates on a miss)
+            cassette: JSON-lines file used by record and replay
+            upstream_url: Real API used in record mode
+            upstream_key: API key for the real API (defaults to OPENAI_API_KEY)
+        """
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown latency profile: {profile}")
+        if mode not in ("generate", "record", "replay"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if mode != "generate" and not cassette:
+            raise ValueError(f"{mode} mode needs a cassette file")
+        self.profile = PROFILES[profile]
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.mode = mode
+        self.cassette = Cassette(cassette) if cassette else None
+        self.upstream_url = upstream_url.rstrip("/")
+        self.upstream_key = upstream_key or os.getenv("OPENAI_API_KEY", "")
+        self.random = random.Random(seed)
+        self.stats: Dict[str, int] = {}
+
+    def count(self, name: str) -> None:
+        self.stats[name] = self.stats.get(name, 0) + 1
+
+    def first_token_delay(self) -> float:
+        profile = self.profile
+        if profile["ttft"] <= 0:
+            return 0.0
+        delay = profile["ttft"] * self.random.lognormvariate(0, profile["sigma"])
+        if self.random.random() < profile["tail_probability"]:
+            delay *= profile["tail_multiplier"]
+        return delay
+
+    def token_delay(self, tokens: int) -> float:
+        rate = self.profile["tokens_per_second"]
+        return tokens / rate if rate > 0 else 0.0
+
+    def injected_error(self) -> Optional[JSONResponse]:
+        draw = self.random.random()
+        if draw < self.error_429:
+            self.count("injected_429")
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (injected by stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": "1"}
+            )
+        if draw < self.error_429 + self.error_500:
+            self.count("injected_500")
+            return JSONResponse({"error": {"message": "Internal error (injected by stub)", "type": "server_error"}}, status_code=500)
+        return None
+
+    async def record(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Forward a request to the real API without streaming and save the answer."""
+        started = time.monotonic()
+        async with httpx.AsyncClient(timeout=120) as client:
+            response = await client.post(
+                f"{self.upstream_url}{path}",
+                json={k: v for k, v in body.items() if k not in ("stream", "stream_options")},
+                headers={"Authorization": f"Bearer {self.upstream_key}"}
+            )
+        latency = time.monotonic() - started
+        entry = {"status": response.status_code, "response": response.json(), "latency": latency}
+        if response.status_code == 200:
+            self.cassette.add(request_key(path, body), path, body, response.status_code, entry["response"], latency)
+        return entry
+
+    async def answer(self, path: str, body: Dict[str, Any], generate) -> Dict[str, Any]:
+        """Response body, status and latency for a request, per the mode."""
+        if self.mode == "record":
+            return await self.record(path, body)
+        if self.mode == "replay":
+            entry = self.cassette.get(request_key(path, body))
+            if entry is not None:
+                self.count("replayed")
+                return entry
+            self.count("replay_misses")
+        return {"status": 200, "response": generate(body), "latency": None}
+
+
+def _chat_prompt(body: Dict[str, Any]) -> str:
+    return "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+
+
+def chat_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    prompt = _chat_prompt(body)
+    text = deterministic_text(json.dumps(body.get("messages", []), sort_keys=True), body.get("max_tokens"))
+    return {
+        "id": "chatcmpl-" + request_key("/chat/completions", body)[:24],
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-3.5-turbo"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": _usage(count_tokens(prompt), count_tokens(text)),
+    }
+
+
+def text_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    prompt = body.get("prompt", "")
+    prompt = "\n".join(prompt) if isinstance(prompt, list) else str(prompt)
+    text = deterministic_text(prompt, body.get("max_tokens"))
+    return {
+        "id": "cmpl-" + request_key("/completions", body)[:24],
+        "object": "text_completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-3.5-turbo-instruct"),
+        "choices": [{"index": 0, "text": " " + text, "finish_reason": "stop", "logprobs": None}],
+        "usage": _usage(count_tokens(prompt), count_tokens(text)),
+    }
+
+
+def embeddings(body: Dict[str, Any]) -> Dict[str, Any]:
+    texts = body.get("input", [])
+    texts = [texts] if isinstance(texts, str) else texts
+    model = body.get("model", "text-embedding-3-small")
+    dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS.get(model, 1536)
+    data = []
+    for index, text in enumerate(texts):
+        vector = deterministic_embedding(str(text), dimensions)
+        if body.get("encoding_format") == "base64":
+            embedding: Any = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+        else:
+            embedding = vector.tolist()
+        data.append({"object": "embedding", "index": index, "embedding": embedding})
+    prompt_tokens = sum(count_tokens(str(t)) for t in texts)
+    return {"object": "list", "data": data, "model": model, "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}}
+
+
+def _stream_chunks(path: str, response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Split a complete response into the SSE chunks OpenAI would have streamed, one word per chunk."""
+    base = {"id": response["id"], "created": response["created"], "model": response["model"]}
+    if path == "/chat/completions":
+        words = response["choices"][0]["message"]["content"].split(" ")
+        chunks = [{**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}]
+        chunks += [
+            {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": (" " if i else "") + w}, "finish_reason": None}]}
+            for i, w in enumerate(words)
+        ]
+        chunks.append({**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    else:
+        words = response["choices"][0]["text"].split(" ")
+        chunks = [
+            {**base, "object": "text_completion", "choices": [{"index": 0, "text": (" " if i else "") + w, "finish_reason": None, "logprobs": None}]}
+            for i, w in enumerate(words)
+        ]
+        chunks.append({**base, "object": "text_completion", "choices": [{"index": 0, "text": "", "finish_reason": "stop", "logprobs": None}]})
+    return chunks
+
+
+def create_stub_app(upstream: Optional[StubUpstream] = None) -> FastAPI:
+    """Create the stub API application."""
+    upstream = upstream or StubUpstream()
+    app = FastAPI(title="OpenAI stub", docs_url=None, redoc_url=None)
+    app.state.upstream = upstream
+
+    async def respond(path: str, request: Request, generate) -> Any:
+        upstream.count(path)
+        body = await request.json()
+        error = upstream.injected_error()
+        if error is not None:
+            return error
+        entry = await upstream.answer(path, body, generate)
+        if entry["status"] != 200:
+            return JSONResponse(entry["response"], status_code=entry["status"])
+
+        recorded = entry["latency"] if upstream.mode == "replay" else None
+        delay = recorded if recorded is not None else upstream.first_token_delay()
+        response = entry["response"]
+        if not body.get("stream") or path == "/embeddings":
+            if upstream.mode != "record":
+                completion_tokens = response.get("usage", {}).get("completion_tokens", 0)
+                await asyncio.sleep(delay + (0.0 if recorded is not None else upstream.token_delay(completion_tokens)))
+            return JSONResponse(response)
+
+        async def events() -> AsyncIterator[bytes]:
+            if upstream.mode != "record":
+                await asyncio.sleep(delay)
+            for chunk in _stream_chunks(path, response):
+                yield f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+                await asyncio.sleep(upstream.token_delay(1))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage = {"id": response["id"], "object": "chat.completion.chunk", "created": response["created"],
+                         "model": response["model"], "choices": [], "usage": response["usage"]}
+                yield f"data: {json.dumps(usage)}\n\n".encode("utf-8")
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions_endpoint(request: Request):
+        return await respond("/chat/completions", request, chat_completion)
+
+    @app.post("/v1/completions")
+    async def completions_endpoint(request: Request):
+        return await respond("/completions", request, text_completion)
+
+    @app.post("/v1/embeddings")
+    async def embeddings_endpoint(request: Request):
+        return await respond("/embeddings", request, embeddings)
+
+    @app.get("/v1/models")
+    async def models_endpoint():
+        upstream.count("/models")
+        return {"object": "list", "data": [{"id": m, "object": "model", "created": 0, "owned_by": "stub"} for m in MODELS]}
+
+    @app.get("/stub/stats")
+    async def stats_endpoint():
+        return upstream.stats
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--profile", default="fast", choices=sorted(PROFILES))
+    parser.add_argument("--error-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-500", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mode", default="generate", choices=["generate", "record", "replay"])
+    parser.add_argument("--cassette", default=None, help="JSON-lines file for record/replay")
+    parser.add_argument("--upstream", default="https://api.openai.com/v1", help="Real API for record mode")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    upstream = StubUpstream(
+        args.profile, args.error_429, args.error_500, args.seed, args.mode, args.cassette, args.upstream
+    )
+    print(f"OpenAI stub ({args.mode}, profile {args.profile}) on http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_stub_app(upstream), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Offline retrieval quality and latency benchmark for the RAG layer.
+
+Builds a synthetic corpus of users, tasks and chats with labelled relevant
+documents, indexes it into the NumPy vector store with a deterministic local
+embedding, and runs every retriever configuration against it. Reports
+recall@k, MRR, p50/p95 latency and tokens per packed context, and writes each
+run to benchmarks/results/ as JSON so runs can be compared over time.
+
+Usage:
+    python -m benchmarks.retrieval
+    python -m benchmarks.retrieval --users 200 --tasks 50 --compare benchmarks/results/<previous>.json
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from langchain.schema import BaseRetriever, Document
+from langchain.schema.embeddings import Embeddings
+
+from benchmarks import git_commit, write_run
+from app.models.database_models import Task as TaskModel, ChatHistory as ChatHistoryModel
+from app.tokenizer import count_tokens
+from rag.ann_index import TunedRetriever
+from rag.chunking import chunk_chat
+from rag.context_packer import ContextPacker, items_from_documents
+from rag.hybrid import HybridRetriever, doc_key
+from rag.indexing import document_id, task_document
+from rag.numpy_store import NumpyVectorStore
+
+TOPICS = {
+    "work": ["quarterly", "report", "slides", "revenue", "deck", "budget", "forecast", "client", "invoice", "meeting"],
+    "study": ["exam", "chapter", "essay", "thesis", "lecture", "flashcards", "homework", "seminar", "reading", "notes"],
+    "health": ["gym", "run", "yoga", "dentist", "doctor", "sleep", "stretching", "vitamins", "walk", "swim"],
+    "home": ["laundry", "groceries", "dishes", "vacuum", "plants", "rent", "repair", "closet", "recycling", "kitchen"],
+    "social": ["birthday", "gift", "dinner", "call", "party", "wedding", "friend", "sister", "reunion", "card"],
+    "admin": ["passport", "taxes", "insurance", "bank", "visa", "form", "appointment", "renewal", "license", "bills"],
+}
+FILLER = ["today", "soon", "maybe", "really", "need", "to", "finish", "start", "the", "my", "for", "this", "week"]
+FEELINGS = ["stressed", "anxious", "tired", "motivated", "overwhelmed", "hopeful", "frustrated", "calm"]
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words embedding, so runs need no network and are reproducible."""
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0 if digest[4] & 1 else -1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class Query:
+    """A benchmark query with the keys of the documents that should be retrieved."""
+
+    def __init__(self, user_id: int, source: str, kind: str, text: str, relevant: List[str]):
+        self.user_id = user_id
+        self.source = source
+        self.kind = kind
+        self.text = text
+        self.relevant = relevant
+
+
+def build_corpus(users: int, tasks: int, chats: int, messages: int, queries: int, seed: int) -> Tuple[Dict[str, Document], List[Query]]:
+    """
+    Generate documents, as the indexer would produce them, and labelled queries.
+
+    Task queries are either the exact task name or a paraphrase sharing one
+    topic word with it; chat queries quote a few words of one chunk.
+    """
+    rng = random.Random(seed)
+    docs: Dict[str, Document] = {}
+    labelled: List[Query] = []
+    task_id = chat_id = 0
+    for user_id in range(1, users + 1):
+        open_tasks: List[Tuple[TaskModel, str, List[str]]] = []
+        for _ in range(tasks):
+            task_id += 1
+            topic = rng.choice(list(TOPICS))
+            words = rng.sample(TOPICS[topic], 3)
+            code = f"{rng.choice('ABCDEFGH')}{rng.randint(1, 9)}"
+            task = TaskModel(
+                id=task_id, user_id=user_id, name=f"{code} {words[0]} {words[1]}",
+                description=f"{' '.join(rng.sample(FILLER, 4))} {words[2]}",
+                is_completed=rng.random() < 0.3, priority=rng.randint(1, 3)
+            )
+            docs[document_id("task", task.id)] = task_document(task)
+            if not task.is_completed:
+                open_tasks.append((task, topic, words))
+
+        user_chunks: List[Document] = []
+        for _ in range(chats):
+            chat_id += 1
+            topic = rng.choice(list(TOPICS))
+            history = [
+                {
+                    "role": "user" if i % 2 == 0 else "assistant",
+                    "content": f"I feel {rng.choice(FEELINGS)} about the {' '.join(rng.sample(TOPICS[topic], 2))} {' '.join(rng.sample(FILLER, 3))}",
+                    "timestamp": 1_700_000_000 + chat_id * 3600 + i * 60,
+                }
+                for i in range(messages)
+            ]
+            chat = ChatHistoryModel(id=chat_id, user_id=user_id, name=f"chat {chat_id}", messages=json.dumps(history))
+            for key, doc in chunk_chat(chat).items():
+                docs[key] = doc
+                user_chunks.append(doc)
+
+        for _ in range(queries):
+            if open_tasks and rng.random() < 0.6:
+                task, topic, words = rng.choice(open_tasks)
+                if rng.random() < 0.5:
+                    labelled.append(Query(user_id, "task", "exact", task.name, [document_id("task", task.id)]))
+                else:
+                    paraphrase = f"{task.name.split()[0]} {words[2]} {rng.choice(TOPICS[topic])} {rng.choice(FILLER)}"
+                    labelled.append(Query(user_id, "task", "paraphrase", paraphrase, [document_id("task", task.id)]))
+            elif user_chunks:
+                chunk = rng.choice(user_chunks)
+                line = rng.choice(chunk.page_content.splitlines()).split(": ", 1)[-1]
+                labelled.append(Query(user_id, "chat", "quote", " ".join(line.split()[2:7]), [doc_key(chunk)]))
+    return docs, labelled
+
+
+def build_store(docs: Dict[str, Document], embedding: Embeddings) -> NumpyVectorStore:
+    store = NumpyVectorStore(embedding)
+    ids = list(docs)
+    store.upsert(ids, [docs[i] for i in ids], embedding.embed_documents([docs[i].page_content for i in ids]))
+    return store
+
+
+def lexical_search(docs: Dict[str, Document]) -> Callable[[str, Dict[str, Any]], List[Document]]:
+    """In-memory stand-in for the Postgres full-text search: ranks by matching query terms."""
+    postings: Dict[str, List[str]] = {}
+    for key, doc in docs.items():
+        for token in set(re.findall(r"\w+", doc.page_content.lower())):
+            postings.setdefault(token, []).append(key)
+
+    def search(query: str, limit: int, filter: Dict[str, Any]) -> List[Document]:
+        scores: Dict[str, int] = {}
+        for token in set(re.findall(r"\w+", query.lower())):
+            for key in postings.get(token, ()):
+                scores[key] = scores.get(key, 0) + 1
+        ranked = sorted(scores, key=lambda k: (-scores[k], k))
+        matching = [docs[k] for k in ranked if all(docs[k].metadata.get(f) == v for f, v in filter.items())]
+        return matching[:limit]
+    return search
+
+
+# Retriever configurations under test: name -> (source, factory(store, lexical, user_id))
+def configurations() -> Dict[str, Tuple[str, Callable[..., BaseRetriever]]]:
+    def dense(source: str, k: int, per_user: bool = True):
+        def build(store, lexical, user_id):
+            filter = {"status": "lagging"} if source == "task" else {"type": "chat"}
+            if per_user:
+                filter["user_id"] = user_id
+            return TunedRetriever(vectorstore=store, search_kwargs={"filter": filter, "k": k})
+        return source, build
+
+    def hybrid(source: str, k: int, candidates: int = 20):
+        def build(store, lexical, user_id):
+            filter = {"status": "lagging", "user_id": user_id} if source == "task" else {"type": "chat", "user_id": user_id}
+            base = TunedRetriever(vectorstore=store, search_kwargs={"filter": filter, "k": candidates})
+            return HybridRetriever(dense=base, lexical=lambda q, n: lexical(q, n, filter), k=k, candidates=candidates)
+        return source, build
+
+    return {
+        "task_dense_k5": dense("task", 5),
+        "task_dense_k5_global": dense("task", 5, per_user=False),
+        "task_dense_k3": dense("task", 3),
+        "task_hybrid_k5": hybrid("task", 5),
+        "task_hybrid_k3": hybrid("task", 3),
+        "chat_dense_k10": dense("chat", 10),
+        "chat_dense_k5": dense("chat", 5),
+        "chat_hybrid_k5": hybrid("chat", 5),
+    }
+
+
+def evaluate(retriever_factory, store, lexical, queries: List[Query], packer: ContextPacker, section: str) -> Dict[str, Any]:
+    latencies, recalls, reciprocal_ranks, tokens = [], [], [], []
+    for query in queries:
+        retriever = retriever_factory(store, lexical, query.user_id)
+        start = time.perf_counter()
+        results = retriever.get_relevant_documents(query.text)
+        latencies.append(time.perf_counter() - start)
+
+        keys = [doc_key(d) for d in results]
+        hits = [rank for rank, key in enumerate(keys, start=1) if key in query.relevant]
+        recalls.append(len(hits) / len(query.relevant))
+        reciprocal_ranks.append(1.0 / hits[0] if hits else 0.0)
+        packed = packer.pack_section(section, items_from_documents(results), chronological=section == "chat")
+        tokens.append(count_tokens("\n".join(packed)))
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "queries": len(queries),
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "latency_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "latency_p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "context_tokens_mean": round(float(np.mean(tokens)), 1),
+    }
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"\nCompared with {previous.get('started_at')} ({previous.get('commit')}):")
+    for name, metrics in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+        deltas = ", ".join(f"{metric} {metrics[metric] - before[metric]:+.3f}" for metric in metrics if metric != "queries" and metric in before)
+        print(f"  {name:24} {deltas}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=40, help="Tasks per user")
+    parser.add_argument("--chats", type=int, default=5, help="Chats per user")
+    parser.add_argument("--messages", type=int, default=24, help="Messages per chat")
+    parser.add_argument("--queries", type=int, default=10, help="Queries per user")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--only", nargs="*", help="Run only these configurations")
+    parser.add_argument("--output", default=None, help="Result file (default: benchmarks/results/retrieval-<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Previous result file to compare against")
+    args = parser.parse_args()
+
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    docs, queries = build_corpus(args.users, args.tasks, args.chats, args.messages, args.queries, args.seed)
+    embedding = HashingEmbeddings()
+    build_start = time.perf_counter()
+    store = build_store(docs, embedding)
+    print(f"Indexed {len(docs)} documents in {time.perf_counter() - build_start:.2f}s; {len(queries)} queries")
+
+    lexical = lexical_search(docs)
+    packer = ContextPacker()
+    results = {}
+    for name, (source, factory) in configurations().items():
+        if args.only and name not in args.only:
+            continue
+        section = "tasks" if source == "task" else "chat"
+        results[name] = evaluate(factory, store, lexical, [q for q in queries if q.source == source], packer, section)
+        m = results[name]
+        print(f"  {name:24} recall@k={m['recall_at_k']:.3f} mrr={m['mrr']:.3f} "
+              f"p50={m['latency_p50_ms']:.2f}ms p95={m['latency_p95_ms']:.2f}ms tokens={m['context_tokens_mean']:.0f}")
+
+    run = {
+        "started_at": started_at.isoformat(),
+        "commit": git_commit(),
+        "corpus": {k: getattr(args, k) for k in ("users", "tasks", "chats", "messages", "queries", "seed")},
+        "documents": len(docs),
+        "results": results,
+    }
+    write_run(run, "retrieval", started_at, args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(run, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
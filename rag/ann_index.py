@@ -0,0 +1,207 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import BaseRetriever, Document
+from sqlalchemy import asc, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+
+# Partial ANN indexes, one per retriever, so the retriever's type/status filter
+# is applied by the index predicate before the nearest-neighbour search. The
+# user filter is not; see search_settings
+PARTIAL_INDEXES = {
+    "ix_rag_embedding_task_lagging_ann": "(cmetadata ->> 'status') = 'lagging'",
+    "ix_rag_embedding_chat_ann": "(cmetadata ->> 'type') = 'chat'",
+}
+
+# B-tree that lets the planner go straight to one user's rows
+USER_INDEX = "ix_rag_embedding_collection_user"
+
+
+def ann_index_statements(method: str, dimensions: int) -> List[str]:
+    """
+    DDL creating the ANN and per-user indexes for the rag_index collection.
+
+    Args:
+        method: "hnsw" or "ivfflat"
+        dimensions: Embedding dimensionality; ANN indexes need a fixed-size column
+    """
+    if method == "hnsw":
+        using = f"hnsw (embedding vector_cosine_ops) WITH (m = {settings.RAG_HNSW_M}, ef_construction = {settings.RAG_HNSW_EF_CONSTRUCTION})"
+    elif method == "ivfflat":
+        using = f"ivfflat (embedding vector_cosine_ops) WITH (lists = {settings.RAG_IVFFLAT_LISTS})"
+    else:
+        raise ValueError(f"Unsupported ANN index method: {method}")
+
+    statements = [
+        "CREATE EXTENSION IF NOT EXISTS vector",
+        f"ALTER TABLE {EMBEDDING_TABLE} ALTER COLUMN embedding TYPE vector({dimensions})",
+        f"CREATE INDEX IF NOT EXISTS {USER_INDEX} ON {EMBEDDING_TABLE} (collection_id, (cmetadata ->> 'user_id'))",
+    ]
+    for name, predicate in PARTIAL_INDEXES.items():
+        statements.append(f"CREATE INDEX IF NOT EXISTS {name} ON {EMBEDDING_TABLE} USING {using} WHERE {predicate}")
+    return statements
+
+
+def ann_index_sql(method: str, dimensions: int) -> str:
+    """
+    ann_index_statements as one idempotent block.
+
+    Does nothing until PGVector has created its tables. PGVector creates the
+    embedding column as an untyped `vector`, which ANN indexes can't use, so
+    the block retypes it to vector(dimensions), but only after checking that
+    every stored embedding has that many dimensions. A column already fixed
+    to another size, or rows of another size, raise an error naming the
+    mismatch rather than being converted, since that means EMBEDDING_DIMENSIONS
+    does not match the embedding model that filled the table. The block is safe
+    to run from the root migration and again whenever the indexer starts.
+    """
+    create_extension, alter_column, *indexes = ann_index_statements(method, dimensions)
+    expected = f"vector({dimensions})"
+    body = [
+        f"IF to_regclass('{EMBEDDING_TABLE}') IS NULL THEN RETURN; END IF;",
+        f"{create_extension};",
+        f"SELECT format_type(atttypid, atttypmod) INTO column_type FROM pg_attribute "
+        f"WHERE attrelid = '{EMBEDDING_TABLE}'::regclass AND attname = 'embedding';",
+        "IF column_type = 'vector' THEN",
+        f"IF EXISTS (SELECT 1 FROM {EMBEDDING_TABLE} WHERE vector_dims(embedding) <> {dimensions}) THEN "
+        f"RAISE EXCEPTION '{EMBEDDING_TABLE}.embedding holds vectors that are not % dimensional; "
+        f"set EMBEDDING_DIMENSIONS to match the embedding model or re-index', {dimensions}; END IF;",
+        f"{alter_column};",
+        f"ELSIF column_type <> '{expected}' THEN",
+        f"RAISE EXCEPTION '{EMBEDDING_TABLE}.embedding is %, expected {expected}', column_type;",
+        "END IF;",
+        *(f"{statement};" for statement in indexes),
+    ]
+    return "DO $ann$ DECLARE column_type text; BEGIN " + " ".join(body) + " END $ann$"
+
+
+def ensure_ann_indexes(bind) -> None:
+    """Create the rag_index ANN indexes if PGVector's tables exist and they are missing."""
+    with bind.begin() as conn:
+        conn.exec_driver_sql(ann_index_sql(settings.RAG_ANN_METHOD, settings.EMBEDDING_DIMENSIONS))
+
+
+def drop_ann_index_statements() -> List[str]:
+    """DDL dropping every index created by ann_index_statements."""
+    return [f"DROP INDEX IF EXISTS {name}" for name in [*PARTIAL_INDEXES, USER_INDEX]]
+
+
+class TunedRetriever(BaseRetriever):
+    """
+    Vector store retriever with per-query ANN recall/latency settings.
+
+    On PGVector, hnsw.ef_search and ivfflat.probes are set with SET LOCAL in
+    the transaction running the search, so each retriever keeps its own
+    trade-off. Other vector stores are searched exactly as usual.
+    """
+
+    vectorstore: Any
+    search_kwargs: Dict[str, Any] = {}
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        if not hasattr(self.vectorstore, "EmbeddingStore"):
+            return self.vectorstore.similarity_search(query, **self.search_kwargs)
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        return tuned_similarity_search(
+            self.vectorstore,
+            embedding,
+            k=self.search_kwargs.get("k", 4),
+            filter=self.search_kwargs.get("filter"),
+            ef_search=self.ef_search,
+            probes=self.probes
+        )
+
+
+# pgvector version per database, read once
+_pgvector_versions: Dict[str, Tuple[int, ...]] = {}
+
+
+def supports_iterative_scan(session: Session) -> bool:
+    """Whether the database's pgvector (0.8+) has iterative index scans."""
+    key = str(session.get_bind().url)
+    if key not in _pgvector_versions:
+        version = session.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar() or "0"
+        _pgvector_versions[key] = tuple(int(part) for part in re.findall(r"\d+", version))
+    return _pgvector_versions[key] >= (0, 8)
+
+
+def search_settings(
+    filter: Optional[Dict[str, Any]],
+    ef_search: Optional[int],
+    probes: Optional[int],
+    iterative: bool
+) -> List[str]:
+    """
+    SET LOCAL statements for one filtered ANN search.
+
+    No partial index covers a single user, so a user_id filter is applied to
+    the candidates the index returns. With iterative scans (pgvector 0.8+) the
+    index keeps producing candidates until k rows pass the filter, up to
+    hnsw.max_scan_tuples / ivfflat.max_probes. Without them the candidate
+    list is widened to RAG_ANN_USER_FILTER_EF_SEARCH / RAG_ANN_USER_FILTER_PROBES
+    instead, which lowers but does not remove the chance that a user with
+    few vectors gets fewer than k results.
+    """
+    statements = []
+    if iterative:
+        statements += [
+            "SET LOCAL hnsw.iterative_scan = relaxed_order",
+            "SET LOCAL ivfflat.iterative_scan = relaxed_order",
+        ]
+    elif filter and "user_id" in filter:
+        ef_search = max(ef_search or 0, settings.RAG_ANN_USER_FILTER_EF_SEARCH)
+        probes = max(probes or 0, settings.RAG_ANN_USER_FILTER_PROBES)
+    if ef_search is not None:
+        statements.append(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+    if probes is not None:
+        statements.append(f"SET LOCAL ivfflat.probes = {int(probes)}")
+    return statements
+
+
+def tuned_similarity_search(
+    vectorstore,
+    embedding: List[float],
+    k: int = 4,
+    filter: Optional[Dict[str, Any]] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None
+) -> List[Document]:
+    """
+    Run a PGVector similarity search with ANN parameters scoped to one transaction.
+
+    Args:
+        vectorstore: PGVector instance
+        embedding: Query embedding
+        k: Number of documents to return
+        filter: Metadata equality filter, matched the same way PGVector does
+        ef_search: HNSW candidate list size; higher is better recall, slower
+        probes: IVFFlat lists probed; higher is better recall, slower
+    """
+    with Session(vectorstore._bind) as session:
+        iterative = settings.RAG_ANN_ITERATIVE_SCAN and supports_iterative_scan(session)
+        for statement in search_settings(filter, ef_search, probes, iterative):
+            session.execute(text(statement))
+
+        collection = vectorstore.get_collection(session)
+        if not collection:
+            raise ValueError("Collection not found")
+        store = vectorstore.EmbeddingStore
+        clauses = [store.collection_id == collection.uuid]
+        clauses += [store.cmetadata[key].astext == str(value) for key, value in (filter or {}).items()]
+        rows = (
+            session.query(store, vectorstore.distance_strategy(embedding).label("distance"))
+            .filter(*clauses)
+            .order_by(asc("distance"))
+            .limit(k)
+            .all()
+        )
+    return [Document(page_content=row[0].document, metadata=row[0].cmetadata) for row in rows]
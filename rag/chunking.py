@@ -0,0 +1,93 @@
+import datetime
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from app.config import settings
+from app.models.database_models import ChatHistory as ChatHistoryModel
+from app.services.chat_summary_service import load_messages, message_line
+
+TIMESTAMP_KEYS = ("timestamp", "created_at")
+
+
+def chunk_id(chat_id: int, start: int, end: int) -> str:
+    """Stable vector ID for messages [start, end) of a chat."""
+    return f"chat:{chat_id}:{start}-{end}"
+
+
+def chunk_windows(count: int, window: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Overlapping [start, end) message windows over a conversation of `count` messages.
+
+    Windows start at multiples of window - overlap, so appending messages
+    never moves an existing full window; only the trailing partial window is
+    replaced as it fills up. Windows contained in the previous one are skipped.
+    """
+    if window <= 0 or not 0 <= overlap < window:
+        raise ValueError("Chunk window must be positive and larger than the overlap")
+    windows: List[Tuple[int, int]] = []
+    for start in range(0, count, window - overlap):
+        end = min(start + window, count)
+        if windows and end <= windows[-1][1]:
+            break
+        windows.append((start, end))
+    return windows
+
+
+def message_timestamp(message: Dict[str, Any]) -> Optional[float]:
+    """Epoch seconds of a message's timestamp/created_at field, if it has a usable one."""
+    for key in TIMESTAMP_KEYS:
+        value = message.get(key)
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                continue
+    return None
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_chat(chat: ChatHistoryModel, window: Optional[int] = None, overlap: Optional[int] = None) -> Dict[str, Document]:
+    """
+    Split a chat history into overlapping windows at message boundaries.
+
+    Args:
+        chat: Chat history to chunk
+        window: Messages per chunk (defaults to CHAT_CHUNK_MESSAGES)
+        overlap: Messages shared by consecutive chunks (defaults to CHAT_CHUNK_OVERLAP)
+
+    Returns:
+        Documents by chunk ID, in conversation order
+    """
+    window = window or settings.CHAT_CHUNK_MESSAGES
+    overlap = settings.CHAT_CHUNK_OVERLAP if overlap is None else overlap
+    messages = load_messages(chat.messages)
+    fallback_timestamp = (chat.updated_at or chat.created_at).timestamp() if (chat.updated_at or chat.created_at) else None
+
+    chunks: Dict[str, Document] = {}
+    for start, end in chunk_windows(len(messages), window, overlap):
+        part = messages[start:end]
+        roles = [m.get("role", "user") for m in part]
+        timestamps = [t for t in (message_timestamp(m) for m in part) if t is not None]
+        chunks[chunk_id(chat.id, start, end)] = Document(
+            page_content="\n".join(message_line(m) for m in part),
+            metadata={
+                "type": "chat",
+                "chat_id": chat.id,
+                "chunk_id": chunk_id(chat.id, start, end),
+                "user_id": chat.user_id,
+                "seq_start": start,
+                "seq_end": end,
+                "user_messages": roles.count("user"),
+                "assistant_messages": roles.count("assistant"),
+                "first_timestamp": timestamps[0] if timestamps else None,
+                "timestamp": timestamps[-1] if timestamps else fallback_timestamp,
+            }
+        )
+    return chunks
@@ -0,0 +1,137 @@
+from typing import Dict, Iterable, List, Optional
+
+from langchain.schema import Document
+
+from app.config import settings
+from app.tokenizer import DEFAULT_MODEL, count_tokens, truncate_to_tokens
+
+
+class ContextItem:
+    """A candidate piece of prompt context with its ranking signals."""
+
+    def __init__(self, text: str, relevance: float = 0.0, timestamp: Optional[float] = None):
+        self.text = text
+        self.relevance = relevance
+        self.timestamp = timestamp
+
+
+class ContextPacker:
+    """Assembles prompt sections so each one stays inside its token budget."""
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, int]] = None,
+        model: str = DEFAULT_MODEL,
+        max_item_tokens: Optional[int] = None
+    ):
+        """
+        Args:
+            budgets: Token budget per section name; defaults to the PROMPT_BUDGET_* settings
+            model: Model whose tokenizer is used for counting
+            max_item_tokens: Cap applied to any single item before packing
+        """
+        self.budgets = budgets if budgets is not None else default_budgets()
+        self.model = model
+        self.max_item_tokens = max_item_tokens if max_item_tokens is not None else settings.PROMPT_MAX_ITEM_TOKENS
+
+    def pack_section(self, section: str, items: Iterable[ContextItem], chronological: bool = False) -> List[str]:
+        """
+        Select the items of one section that fit in its budget.
+
+        Items are taken by relevance, then recency. Oversized items are
+        truncated to the per-item cap, and the last item that does not fit
+        whole is truncated to the space that is left.
+
+        Args:
+            section: Section name used to look up the budget
+            items: Candidate items
+            chronological: Emit selected items oldest-first instead of by rank
+
+        Returns:
+            Texts of the selected items
+        """
+        budget = self.budgets.get(section, 0)
+        items = list(items)
+        order = {id(item): position for position, item in enumerate(items)}
+        ranked = sorted(items, key=lambda i: (i.relevance, i.timestamp or 0.0), reverse=True)
+
+        selected = []
+        used = 0
+        for item in ranked:
+            remaining = budget - used
+            if remaining <= 0:
+                break
+            text = truncate_to_tokens(item.text, min(self.max_item_tokens, remaining), self.model)
+            if not text:
+                continue
+            used += count_tokens(text, self.model) + 1  # newline separator
+            selected.append((item, text))
+
+        if chronological:
+            # Fall back to input order for items without timestamps
+            selected.sort(key=lambda pair: (pair[0].timestamp or 0.0, order[id(pair[0])]))
+        return [text for _, text in selected]
+
+    def pack(self, sections: Dict[str, List[ContextItem]], chronological: Iterable[str] = ("chat",)) -> Dict[str, str]:
+        """
+        Pack every section and join each one into a block of text.
+
+        Args:
+            sections: Candidate items per section name
+            chronological: Sections whose items are emitted oldest-first
+
+        Returns:
+            Packed text per section name
+        """
+        chronological = set(chronological)
+        return {
+            name: "\n".join(self.pack_section(name, items, chronological=name in chronological))
+            for name, items in sections.items()
+        }
+
+
+def pack_recent(lines: List[str], max_tokens: int, max_item_tokens: Optional[int] = None, model: str = DEFAULT_MODEL) -> List[str]:
+    """
+    The most recent lines that fit `max_tokens`, in their original order.
+
+    Each line is first capped at `max_item_tokens` (defaults to
+    PROMPT_MAX_ITEM_TOKENS); packing stops at the first line, going back in
+    time, that no longer fits.
+    """
+    max_item_tokens = settings.PROMPT_MAX_ITEM_TOKENS if max_item_tokens is None else max_item_tokens
+    packed: List[str] = []
+    for line in reversed(lines):
+        line = truncate_to_tokens(line, max_item_tokens, model)
+        cost = count_tokens(line, model) + 1
+        if cost > max_tokens:
+            break
+        packed.append(line)
+        max_tokens -= cost
+    return packed[::-1]
+
+
+def default_budgets() -> Dict[str, int]:
+    """Per-section token budgets from settings."""
+    return {
+        "tasks": settings.PROMPT_BUDGET_TASKS_TOKENS,
+        "chat": settings.PROMPT_BUDGET_CHAT_TOKENS,
+    }
+
+
+def items_from_documents(docs: List[Document], render=None) -> List[ContextItem]:
+    """
+    Turn retrieved documents into context items.
+
+    Retrieval order is used as relevance unless a `score` is present in the
+    metadata, and `timestamp` metadata (epoch seconds) is used for recency.
+
+    Args:
+        docs: Retrieved documents, most relevant first
+        render: Optional callable turning a document into its prompt line
+    """
+    items = []
+    for rank, d in enumerate(docs):
+        relevance = d.metadata.get("score", 1.0 / (rank + 1))
+        text = render(d) if render is not None else d.page_content
+        items.append(ContextItem(text, relevance=relevance, timestamp=d.metadata.get("timestamp")))
+    return items
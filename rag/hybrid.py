@@ -0,0 +1,150 @@
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain.schema import BaseRetriever, Document
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.database_models import Task as TaskModel, ChatHistory as ChatHistoryModel
+from rag.chunking import chunk_chat
+from rag.indexing import document_id, task_document
+
+LexicalSearch = Callable[[str, int], List[Document]]
+
+# Text the full-text indexes are built over; queries must use the exact same
+# expression for Postgres to pick the GIN index
+TASK_DOCUMENT_SQL = "coalesce(name, '') || ' ' || coalesce(description, '')"
+CHAT_DOCUMENT_SQL = "coalesce(messages, '')"
+
+# Lexical queries run here while the calling thread does the vector search
+_lexical_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-lexical")
+
+
+def tsvector_sql(document_sql: str, config: Optional[str] = None) -> str:
+    """SQL for the tsvector of a document expression, shared by queries and migrations."""
+    config = config or settings.RAG_TEXT_SEARCH_CONFIG
+    if not re.fullmatch(r"[a-z_]+", config):
+        raise ValueError(f"Invalid text search configuration: {config}")
+    return f"to_tsvector('{config}'::regconfig, {document_sql})"
+
+
+def _text_search(db: Session, model, document_sql: str, query: str, limit: int, *filters) -> list:
+    vector = literal_column(tsvector_sql(document_sql))
+    tsquery = func.websearch_to_tsquery(literal_column(f"'{settings.RAG_TEXT_SEARCH_CONFIG}'::regconfig"), query)
+    return (
+        db.query(model)
+        .filter(vector.op("@@")(tsquery), *filters)
+        .order_by(func.ts_rank_cd(vector, tsquery).desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def search_tasks(db: Session, query: str, limit: int, user_id: Optional[int] = None, lagging_only: bool = True) -> List[Document]:
+    """
+    Full-text search over task names and descriptions, best match first.
+
+    Args:
+        db: Database session
+        query: Free text; quoted phrases and -exclusions are supported
+        limit: Maximum number of tasks
+        user_id: Restrict to one user's tasks (optional)
+        lagging_only: Only return open tasks, like get_task_retriever
+    """
+    filters = []
+    if user_id is not None:
+        filters.append(TaskModel.user_id == user_id)
+    if lagging_only:
+        filters.append(TaskModel.is_completed == False)
+    tasks = _text_search(db, TaskModel, TASK_DOCUMENT_SQL, query, limit, *filters)
+    return [task_document(task) for task in tasks]
+
+
+def search_chats(db: Session, query: str, limit: int, user_id: Optional[int] = None) -> List[Document]:
+    """
+    Full-text search over chat messages, best match first.
+
+    Matching chats are returned as their message chunks that mention a query
+    term, the same documents the vector index holds.
+    """
+    filters = [ChatHistoryModel.user_id == user_id] if user_id is not None else []
+    chats = _text_search(db, ChatHistoryModel, CHAT_DOCUMENT_SQL, query, limit, *filters)
+    terms = [t for t in re.findall(r"\w+", query.lower()) if len(t) > 2]
+    docs: List[Document] = []
+    for chat in chats:
+        chunks = list(chunk_chat(chat).values())
+        matching = [c for c in chunks if any(t in c.page_content.lower() for t in terms)]
+        docs.extend(matching or chunks[-1:])
+    return docs[:limit]
+
+
+def session_search(search: Callable[..., List[Document]], **kwargs: Any) -> LexicalSearch:
+    """Bind a search function to its own short-lived session, for use from another thread."""
+    def run(query: str, limit: int) -> List[Document]:
+        db = SessionLocal()
+        try:
+            return search(db, query, limit, **kwargs)
+        finally:
+            db.close()
+    return run
+
+
+def doc_key(doc: Document) -> str:
+    """Identity of a retrieved document, shared by vector and full-text results."""
+    if doc.metadata.get("chunk_id"):
+        return doc.metadata["chunk_id"]
+    kind = doc.metadata.get("type")
+    entity_id = doc.metadata.get(f"{kind}_id") if kind else None
+    return document_id(kind, entity_id) if entity_id is not None else doc.page_content
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: Optional[int] = None) -> List[Document]:
+    """
+    Fuse ranked lists with RRF: score(d) = sum over lists of 1 / (rrf_k + rank).
+
+    Returns:
+        Top-k documents, best first, with the fused score in their `score` metadata
+    """
+    rrf_k = settings.RAG_RRF_K if rrf_k is None else rrf_k
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [Document(page_content=docs[key].page_content, metadata={**docs[key].metadata, "score": scores[key]}) for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Runs a full-text search alongside a dense retriever and fuses both with RRF.
+
+    If the lexical side fails (e.g. not on Postgres) the dense ranking is used alone.
+    """
+
+    dense: BaseRetriever
+    lexical: Any
+    k: int = 5
+    candidates: int = 20
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        lexical = None
+        if query.strip():
+            lexical = _lexical_executor.submit(contextvars.copy_context().run, self.lexical, query, self.candidates)
+        dense_docs = self.dense.get_relevant_documents(query)
+        lexical_docs: List[Document] = []
+        if lexical is not None:
+            try:
+                lexical_docs = lexical.result()
+            except Exception as e:
+                print(f"Error in full-text retrieval: {e}")
+        return reciprocal_rank_fusion([dense_docs, lexical_docs], self.k)
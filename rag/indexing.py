@@ -0,0 +1,248 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.database_models import Task as TaskModel, ChatHistory as ChatHistoryModel, ChatChunkIndex, IndexOutbox
+from rag.ann_index import ensure_ann_indexes
+from rag.chunking import chunk_chat, content_hash
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+def task_status(task: TaskModel) -> str:
+    """Status metadata used by get_task_retriever; open tasks are the ones still lagging."""
+    return "completed" if task.is_completed else "lagging"
+
+
+def task_document(task: TaskModel) -> Document:
+    """Render a task as a retrievable document; the first line is its name."""
+    content = task.name if not task.description else f"{task.name}\n{task.description}"
+    return Document(page_content=content, metadata={
+        "type": "task",
+        "task_id": task.id,
+        "user_id": task.user_id,
+        "status": task_status(task),
+        "priority": task.priority,
+    })
+
+
+def document_id(entity_type: str, entity_id: int) -> str:
+    """Stable vector ID for an indexed row."""
+    return f"{entity_type}:{entity_id}"
+
+
+class PGVectorSink:
+    """Writes documents into the PGVector collection used by build_rag_chain."""
+
+    def __init__(self, vectorstore):
+        self.vectorstore = vectorstore
+
+    def upsert(self, ids: List[str], docs: List[Document], embeddings: List[List[float]]) -> None:
+        # PGVector has no native upsert; replace rows by their custom ID
+        self.vectorstore.delete(ids=ids)
+        self.vectorstore.add_embeddings(
+            texts=[d.page_content for d in docs],
+            embeddings=embeddings,
+            metadatas=[d.metadata for d in docs],
+            ids=ids,
+        )
+
+    def delete(self, ids: List[str]) -> None:
+        self.vectorstore.delete(ids=ids)
+
+
+class OutboxIndexer:
+    """Drains the index outbox, embedding only changed tasks and chats."""
+
+    def __init__(
+        self,
+        sink,
+        embed: Optional[EmbedFn] = None,
+        batch_size: Optional[int] = None,
+        embedding_batch_size: Optional[int] = None
+    ):
+        """
+        Args:
+            sink: Vector store writer with upsert(ids, docs, embeddings), delete(ids)
+                and optionally flush() to persist each batch
+            embed: Batch embedding function; defaults to OpenAIService.create_embeddings
+                behind the content-addressed embedding cache
+            batch_size: Outbox rows claimed per drain (defaults to INDEXER_BATCH_SIZE)
+            embedding_batch_size: Texts per embedding request (defaults to EMBEDDING_BATCH_SIZE)
+        """
+        if embed is None:
+            from app.services.embedding_cache import get_embedding_cache
+            from app.services.openai_service import get_openai_service
+            compute = get_openai_service().create_embeddings
+            embed = lambda texts: get_embedding_cache().get_or_compute(texts, compute)
+        self.sink = sink
+        self.embed = embed
+        self.batch_size = batch_size or settings.INDEXER_BATCH_SIZE
+        self.embedding_batch_size = embedding_batch_size or settings.EMBEDDING_BATCH_SIZE
+
+    def drain_once(self, db: Session) -> int:
+        """
+        Claim one batch of outbox rows, apply it to the vector store and delete it.
+
+        Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED so several
+        workers can drain concurrently. On failure the batch is released
+        with its attempt count increased.
+
+        Returns:
+            Number of outbox rows processed
+        """
+        rows = (
+            db.query(IndexOutbox)
+            .filter(IndexOutbox.attempts < settings.INDEXER_MAX_ATTEMPTS)
+            .order_by(IndexOutbox.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            db.rollback()
+            return 0
+
+        try:
+            self._apply(db, rows)
+            flush = getattr(self.sink, "flush", None)
+            if flush is not None:
+                flush()
+            for row in rows:
+                db.delete(row)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            row_ids = [row.id for row in rows]
+            db.query(IndexOutbox).filter(IndexOutbox.id.in_(row_ids)).update(
+                {IndexOutbox.attempts: IndexOutbox.attempts + 1, IndexOutbox.error: str(e)},
+                synchronize_session=False
+            )
+            db.commit()
+            print(f"Error indexing outbox batch: {e}")
+        return len(rows)
+
+    def _apply(self, db: Session, rows: List[IndexOutbox]) -> None:
+        # Coalesce repeated changes: only the latest operation per entity matters
+        latest: Dict[Tuple[str, int], str] = {}
+        for row in rows:
+            latest[(row.entity_type, row.entity_id)] = row.operation
+
+        task_ids = [entity_id for (kind, entity_id), op in latest.items() if kind == "task" and op == "upsert"]
+        docs: Dict[str, Document] = {}
+        if task_ids:
+            for task in db.query(TaskModel).filter(TaskModel.id.in_(task_ids)):
+                docs[document_id("task", task.id)] = task_document(task)
+
+        # Anything deleted, or upserted but gone by now, is removed from the index
+        deletes = [
+            document_id(kind, entity_id) for kind, entity_id in latest
+            if kind == "task" and document_id(kind, entity_id) not in docs
+        ]
+        chat_docs, chat_deletes = self._chat_changes(db, [entity_id for kind, entity_id in latest if kind == "chat"])
+        docs.update(chat_docs)
+        deletes.extend(chat_deletes)
+        if deletes:
+            self.sink.delete(deletes)
+
+        ids = list(docs)
+        for start in range(0, len(ids), self.embedding_batch_size):
+            chunk = ids[start:start + self.embedding_batch_size]
+            embeddings = self.embed([docs[i].page_content for i in chunk])
+            self.sink.upsert(chunk, [docs[i] for i in chunk], embeddings)
+
+    def _chat_changes(self, db: Session, chat_ids: List[int]) -> Tuple[Dict[str, Document], List[str]]:
+        """
+        Diff the message chunks of changed chats against those already indexed.
+
+        Only new or edited chunks are returned for embedding; chunks that no
+        longer exist (or belong to a deleted chat) are returned for deletion.
+        The chunk bookkeeping is updated in the caller's transaction.
+        """
+        if not chat_ids:
+            return {}, []
+        indexed: Dict[int, Dict[str, ChatChunkIndex]] = {chat_id: {} for chat_id in chat_ids}
+        for entry in db.query(ChatChunkIndex).filter(ChatChunkIndex.chat_id.in_(chat_ids)):
+            indexed[entry.chat_id][entry.chunk_id] = entry
+        current: Dict[int, Dict[str, Document]] = {chat_id: {} for chat_id in chat_ids}
+        for chat in db.query(ChatHistoryModel).filter(ChatHistoryModel.id.in_(chat_ids)):
+            current[chat.id] = chunk_chat(chat)
+
+        docs: Dict[str, Document] = {}
+        deletes: List[str] = []
+        for chat_id in chat_ids:
+            if not indexed[chat_id]:
+                # Chats indexed before chunking were a single document
+                deletes.append(document_id("chat", chat_id))
+            for chunk_id, entry in indexed[chat_id].items():
+                if chunk_id not in current[chat_id]:
+                    deletes.append(chunk_id)
+                    db.delete(entry)
+            for chunk_id, doc in current[chat_id].items():
+                digest = content_hash(doc.page_content)
+                entry = indexed[chat_id].get(chunk_id)
+                if entry is None:
+                    db.add(ChatChunkIndex(chunk_id=chunk_id, chat_id=chat_id, content_hash=digest))
+                elif entry.content_hash != digest:
+                    entry.content_hash = digest
+                else:
+                    continue
+                docs[chunk_id] = doc
+        return docs, deletes
+
+    def run_forever(self, stop: Optional[threading.Event] = None, poll_interval: Optional[float] = None) -> None:
+        """
+        Drain the outbox until `stop` is set, sleeping only when it is empty.
+
+        Args:
+            stop: Event that ends the loop
+            poll_interval: Seconds to wait when there is nothing to do (defaults to INDEXER_POLL_INTERVAL_SECONDS)
+        """
+        stop = stop or threading.Event()
+        poll_interval = settings.INDEXER_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        while not stop.is_set():
+            db = SessionLocal()
+            try:
+                processed = self.drain_once(db)
+            except Exception as e:
+                print(f"Error draining index outbox: {e}")
+                processed = 0
+            finally:
+                db.close()
+            if processed == 0:
+                stop.wait(poll_interval)
+
+
+def build_pgvector_sink() -> PGVectorSink:
+    """Connect to the rag_index collection configured in settings."""
+    from langchain.embeddings import OpenAIEmbeddings
+    from langchain.vectorstores import PGVector
+
+    vectorstore = PGVector(
+        connection_string=settings.PGVECTOR_URL or settings.DATABASE_URL,
+        embedding_function=OpenAIEmbeddings(model=settings.EMBEDDING_MODEL, openai_api_key=settings.OPENAI_API_KEY),
+        collection_name=settings.RAG_COLLECTION_NAME,
+    )
+    try:
+        # Revision 0001 skips the ANN indexes if it ran before PGVector created its tables
+        ensure_ann_indexes(vectorstore._bind)
+    except Exception as e:
+        print(f"Error creating ANN indexes: {e}")
+    return PGVectorSink(vectorstore)
+
+
+def build_sink():
+    """Vector store writer for the configured RAG_BACKEND."""
+    if settings.RAG_BACKEND == "numpy":
+        from rag.numpy_store import build_numpy_vectorstore
+        return build_numpy_vectorstore()
+    return build_pgvector_sink()
+
+
+if __name__ == "__main__":
+    print(f"Starting index outbox worker ({settings.RAG_BACKEND} backend)...")
+    OutboxIndexer(build_sink()).run_forever()
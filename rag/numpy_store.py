@@ -0,0 +1,361 @@
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.vectorstore import VectorStore
+
+from app.config import settings
+
+GLOBAL_SHARD = "_global"
+
+# Metadata keys that get a precomputed boolean mask per distinct value
+MASKED_KEYS = ("type", "status")
+
+
+class _Shard:
+    """Contiguous float32 matrix of unit-length vectors for one user."""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.size = 0
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.positions: Dict[str, int] = {}
+        self._masks: Optional[Dict[Tuple[str, Any], np.ndarray]] = None
+        self.dirty = False
+
+    def upsert(self, id_: str, text: str, metadata: Dict[str, Any], vector: np.ndarray) -> None:
+        position = self.positions.get(id_)
+        if position is None:
+            self._ensure_writable(self.size + 1)
+            position = self.size
+            self.size += 1
+            self.ids.append(id_)
+            self.texts.append(text)
+            self.metadatas.append(metadata)
+            self.positions[id_] = position
+        else:
+            self._ensure_writable(self.size)
+            self.texts[position] = text
+            self.metadatas[position] = metadata
+        self.matrix[position] = vector
+        self._masks = None
+        self.dirty = True
+
+    def delete(self, id_: str) -> bool:
+        position = self.positions.pop(id_, None)
+        if position is None:
+            return False
+        self._ensure_writable(self.size)
+        last = self.size - 1
+        if position != last:
+            # Move the last row into the gap to keep the matrix contiguous
+            self.matrix[position] = self.matrix[last]
+            self.ids[position] = self.ids[last]
+            self.texts[position] = self.texts[last]
+            self.metadatas[position] = self.metadatas[last]
+            self.positions[self.ids[position]] = position
+        self.ids.pop()
+        self.texts.pop()
+        self.metadatas.pop()
+        self.size = last
+        self._masks = None
+        self.dirty = True
+        return True
+
+    def mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean row mask for an equality filter, or None when nothing is filtered."""
+        conditions = {k: v for k, v in (filter or {}).items() if k != "user_id"}
+        if not conditions:
+            return None
+        if self._masks is None:
+            self._build_masks()
+        result = np.ones(self.size, dtype=bool)
+        for key, value in conditions.items():
+            if key in MASKED_KEYS:
+                key_mask = self._masks.get((key, value))
+                if key_mask is None:
+                    return np.zeros(self.size, dtype=bool)
+            else:
+                key_mask = np.fromiter((m.get(key) == value for m in self.metadatas), dtype=bool, count=self.size)
+            result &= key_mask
+        return result
+
+    def _build_masks(self) -> None:
+        masks: Dict[Tuple[str, Any], np.ndarray] = {}
+        for position, metadata in enumerate(self.metadatas):
+            for key in MASKED_KEYS:
+                if key in metadata:
+                    masks.setdefault((key, metadata[key]), np.zeros(self.size, dtype=bool))[position] = True
+        self._masks = masks
+
+    def _ensure_writable(self, needed: int) -> None:
+        # Memory-mapped shards are read-only; copy into a growable array on first write
+        if needed > self.matrix.shape[0] or not self.matrix.flags.writeable:
+            capacity = max(needed, 2 * self.matrix.shape[0], 64)
+            grown = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.matrix[:self.size]
+            self.matrix = grown
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store with per-user shards and exact cosine top-k.
+
+    Implements the LangChain VectorStore interface, so as_retriever() and the
+    retrievers in langchain_rag_tools work unchanged, and the upsert/delete
+    interface of the outbox indexer's sinks.
+
+    Several processes can share one path: before each search, shards whose
+    JSON file changed since this store last read or wrote it are reloaded,
+    unless this store holds unflushed changes to them. Every method takes
+    the store's lock, so the indexer thread and request threads can share
+    one instance.
+    """
+
+    def __init__(self, embedding: Embeddings, path: Optional[str] = None):
+        """
+        Args:
+            embedding: Embedding model used for queries and add_texts
+            path: Directory the shards are persisted to and loaded from (optional)
+        """
+        self.embedding = embedding
+        self.path = path
+        self.shards: Dict[str, _Shard] = {}
+        self._shard_of: Dict[str, str] = {}
+        # Shard key -> (mtime_ns, size) of the JSON file as last loaded or flushed
+        self._versions: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.RLock()
+        if path and os.path.isdir(path):
+            self.load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def upsert(self, ids: List[str], docs: List[Document], embeddings: List[List[float]]) -> None:
+        """Insert or replace documents with precomputed embeddings."""
+        if not ids:
+            return
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            self._upsert(ids, docs, vectors)
+
+    def _upsert(self, ids: List[str], docs: List[Document], vectors: np.ndarray) -> None:
+        for id_, doc, vector in zip(ids, docs, vectors):
+            shard_key = str(doc.metadata.get("user_id", GLOBAL_SHARD))
+            previous = self._shard_of.get(id_)
+            if previous is not None and previous != shard_key:
+                self.shards[previous].delete(id_)
+            if shard_key not in self.shards:
+                self.shards[shard_key] = _Shard(vectors.shape[1])
+            self.shards[shard_key].upsert(id_, doc.page_content, dict(doc.metadata), vector)
+            self._shard_of[id_] = shard_key
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Remove documents by ID."""
+        with self._lock:
+            for id_ in ids or []:
+                shard_key = self._shard_of.pop(id_, None)
+                if shard_key is not None:
+                    self.shards[shard_key].delete(id_)
+        return True
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        # Random rather than counted, so IDs freed by delete are never handed out again
+        ids = ids or [f"doc:{uuid.uuid4().hex}" for _ in texts]
+        docs = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        self.upsert(ids, docs, self.embedding.embed_documents(texts))
+        return ids
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Exact cosine top-k, restricted to the user's shard when filtered by user_id.
+
+        Returns:
+            (document, cosine similarity) pairs, best first; the score is also
+            set as the document's `score` metadata
+        """
+        query = _normalize(np.asarray(embedding, dtype=np.float32)[None, :])[0]
+        with self._lock:
+            self.refresh()
+            return self._search(query, k, filter)
+
+    def _search(self, query: np.ndarray, k: int, filter: Optional[Dict[str, Any]]) -> List[Tuple[Document, float]]:
+        if filter and "user_id" in filter:
+            shard = self.shards.get(str(filter["user_id"]))
+            shards = [shard] if shard is not None else []
+        else:
+            shards = list(self.shards.values())
+
+        candidates: List[Tuple[float, _Shard, int]] = []
+        for shard in shards:
+            if shard.size == 0:
+                continue
+            scores = shard.matrix[:shard.size] @ query
+            mask = shard.mask(filter)
+            if mask is not None:
+                scores = np.where(mask, scores, -np.inf)
+            top = _top_k(scores, k)
+            candidates.extend((float(scores[i]), shard, int(i)) for i in top if np.isfinite(scores[i]))
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        results = []
+        for score, shard, position in candidates[:k]:
+            metadata = dict(shard.metadatas[position], score=score)
+            results.append((Document(page_content=shard.texts[position], metadata=metadata), score))
+        return results
+
+    def flush(self) -> None:
+        """
+        Persist changed shards if the store has a path.
+
+        Each shard is a vector matrix under a fresh name plus a JSON file of
+        IDs, texts and metadata naming that matrix. Both are written to temp
+        files first, and replacing the JSON is the commit point, so a crash
+        at any moment leaves either the old or the new version whole.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        for key, shard in self.shards.items():
+            if not shard.dirty:
+                continue
+            matrix_file = f"{key}.{uuid.uuid4().hex[:12]}.npy"
+            matrix_tmp = os.path.join(self.path, matrix_file + ".tmp")
+            with open(matrix_tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(shard.matrix[:shard.size]))
+            os.replace(matrix_tmp, os.path.join(self.path, matrix_file))
+
+            meta_path = os.path.join(self.path, f"{key}.json")
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump({"matrix": matrix_file, "ids": shard.ids, "texts": shard.texts, "metadatas": shard.metadatas}, f)
+            os.replace(meta_path + ".tmp", meta_path)
+            self._versions[key] = _file_version(meta_path)
+
+            self._remove_stale_matrices(key, keep=matrix_file)
+            shard.dirty = False
+
+    def _remove_stale_matrices(self, key: str, keep: str) -> None:
+        # Earlier versions, and any left by a flush that died before its commit point
+        for name in os.listdir(self.path):
+            if name != keep and name.startswith(f"{key}.") and name.endswith((".npy", ".npy.tmp")):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+    def load(self) -> None:
+        """Load every persisted shard, memory-mapping the vector matrices."""
+        with self._lock:
+            for name in os.listdir(self.path):
+                if name.endswith(".json"):
+                    self._load_shard(name[:-len(".json")])
+
+    def refresh(self) -> None:
+        """Reload shards another process flushed since this store last saw them."""
+        if not self.path or not os.path.isdir(self.path):
+            return
+        with self._lock:
+            for name in os.listdir(self.path):
+                if not name.endswith(".json"):
+                    continue
+                key = name[:-len(".json")]
+                shard = self.shards.get(key)
+                if shard is not None and shard.dirty:
+                    # Unflushed local changes win; this store's next flush overwrites the file
+                    continue
+                if self._versions.get(key) != _file_version(os.path.join(self.path, name)):
+                    self._load_shard(key)
+
+    def _load_shard(self, key: str) -> None:
+        meta_path = os.path.join(self.path, f"{key}.json")
+        version = _file_version(meta_path)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        matrix_file = meta.get("matrix", f"{key}.npy")
+        matrix = np.load(os.path.join(self.path, matrix_file), mmap_mode="r")
+        shard = _Shard(matrix.shape[1], capacity=1)
+        shard.matrix = matrix
+        shard.size = matrix.shape[0]
+        shard.ids, shard.texts, shard.metadatas = meta["ids"], meta["texts"], meta["metadatas"]
+        shard.positions = {id_: i for i, id_ in enumerate(shard.ids)}
+
+        previous = self.shards.get(key)
+        if previous is not None:
+            for id_ in previous.ids:
+                if self._shard_of.get(id_) == key:
+                    del self._shard_of[id_]
+        self.shards[key] = shard
+        self._shard_of.update((id_, key) for id_ in shard.ids)
+        self._versions[key] = version
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: Optional[str] = None,
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        store = cls(embedding, path=path)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+def build_numpy_vectorstore(embedding: Optional[Embeddings] = None) -> NumpyVectorStore:
+    """Open the local index at RAG_LOCAL_INDEX_DIR."""
+    if embedding is None:
+        from langchain.embeddings import OpenAIEmbeddings
+        embedding = OpenAIEmbeddings(model=settings.EMBEDDING_MODEL, openai_api_key=settings.OPENAI_API_KEY)
+    return NumpyVectorStore(embedding, path=settings.RAG_LOCAL_INDEX_DIR)
+
+
+def _file_version(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, using argpartition."""
+    if k >= scores.shape[0]:
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
@@ -0,0 +1,111 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain.schema import BaseRetriever, Document
+
+from app.deadline import Deadline
+from app.metrics import registry
+
+retrieval_latency = registry.histogram(
+    "rag_retrieval_duration_seconds", "Latency of each retrieval source", ["source", "outcome"]
+)
+retrieval_timeouts = registry.counter(
+    "rag_retrieval_timeouts_total", "Retrieval sources that missed their deadline", ["source"]
+)
+retrieval_errors = registry.counter(
+    "rag_retrieval_errors_total", "Retrieval sources that raised", ["source"]
+)
+# Sync retrievers run here rather than in the loop's default executor, so a
+# timed-out search never holds up asyncio.run() shutdown in retrieve_sync()
+_retrieval_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rag-retrieval")
+
+
+class RetrievalSource:
+    """A named retriever with its own latency budget."""
+
+    def __init__(self, name: str, retriever: BaseRetriever, timeout: float):
+        self.name = name
+        self.retriever = retriever
+        self.timeout = timeout
+
+
+class RetrievalResult:
+    """Documents per source, plus which sources fell back to an empty result."""
+
+    def __init__(self):
+        self.documents: Dict[str, List[Document]] = {}
+        self.latencies: Dict[str, float] = {}
+        self.timed_out: List[str] = []
+        self.failed: List[str] = []
+
+    @property
+    def complete(self) -> bool:
+        return not self.timed_out and not self.failed
+
+    def all_documents(self) -> List[Document]:
+        """Every document, in source order, e.g. for build_context_blocks."""
+        return [doc for docs in self.documents.values() for doc in docs]
+
+
+class RetrievalOrchestrator:
+    """
+    Queries several retrieval sources concurrently, each under its own deadline.
+
+    Total latency is that of the slowest source still within budget; a source
+    that times out or fails contributes no documents instead of failing the turn.
+    """
+
+    def __init__(self, sources: List[RetrievalSource]):
+        self.sources = sources
+
+    async def retrieve(self, query: str, deadline: Optional[Deadline] = None) -> RetrievalResult:
+        """
+        Run every source concurrently.
+
+        Args:
+            query: Retrieval query
+            deadline: Overall request deadline; caps each source's timeout (optional)
+
+        Returns:
+            RetrievalResult with documents for every source that finished in time
+        """
+        result = RetrievalResult()
+        outcomes = await asyncio.gather(*(self._run(source, query, deadline) for source in self.sources))
+        for source, (outcome, docs, elapsed) in zip(self.sources, outcomes):
+            result.documents[source.name] = docs
+            result.latencies[source.name] = elapsed
+            if outcome == "timeout":
+                result.timed_out.append(source.name)
+            elif outcome == "error":
+                result.failed.append(source.name)
+        return result
+
+    def retrieve_sync(self, query: str, deadline: Optional[Deadline] = None) -> RetrievalResult:
+        """Blocking variant of retrieve() for callers without an event loop."""
+        return asyncio.run(self.retrieve(query, deadline))
+
+    async def _run(self, source: RetrievalSource, query: str, deadline: Optional[Deadline]):
+        timeout = source.timeout if deadline is None else min(source.timeout, deadline.remaining())
+        start = time.monotonic()
+        try:
+            # A timed-out search thread is abandoned rather than interrupted
+            loop = asyncio.get_running_loop()
+            # Run in a copy of the caller's context so the search joins its trace
+            context = contextvars.copy_context()
+            search = loop.run_in_executor(_retrieval_executor, context.run, source.retriever.get_relevant_documents, query)
+            docs = await asyncio.wait_for(search, timeout=timeout)
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            docs, outcome = [], "timeout"
+            retrieval_timeouts.inc(source=source.name)
+            print(f"Retrieval source {source.name} timed out after {timeout:.2f}s")
+        except Exception as e:
+            docs, outcome = [], "error"
+            retrieval_errors.inc(source=source.name)
+            print(f"Error in retrieval source {source.name}: {e}")
+        elapsed = time.monotonic() - start
+        retrieval_latency.observe(elapsed, source=source.name, outcome=outcome)
+        return outcome, docs, elapsed
@@ -0,0 +1,197 @@
+import json
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.database_models import MBTIType as MBTITypeModel, ChatStyle as ChatStyleModel
+from app.tokenizer import count_tokens, truncate_to_tokens
+
+# Prompt content is laid out from most static to most volatile so that the
+# longest possible prefix is byte-identical across requests and can be served
+# from the provider's prompt cache:
+#   1. persona rules, active-listening framework and tool instructions (all users)
+#   2. per-MBTI tone keywords (16 variants)
+#   3. the user
+#   4. the current time and retrieved context (every turn)
+
+PERSONA_RULES = """
+You are EmotiTask, an intelligent AI emotional supporter that helps the user to manage their tasks while adapting to their personalities and caring for their emotional well-being.
+
+---
+**Active Listening Techniques:**
+1. Paraphrasing: Rephrase what the user said to show understanding.
+2. Verbalizing Emotions: Directly express and acknowledge the user's emotions.
+3. Summarizing: Write a short and concise summary of the conversation so far.
+4. Encouraging: Praise the user when they share personal issues, especially difficult ones.
+
+**Chain of Thought (CoT) Guidance:**
+When the user mentions an issue they're struggling with, guide them step-by-step:
+- First, ask which aspect causes the most stress (e.g. fear of unpreparedness, performance pressure, etc.).
+- Then, once the source is identified, brainstorm concrete strategies to address it.
+
+**Heuristic for Emotion Words:**
+When you detect words like “sad,” “frustrated,” “anxious,” “depressed,” or “disappointed,” always do all of the following:
+1. Paraphrase their sentence to confirm you’ve understood.
+2. Verbalize your own empathetic response (“I can see this must feel…”).
+3. Summarize the main point to show clarity.
+4. Encourage them to open up, praise their bravery, or offer comfort.
+
+---
+"""
+
+TOOL_INSTRUCTIONS = """
+When a task is overdue or within 15 minutes, start with a friendly check-in using active listening.
+Then suggest exactly one adjustment using the update_task tool.
+Format tool call as JSON string.
+
+Example:
+{"task_id":123,"field":"start_time","value":"2025-06-21T15:00:00"}
+
+Always finish with an empathic, encouraging closer that matches the active listening style.
+"""
+
+STATIC_PREFIX = PERSONA_RULES + TOOL_INSTRUCTIONS
+
+STYLE_TEMPLATE = """
+### PERSONA STYLE
+Always use these tone keywords: {keywords}
+"""
+
+USER_TEMPLATE = """
+### USER
+User's MBTI profile: {persona}
+User's name: {user_name}
+"""
+
+CONTEXT_TEMPLATE = """
+Current time: {now}
+
+### OPEN TASKS
+{tasks_block}
+
+### RECENT CHAT
+{chat_block}
+"""
+
+
+def style_keywords(keywords: Optional[str]) -> str:
+    """Render a chat style's keywords, which are stored as a JSON string, within PROMPT_BUDGET_PERSONA_TOKENS."""
+    if not keywords:
+        return ""
+    try:
+        parsed = json.loads(keywords)
+    except ValueError:
+        parsed = keywords
+    if isinstance(parsed, dict):
+        rendered = ", ".join(str(v) for v in parsed.values())
+    elif isinstance(parsed, list):
+        rendered = ", ".join(str(v) for v in parsed)
+    else:
+        rendered = str(parsed)
+    return truncate_to_tokens(rendered, settings.PROMPT_BUDGET_PERSONA_TOKENS)
+
+
+class PromptAssembler:
+    """Builds chat prompts whose prefix is shared by every user of a persona."""
+
+    def __init__(self):
+        # The static prefix is fixed text, so it is checked once rather than truncated
+        self.static_tokens = count_tokens(STATIC_PREFIX)
+        if self.static_tokens > settings.PROMPT_BUDGET_SYSTEM_TOKENS:
+            raise ValueError(
+                f"Persona rules and tool instructions take {self.static_tokens} tokens, "
+                f"over PROMPT_BUDGET_SYSTEM_TOKENS ({settings.PROMPT_BUDGET_SYSTEM_TOKENS})"
+            )
+        self._prefixes: Dict[str, str] = {}
+
+    def precompile(self, db: Optional[Session] = None) -> int:
+        """
+        Build the static-plus-style prefix for every MBTI persona in one query.
+
+        Args:
+            db: Database session; a short-lived one is opened if omitted
+
+        Returns:
+            Number of persona prefixes compiled
+        """
+        session = db or SessionLocal()
+        try:
+            rows = (
+                session.query(MBTITypeModel.persona_id, ChatStyleModel.keywords)
+                .outerjoin(ChatStyleModel, ChatStyleModel.mbti_type_id == MBTITypeModel.id)
+                .order_by(MBTITypeModel.id, ChatStyleModel.id)
+                .all()
+            )
+        finally:
+            if db is None:
+                session.close()
+
+        compiled: Dict[str, str] = {}
+        for persona_id, keywords in rows:
+            # A persona with several chat styles uses its oldest one, as ChatSession does
+            if persona_id not in compiled:
+                compiled[persona_id] = self._compile(keywords)
+        self._prefixes.update(compiled)
+        return len(compiled)
+
+    def persona_prefix(self, persona_id: Optional[str], keywords: Optional[str] = None) -> str:
+        """
+        Get the cacheable system prefix for a persona.
+
+        Args:
+            persona_id: MBTI persona ID, e.g. "INTJ"
+            keywords: Chat style keywords, used if the persona was not precompiled
+        """
+        if persona_id is None:
+            return self._compile(keywords)
+        if persona_id not in self._prefixes:
+            self._prefixes[persona_id] = self._compile(keywords)
+        return self._prefixes[persona_id]
+
+    def build_messages(
+        self,
+        persona_id: Optional[str],
+        user_name: str,
+        now: str,
+        tasks_block: str,
+        chat_block: str,
+        keywords: Optional[str] = None,
+        persona: Optional[str] = None,
+        user_message: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Build chat messages ordered from most static to most volatile.
+
+        The first system message depends only on the persona, so it is
+        identical for every user and turn sharing that persona.
+
+        Returns:
+            List of chat messages for OpenAIService.chat_completion
+        """
+        volatile = USER_TEMPLATE.format(persona=persona or persona_id or "unknown", user_name=user_name)
+        volatile += CONTEXT_TEMPLATE.format(now=now, tasks_block=tasks_block, chat_block=chat_block)
+        messages = [
+            {"role": "system", "content": self.persona_prefix(persona_id, keywords)},
+            {"role": "system", "content": volatile},
+        ]
+        if user_message is not None:
+            messages.append({"role": "user", "content": user_message})
+        return messages
+
+    @staticmethod
+    def _compile(keywords: Optional[str]) -> str:
+        return STATIC_PREFIX + STYLE_TEMPLATE.format(keywords=style_keywords(keywords))
+
+
+# Global prompt assembler instance
+prompt_assembler: Optional[PromptAssembler] = None
+
+
+def get_prompt_assembler() -> PromptAssembler:
+    """Get or create prompt assembler instance."""
+    global prompt_assembler
+    if prompt_assembler is None:
+        prompt_assembler = PromptAssembler()
+    return prompt_assembler
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Offline questionnaire analysis through the OpenAI Batch API.
+
+Usage:
+    python run_batch.py requeue   # queue a re-analysis of every user's latest questionnaire
+    python run_batch.py submit    # write and submit pending jobs as batch files
+    python run_batch.py collect   # poll submitted batches and write results back
+    python run_batch.py run       # submit then collect
+
+Pass --local to use the in-process stand-in instead of the OpenAI API.
+"""
+
+import argparse
+from app.database import SessionLocal
+from app.services.batch_service import QuestionnaireBatchService, OpenAIBatchTransport, LocalBatchTransport
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch questionnaire processing")
+    parser.add_argument("command", choices=["requeue", "submit", "collect", "run"])
+    parser.add_argument("--local", action="store_true", help="Use the local batch stand-in")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Maximum jobs per batch file")
+    parser.add_argument("--timeout", type=float, default=None, help="Stop collecting after this many seconds")
+    args = parser.parse_args()
+
+    transport = LocalBatchTransport() if args.local else OpenAIBatchTransport()
+    service = QuestionnaireBatchService(transport, chunk_size=args.chunk_size)
+
+    db = SessionLocal()
+    try:
+        if args.command == "requeue":
+            print(f"Queued {service.requeue_latest(db)} questionnaire jobs")
+        elif args.command == "submit":
+            batch_ids = service.submit_pending(db)
+            print(f"Submitted {len(batch_ids)} batches: {', '.join(batch_ids)}")
+        elif args.command == "collect":
+            print(f"Updated {service.collect(db, timeout=args.timeout)} jobs")
+        else:
+            result = service.run(db, timeout=args.timeout)
+            print(f"Submitted {len(result['batch_ids'])} batches, updated {result['jobs_updated']} jobs")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
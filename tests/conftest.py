@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+# Point the application at a throwaway database before anything imports it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/emotitask-test.db")
+
+import pytest
+from fastapi.testclient import TestClient
+from app.database import Base, engine, SessionLocal
+from app.query_budget import QueryBudget
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(max_statements, max_repeats=None): fail the test if it issues more SQL statements"
+    )
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    """Run tests marked with query_budget under that budget, counting every thread."""
+    marker = item.get_closest_marker("query_budget")
+    if marker is None:
+        return (yield)
+    with QueryBudget(*marker.args, name=item.nodeid, all_threads=True, **marker.kwargs):
+        return (yield)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    import app.models.database_models  # noqa: F401  register the models
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def query_budget(request):
+    """
+    Factory for statement budgets around part of a test:
+
+        with query_budget(3):
+            client.get("/api/v1/tasks", params={"user_id": 1})
+    """
+    def make(max_statements=None, max_repeats=None, **kwargs) -> QueryBudget:
+        kwargs.setdefault("name", request.node.nodeid)
+        kwargs.setdefault("all_threads", True)
+        return QueryBudget(max_statements, max_repeats, **kwargs)
+    return make
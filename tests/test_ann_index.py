@@ -0,0 +1,24 @@
+from rag.ann_index import ann_index_sql, search_settings
+
+
+def test_embedding_column_is_only_retyped_after_a_dimension_check():
+    sql = ann_index_sql("hnsw", 768)
+    guard, alter = sql.index("vector_dims(embedding) <> 768"), sql.index("ALTER COLUMN embedding TYPE vector(768)")
+    assert guard < alter
+    assert "ELSIF column_type <> 'vector(768)' THEN RAISE EXCEPTION" in sql
+    assert sql.index("to_regclass('langchain_pg_embedding') IS NULL THEN RETURN") < guard
+
+
+def test_user_filtered_searches_scan_iteratively_or_widen_the_candidates(monkeypatch):
+    monkeypatch.setattr("rag.ann_index.settings.RAG_ANN_USER_FILTER_EF_SEARCH", 400)
+    monkeypatch.setattr("rag.ann_index.settings.RAG_ANN_USER_FILTER_PROBES", 50)
+    user_filter = {"type": "chat", "user_id": 7}
+
+    assert search_settings(user_filter, 80, 20, iterative=True) == [
+        "SET LOCAL hnsw.iterative_scan = relaxed_order",
+        "SET LOCAL ivfflat.iterative_scan = relaxed_order",
+        "SET LOCAL hnsw.ef_search = 80",
+        "SET LOCAL ivfflat.probes = 20",
+    ]
+    assert search_settings(user_filter, 80, 20, iterative=False) == ["SET LOCAL hnsw.ef_search = 400", "SET LOCAL ivfflat.probes = 50"]
+    assert search_settings({"type": "chat"}, 80, None, iterative=False) == ["SET LOCAL hnsw.ef_search = 80"]
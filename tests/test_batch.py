@@ -0,0 +1,110 @@
+import pytest
+from app.models.database_models import User, QuestionnaireJob
+from app.services.batch_service import LocalBatchTransport, QuestionnaireBatchService
+
+
+@pytest.fixture
+def user(db):
+    user = User(name="Batch", email="batch@example.com")
+    db.add(user)
+    db.commit()
+    yield user
+    db.query(QuestionnaireJob).delete()
+    db.delete(user)
+    db.commit()
+
+
+@pytest.fixture
+def batch_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.batch_service.settings.BATCH_DIR", str(tmp_path))
+    return tmp_path
+
+
+class CountingTransport(LocalBatchTransport):
+    """Local transport that counts submissions and can die right after one."""
+
+    def __init__(self, directory, crash=False):
+        super().__init__(directory)
+        self.crash = crash
+        self.submitted = 0
+
+    def submit(self, path):
+        batch_id = super().submit(path)
+        self.submitted += 1
+        if self.crash:
+            raise KeyboardInterrupt("killed before the batch ID was saved")
+        return batch_id
+
+
+def queue(client, user, **extra):
+    body = {"user_id": user.id, "question_answers": {"1": "I plan my week on Sundays"}, **extra}
+    return client.post("/api/v1/jobs/process-answers/batch", json=body)
+
+
+def test_queued_jobs_are_submitted_and_collected(db, client, user, batch_dir):
+    response = queue(client, user)
+    assert response.status_code == 202 and response.json()["status"] == "pending"
+    job_id = response.json()["job_id"]
+
+    service = QuestionnaireBatchService(LocalBatchTransport(str(batch_dir / "local")))
+    result = service.run(db, poll_interval=0)
+    assert len(result["batch_ids"]) == 1 and result["jobs_updated"] == 1
+
+    job = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert job["status"] == "completed"
+    assert job["response"].startswith("[local batch]") and "Batch" in job["prompt"]
+
+
+def test_empty_answers_are_rejected(client, user):
+    assert queue(client, user, question_answers={}).status_code == 400
+
+
+def test_interrupted_submit_is_not_submitted_twice(db, client, user, batch_dir):
+    job_id = queue(client, user).json()["job_id"]
+    crashing = CountingTransport(str(batch_dir / "local"), crash=True)
+    with pytest.raises(KeyboardInterrupt):
+        QuestionnaireBatchService(crashing).submit_pending(db)
+    db.rollback()
+    assert client.get(f"/api/v1/jobs/{job_id}").json()["status"] == "submitting"
+
+    transport = CountingTransport(str(batch_dir / "local"))
+    [batch_id] = QuestionnaireBatchService(transport).submit_pending(db)
+    assert transport.submitted == 0
+    assert QuestionnaireBatchService(transport).collect(db, poll_interval=0) == 1
+    assert client.get(f"/api/v1/jobs/{job_id}").json()["status"] == "completed"
+
+
+def test_malformed_output_fails_only_its_job(db, client, user, batch_dir):
+    responder = lambda body: {"choices": []} if "broken" in body["prompt"] else LocalBatchTransport._echo(body)
+    broken = queue(client, user, question_answers={"1": "broken"}).json()["job_id"]
+    fine = queue(client, user).json()["job_id"]
+
+    QuestionnaireBatchService(LocalBatchTransport(str(batch_dir / "local"), responder)).run(db, poll_interval=0)
+    assert client.get(f"/api/v1/jobs/{fine}").json()["status"] == "completed"
+    job = client.get(f"/api/v1/jobs/{broken}").json()
+    assert job["status"] == "failed" and "Malformed" in job["error"]
+
+
+class ExpiringTransport(LocalBatchTransport):
+    """Local transport whose batches expire before answering their first request."""
+
+    def submit(self, path):
+        batch_id = super().submit(path)
+        with open(self._output_path(batch_id)) as f:
+            lines = f.readlines()[1:]
+        with open(self._output_path(batch_id), "w") as f:
+            f.writelines(lines)
+        return batch_id
+
+    def status(self, batch_id):
+        return "expired"
+
+
+def test_expired_batch_keeps_the_results_it_has(db, client, user, batch_dir):
+    unfinished = queue(client, user, question_answers={"1": "unfinished"}).json()["job_id"]
+    finished = queue(client, user).json()["job_id"]
+
+    QuestionnaireBatchService(ExpiringTransport(str(batch_dir / "local"))).run(db, poll_interval=0)
+    assert client.get(f"/api/v1/jobs/{finished}").json()["status"] == "completed"
+    job = client.get(f"/api/v1/jobs/{unfinished}").json()
+    assert job["status"] == "failed" and job["error"] == "Batch expired"
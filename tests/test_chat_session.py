@@ -0,0 +1,168 @@
+import json
+import pytest
+from starlette.websockets import WebSocketDisconnect
+from app.models.database_models import User, Task, ChatHistory
+from app.services.chat_session import ChatSession
+from app.api import endpoints
+from app.services.task_update_service import notify_tasks_changed
+from benchmarks.load import StubOpenAIService
+
+HISTORY = [
+    {"role": "user", "content": "I keep putting off the report"},
+    {"role": "assistant", "content": "What part of it feels hardest to start?"},
+]
+
+
+@pytest.fixture
+def chat(db):
+    user = User(name="Sam", email="chat-session@example.com")
+    user.tasks = [Task(name="Write the report")]
+    user.chat_histories = [ChatHistory(name="Evening check-in", messages=json.dumps(HISTORY))]
+    db.add(user)
+    db.commit()
+    yield user.chat_histories[0]
+    db.delete(user)
+    db.commit()
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    service = StubOpenAIService(median_ms=1)
+    monkeypatch.setattr(endpoints, "get_openai_service", lambda: service)
+    return service
+
+
+def stored_messages(db, chat_id):
+    db.expire_all()
+    return json.loads(db.get(ChatHistory, chat_id).messages)
+
+
+def take_turn(ws, content):
+    ws.send_json({"type": "message", "content": content})
+    deltas = []
+    while True:
+        event = ws.receive_json()
+        if event["type"] != "delta":
+            return deltas, event
+        deltas.append(event["content"])
+
+
+def test_turns_stream_and_persist_each_message(db, client, chat, stub_llm):
+    with client.websocket_connect(f"/api/v1/chat-history/{chat.id}/ws") as ws:
+        assert ws.receive_json() == {"type": "ready", "chat_id": chat.id, "messages": 2}
+        deltas, done = take_turn(ws, "Maybe the introduction")
+        assert done["type"] == "done" and len(deltas) > 1
+        assert "".join(deltas) == done["message"]["content"]
+
+        messages = stored_messages(db, chat.id)
+        assert [m["role"] for m in messages] == ["user", "assistant", "user", "assistant"]
+        assert messages[2]["content"] == "Maybe the introduction"
+        assert db.get(ChatHistory, chat.id).tokens_used == done["usage"]["total_tokens"]
+
+
+def test_later_turns_only_append(client, chat, stub_llm, query_budget):
+    with client.websocket_connect(f"/api/v1/chat-history/{chat.id}/ws") as ws:
+        ws.receive_json()
+        take_turn(ws, "first")
+        # Persona, tasks and history are cached: each message is one update plus its index outbox row
+        with query_budget(4):
+            take_turn(ws, "second")
+
+
+def test_invalid_frames_keep_the_session_open(client, chat, stub_llm):
+    with client.websocket_connect(f"/api/v1/chat-history/{chat.id}/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"type": "message", "content": "  "})
+        assert ws.receive_json()["type"] == "error"
+        assert take_turn(ws, "still there?")[1]["type"] == "done"
+
+
+def test_unknown_chat_is_closed(client, stub_llm):
+    with client.websocket_connect("/api/v1/chat-history/999999/ws") as ws:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 4404
+
+
+def test_unavailable_openai_service_closes_the_socket(client, chat, monkeypatch):
+    def unconfigured():
+        raise ValueError("OpenAI API key not configured")
+
+    monkeypatch.setattr(endpoints, "get_openai_service", unconfigured)
+    with client.websocket_connect(f"/api/v1/chat-history/{chat.id}/ws") as ws:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1011
+    assert closed.value.reason == "OpenAI service unavailable: OpenAI API key not configured"
+
+
+def test_session_adopts_history_replaced_elsewhere(db, client, chat):
+    session = ChatSession(chat.id, StubOpenAIService(median_ms=1))
+    session.open(db)
+    try:
+        replaced = [{"role": "user", "content": "start over"}]
+        client.put(f"/api/v1/chat-history/{chat.id}/messages", json={"messages": json.dumps(replaced)})
+        session.append_message(db, {"role": "assistant", "content": "Sure"})
+        assert [m["content"] for m in stored_messages(db, chat.id)] == ["start over", "Sure"]
+    finally:
+        session.close()
+
+
+def test_task_changes_refresh_the_cached_task_block(db, chat):
+    session = ChatSession(chat.id, StubOpenAIService(median_ms=1))
+    session.open(db)
+    try:
+        assert "Write the report" in session.tasks_block(db)
+        db.add(Task(name="Book the dentist", user_id=chat.user_id))
+        db.commit()
+        assert "Book the dentist" not in session.tasks_block(db)
+        notify_tasks_changed([{"id": 0, "user_id": chat.user_id}])
+        assert "Book the dentist" in session.tasks_block(db)
+    finally:
+        session.close()
+
+
+def test_failed_reply_after_disconnect_sends_no_error_frame(monkeypatch):
+    import asyncio
+
+    class FailingSession:
+        messages = []
+
+        def __init__(self, *args, **kwargs):
+            self.closed = False
+
+        def open(self, db):
+            pass
+
+        def reply(self, content):
+            yield {"type": "delta", "content": "Let's"}
+            raise RuntimeError("upstream closed")
+
+        def close(self):
+            self.closed = True
+
+    class GoneWebSocket:
+        """Accepts the ready frame, then behaves like a disconnected client."""
+
+        def __init__(self):
+            self.sent = []
+            self.frames = [{"type": "message", "content": "hello"}]
+
+        async def accept(self):
+            pass
+
+        async def receive_json(self):
+            if not self.frames:
+                raise WebSocketDisconnect()
+            return self.frames.pop(0)
+
+        async def send_json(self, data):
+            if self.sent:
+                raise RuntimeError("Cannot call send once a close message has been sent")
+            self.sent.append(data)
+
+    monkeypatch.setattr(endpoints, "ChatSession", FailingSession)
+    monkeypatch.setattr(endpoints, "get_openai_service", lambda: None)
+    websocket = GoneWebSocket()
+    asyncio.run(endpoints.chat_session_websocket(websocket, 1))
+    assert [frame["type"] for frame in websocket.sent] == ["ready"]
@@ -0,0 +1,93 @@
+import json
+import pytest
+from app.models.database_models import User, ChatHistory
+from app.services.chat_summary_service import ChatSummaryService, conversation_context_lines
+
+
+class RecordingSummarizer:
+    """Stands in for OpenAIService; each summary names the messages it was given."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def chat_completion(self, messages, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        return {"response": f" summary #{len(self.prompts)} "}
+
+
+def history(count):
+    return json.dumps([{"role": "user", "content": f"message {i}"} for i in range(count)])
+
+
+@pytest.fixture
+def chat(db):
+    user = User(name="Summary", email="summary@example.com")
+    user.chat_histories = [ChatHistory(name="Long chat", messages=history(10))]
+    db.add(user)
+    db.commit()
+    yield user.chat_histories[0]
+    db.delete(user)
+    db.commit()
+
+
+def test_summaries_only_send_messages_not_yet_covered(db, chat):
+    llm = RecordingSummarizer()
+    service = ChatSummaryService(llm, keep_messages=3, trigger_tokens=1)
+    assert service.needs_summary(chat)
+    assert service.summarize(db, chat)
+    db.refresh(chat)
+    assert (chat.summary, chat.summary_message_count) == ("summary #1", 7)
+    assert "message 6" in llm.prompts[0] and "message 7" not in llm.prompts[0]
+    assert conversation_context_lines(chat) == ["Summary of earlier conversation: summary #1"] + [f"user: message {i}" for i in (7, 8, 9)]
+
+    chat.messages = history(12)
+    db.commit()
+    assert service.summarize(db, chat)
+    db.refresh(chat)
+    assert llm.prompts[1].startswith("Current summary:\nsummary #1")
+    assert "message 6" not in llm.prompts[1] and "message 8" in llm.prompts[1]
+    assert chat.summary_message_count == 9
+
+
+def test_threshold_and_concurrent_summaries(db, chat):
+    llm = RecordingSummarizer()
+    assert not ChatSummaryService(llm, keep_messages=3, trigger_tokens=10_000).needs_summary(chat)
+    assert not ChatSummaryService(llm, keep_messages=10, trigger_tokens=1).needs_summary(chat)
+
+    service = ChatSummaryService(llm, keep_messages=3, trigger_tokens=1)
+    # Another worker stores a summary after this one read the chat
+    db.query(ChatHistory).filter(ChatHistory.id == chat.id).update(
+        {"summary": "theirs", "summary_message_count": 5}, synchronize_session=False
+    )
+    assert not service.summarize(db, chat)
+    db.expire_all()
+    assert db.get(ChatHistory, chat.id).summary == "theirs"
+
+
+def test_rewriting_summarized_messages_drops_the_summary(db, client, chat):
+    db.query(ChatHistory).filter(ChatHistory.id == chat.id).update({"summary": "old", "summary_message_count": 7})
+    db.commit()
+
+    # Appending keeps the summary
+    client.put(f"/api/v1/chat-history/{chat.id}/messages", json={"messages": history(11)})
+    db.refresh(chat)
+    assert (chat.summary, chat.summary_message_count) == ("old", 7)
+
+    rewritten = json.loads(history(11))
+    rewritten[2]["content"] = "edited"
+    client.put(f"/api/v1/chat-history/{chat.id}", json={"messages": json.dumps(rewritten)})
+    db.refresh(chat)
+    assert (chat.summary, chat.summary_message_count) == (None, 0)
+
+
+def test_summary_is_discarded_if_history_is_rewritten_meanwhile(db, chat):
+    class RewritingSummarizer(RecordingSummarizer):
+        def chat_completion(self, messages, **kwargs):
+            db.query(ChatHistory).filter(ChatHistory.id == chat.id).update(
+                {"messages": history(4)}, synchronize_session=False
+            )
+            return super().chat_completion(messages, **kwargs)
+
+    assert not ChatSummaryService(RewritingSummarizer(), keep_messages=3, trigger_tokens=1).summarize(db, chat)
+    db.expire_all()
+    assert db.get(ChatHistory, chat.id).summary is None
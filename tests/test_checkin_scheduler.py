@@ -0,0 +1,94 @@
+import datetime
+import threading
+import time
+import pytest
+from app.models.database_models import User, Task
+from app.services import task_update_service
+from app.services.checkin_scheduler import CheckInScheduler, to_epoch
+
+NOW = datetime.datetime(2026, 3, 2, 9, 0)
+
+
+@pytest.fixture
+def user(db):
+    user = User(name="Nudge", email="nudge@example.com")
+    db.add(user)
+    db.commit()
+    yield user
+    db.query(Task).filter(Task.user_id == user.id).delete()
+    db.delete(user)
+    db.commit()
+
+
+def add_task(db, user, minutes, completed=False):
+    task = Task(name=f"In {minutes} min", user_id=user.id, due_at=NOW + datetime.timedelta(minutes=minutes), is_completed=completed)
+    db.add(task)
+    db.commit()
+    return task
+
+
+def test_load_window_pages_through_open_tasks_in_the_window(db, user):
+    inside = [add_task(db, user, m) for m in (10, 20, 30)]
+    add_task(db, user, 15, completed=True)
+    add_task(db, user, 120)
+
+    scheduler = CheckInScheduler(handler=lambda events: None, lead_seconds=0, batch_size=2)
+    start = to_epoch(NOW)
+    assert scheduler.load_window(db, start, start + 3600) == 3
+    assert scheduler.next_fire_time() == to_epoch(inside[0].due_at)
+    assert [e.task_id for e in scheduler.pop_due(start + 1800)] == [t.id for t in inside]
+
+
+def test_rescheduled_and_completed_tasks_fire_only_when_still_due(db, user):
+    moved, completed = add_task(db, user, 10), add_task(db, user, 20)
+    fired = []
+    scheduler = CheckInScheduler(handler=fired.extend, lead_seconds=300)
+    start = to_epoch(NOW)
+    scheduler.load_window(db, start, start + 3600)
+
+    moved.due_at = NOW + datetime.timedelta(minutes=40)
+    completed.is_completed = True
+    db.commit()
+    scheduler.handle_task_changes([task_update_service.task_change(moved), task_update_service.task_change(completed)])
+
+    assert scheduler.fire_due(start + 1800) == 0
+    assert scheduler.fire_due(start + 2400) == 1
+    assert [(e.task_id, e.kind) for e in fired] == [(moved.id, "due")]
+    assert len(scheduler) == 0
+
+
+def test_run_forever_unregisters_its_listener(monkeypatch):
+    monkeypatch.setattr(CheckInScheduler, "load_window", lambda self, db, start, end: setattr(self, "loaded_until", end) or 0)
+    scheduler = CheckInScheduler(handler=lambda events: None)
+    stop = threading.Event()
+    thread = threading.Thread(target=scheduler.run_forever, args=(stop,))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while scheduler.handle_task_changes not in task_update_service._listeners and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.handle_task_changes in task_update_service._listeners
+
+    stop.set()
+    scheduler._wakeup.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert scheduler.handle_task_changes not in task_update_service._listeners
+
+
+def test_refresh_picks_up_tasks_changed_by_other_processes(db, user):
+    fired = []
+    scheduler = CheckInScheduler(handler=fired.extend, lead_seconds=0)
+    start = to_epoch(NOW)
+    scheduler.load_window(db, start, start + 3600)
+    scheduler.refreshed_at = start
+
+    # Written without notifying this process's listeners, as another API process would
+    elsewhere = add_task(db, user, 10)
+    assert scheduler.fire_due(start + 900) == 0
+    assert scheduler.refresh(db, start + 300) == 1
+    assert scheduler.fire_due(start + 900) == 1
+
+    # The refresh window still covers the fired check-in; it does not fire again
+    scheduler.refresh(db, start + 900)
+    assert scheduler.fire_due(start + 1200) == 0
+    assert [e.task_id for e in fired] == [elsewhere.id]
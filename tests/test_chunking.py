@@ -0,0 +1,53 @@
+import json
+import pytest
+from app.models.database_models import User, ChatHistory, ChatChunkIndex, IndexOutbox
+from rag.chunking import chunk_windows
+from rag.indexing import OutboxIndexer
+from tests.test_indexing import RecordingEmbedder, RecordingSink
+
+
+def messages(count):
+    return json.dumps([{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(count)])
+
+
+@pytest.fixture
+def user(db, monkeypatch):
+    monkeypatch.setattr("rag.chunking.settings.CHAT_CHUNK_MESSAGES", 4)
+    monkeypatch.setattr("rag.chunking.settings.CHAT_CHUNK_OVERLAP", 1)
+    db.query(IndexOutbox).delete()
+    user = User(name="Chunks", email="chunks@example.com")
+    db.add(user)
+    db.commit()
+    yield user
+    db.query(IndexOutbox).delete()
+    db.query(ChatChunkIndex).delete()
+    db.query(ChatHistory).filter(ChatHistory.user_id == user.id).delete()
+    db.delete(user)
+    db.commit()
+
+
+def test_appending_messages_only_replaces_the_trailing_window():
+    assert chunk_windows(8, 4, 1) == [(0, 4), (3, 7), (6, 8)]
+    assert chunk_windows(9, 4, 1) == [(0, 4), (3, 7), (6, 9)]
+    assert chunk_windows(10, 4, 1) == [(0, 4), (3, 7), (6, 10)]
+    assert chunk_windows(0, 4, 1) == []
+    for window, overlap in [(0, 0), (4, 4), (4, -1)]:
+        with pytest.raises(ValueError):
+            chunk_windows(10, window, overlap)
+
+
+def test_only_new_or_changed_chunks_are_embedded(db, client, user):
+    chat = client.post("/api/v1/chat-history", json={"name": "Check-in", "user_id": user.id, "messages": messages(8)}).json()
+    sink, embed = RecordingSink(), RecordingEmbedder()
+    indexer = OutboxIndexer(sink, embed)
+    indexer.drain_once(db)
+    assert sorted(sink.vectors) == [f"chat:{chat['id']}:{r}" for r in ("0-4", "3-7", "6-8")]
+    # The whole-chat document written before chunking is cleared on first indexing
+    assert sink.deleted == [f"chat:{chat['id']}"]
+
+    client.put(f"/api/v1/chat-history/{chat['id']}/messages", json={"messages": messages(9)})
+    embed.clear()
+    indexer.drain_once(db)
+    assert embed == [["user: message 6\nassistant: message 7\nuser: message 8"]]
+    assert sink.deleted[-1] == f"chat:{chat['id']}:6-8"
+    assert sorted(sink.vectors) == [f"chat:{chat['id']}:{r}" for r in ("0-4", "3-7", "6-9")]
@@ -0,0 +1,14 @@
+from app.tokenizer import count_tokens
+from rag.context_packer import pack_recent
+
+
+def test_pack_recent_keeps_the_newest_lines_within_budget():
+    lines = [f"user: message number {i} about the quarterly report" for i in range(200)]
+    packed = pack_recent(lines, 100)
+    assert packed == lines[-len(packed):] and 0 < len(packed) < 20
+    assert sum(count_tokens(line) + 1 for line in packed) <= 100
+
+
+def test_pack_recent_caps_each_line():
+    packed = pack_recent(["short", "word " * 500], 1000, max_item_tokens=20)
+    assert packed[0] == "short" and count_tokens(packed[1]) <= 20
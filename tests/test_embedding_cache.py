@@ -0,0 +1,41 @@
+import pytest
+from app.models.database_models import EmbeddingCacheEntry
+from app.services.embedding_cache import EmbeddingCache, text_hash
+
+
+@pytest.fixture
+def cache(db):
+    yield EmbeddingCache("float32")
+    db.query(EmbeddingCacheEntry).delete()
+    db.commit()
+
+
+def fake_embed(calls):
+    def compute(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+    return compute
+
+
+def test_only_unseen_texts_are_computed(db, cache):
+    calls = []
+    first = cache.get_or_compute(["a  b", "cc", "a b"], fake_embed(calls), model="m")
+    assert calls == [["a  b", "cc"]]
+    assert first == [[4.0, 0.5], [2.0, 0.5], [4.0, 0.5]]
+
+    assert cache.get_or_compute(["cc", " a b "], fake_embed(calls), model="m") == [[2.0, 0.5], [4.0, 0.5]]
+    assert len(calls) == 1
+    # The model is part of the key
+    cache.get_or_compute(["cc"], fake_embed(calls), model="other")
+    assert calls[-1] == ["cc"]
+
+
+def test_put_many_ignores_existing_rows_and_leaves_the_commit_to_the_caller(db, cache):
+    cache.put_many(db, "m", {text_hash("x"): [1.0]})
+    db.commit()
+
+    # Another worker's row for the same key does not abort this transaction
+    cache.put_many(db, "m", {text_hash("x"): [9.0], text_hash("y"): [2.0]})
+    assert cache.get_many(db, "m", [text_hash("x"), text_hash("y")]) == {text_hash("x"): [1.0], text_hash("y"): [2.0]}
+    db.rollback()
+    assert cache.get_many(db, "m", [text_hash("y")]) == {}
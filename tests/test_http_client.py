@@ -0,0 +1,69 @@
+import httpx
+import pytest
+from app.services import http_client
+
+
+@pytest.fixture
+def shared_client(monkeypatch):
+    def install(client):
+        monkeypatch.setattr(http_client, "http_client", client)
+        return client
+    return install
+
+
+def test_pool_stats_read_the_default_transport(shared_client):
+    client = shared_client(httpx.Client())
+    assert http_client.pool_stats() == {"total": 0, "idle": 0, "active": 0, "available": True}
+    client.close()
+
+
+def test_pool_stats_degrade_for_unknown_transports(shared_client):
+    shared_client(httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200))))
+    assert http_client.pool_stats()["available"] is False
+    assert http_client._pool_gauge_values() == {}
+
+
+def test_missing_h2_warns_and_falls_back_to_http1(monkeypatch):
+    try:
+        import h2  # noqa: F401
+        pytest.skip("h2 is installed")
+    except ImportError:
+        pass
+    monkeypatch.setattr(http_client.settings, "OPENAI_HTTP2", True)
+    with pytest.warns(RuntimeWarning, match="falling back to HTTP/1.1"):
+        http_client.create_http_client().close()
+
+
+def test_shutdown_closes_the_client_after_background_threads_exit(monkeypatch):
+    import asyncio
+    import threading
+    import time
+    from app import main
+
+    events = []
+
+    class SlowHub:
+        def wake(self):
+            pass
+
+        def start(self, stop):
+            def run():
+                stop.wait()
+                time.sleep(0.05)  # finishing an in-flight request
+                events.append("worker exited")
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            return thread
+
+    monkeypatch.setattr(main.settings, "OPENAI_API_KEY", "")
+    monkeypatch.setattr(main.settings, "CHECKIN_SCHEDULER_ENABLED", False)
+    monkeypatch.setattr(main.settings, "TASK_FEED_ENABLED", True)
+    monkeypatch.setattr(main, "get_task_feed_hub", lambda: SlowHub())
+    monkeypatch.setattr(main, "close_openai_service", lambda: events.append("client closed"))
+
+    async def run_lifespan():
+        async with main.lifespan(main.app):
+            pass
+
+    asyncio.run(run_lifespan())
+    assert events == ["worker exited", "client closed"]
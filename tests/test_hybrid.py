@@ -0,0 +1,50 @@
+from typing import List
+import pytest
+from langchain.schema import BaseRetriever, Document
+from rag.hybrid import HybridRetriever, reciprocal_rank_fusion, tsvector_sql
+
+
+def task(task_id: int, text: str = "") -> Document:
+    return Document(page_content=text or f"Task {task_id}", metadata={"type": "task", "task_id": task_id})
+
+
+class FixedRetriever(BaseRetriever):
+    docs: List[Document]
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.docs
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    dense = [task(1), task(2), task(3)]
+    # Same task as dense's #2, with different text: fused by identity, not content
+    lexical = [task(4), task(2, "Task 2, as the full-text index renders it")]
+    fused = reciprocal_rank_fusion([dense, lexical], k=3, rrf_k=60)
+
+    assert [doc.metadata["task_id"] for doc in fused] == [2, 1, 4]
+    assert fused[0].metadata["score"] == pytest.approx(1 / 62 + 1 / 62)
+    assert fused[0].page_content == "Task 2"
+
+
+def test_rrf_keys_chat_chunks_by_chunk_id():
+    chunk = lambda chunk_id: Document(page_content="...", metadata={"type": "chat", "chat_id": 1, "chunk_id": chunk_id})
+    fused = reciprocal_rank_fusion([[chunk("chat:1:0-8")], [chunk("chat:1:6-14"), chunk("chat:1:0-8")]], k=5)
+    assert [doc.metadata["chunk_id"] for doc in fused] == ["chat:1:0-8", "chat:1:6-14"]
+
+
+def test_hybrid_retriever_fuses_both_sides_and_survives_lexical_failure():
+    dense = FixedRetriever(docs=[task(1), task(2)])
+    hybrid = HybridRetriever(dense=dense, lexical=lambda query, limit: [task(3), task(2)], k=2)
+    assert [doc.metadata["task_id"] for doc in hybrid.get_relevant_documents("report")] == [2, 1]
+
+    def unavailable(query, limit):
+        raise RuntimeError("websearch_to_tsquery does not exist")
+
+    fallback = HybridRetriever(dense=dense, lexical=unavailable, k=2)
+    assert [doc.metadata["task_id"] for doc in fallback.get_relevant_documents("report")] == [1, 2]
+
+
+def test_text_search_config_is_validated():
+    assert tsvector_sql("name", "english") == "to_tsvector('english'::regconfig, name)"
+    with pytest.raises(ValueError):
+        tsvector_sql("name", "english'); DROP TABLE tasks; --")
@@ -0,0 +1,82 @@
+import pytest
+from app.models.database_models import User, Task, ChatHistory, ChatChunkIndex, IndexOutbox
+from rag.indexing import OutboxIndexer
+
+
+class RecordingSink:
+    """Vector store writer that keeps upserts and deletes in memory."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.vectors = {}
+        self.deleted = []
+
+    def upsert(self, ids, docs, embeddings):
+        if self.fail:
+            raise RuntimeError("vector store unavailable")
+        self.vectors.update({i: (doc, vector) for i, doc, vector in zip(ids, docs, embeddings)})
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+        for i in ids:
+            self.vectors.pop(i, None)
+
+
+class RecordingEmbedder(list):
+    """Embedding function that records every batch it is asked for."""
+
+    def __call__(self, texts):
+        self.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture
+def user(db):
+    db.query(IndexOutbox).delete()
+    user = User(name="Index", email="index@example.com")
+    db.add(user)
+    db.commit()
+    yield user
+    db.query(IndexOutbox).delete()
+    db.query(ChatChunkIndex).delete()
+    db.query(Task).filter(Task.user_id == user.id).delete()
+    db.query(ChatHistory).filter(ChatHistory.user_id == user.id).delete()
+    db.delete(user)
+    db.commit()
+
+
+def test_task_changes_are_coalesced_and_embedded_once(db, client, user):
+    task = client.post("/api/v1/tasks", json={"name": "Draft", "user_id": user.id}).json()
+    client.put(f"/api/v1/tasks/{task['id']}", json={"name": "Draft the intro"})
+    client.put(f"/api/v1/tasks/{task['id']}", json={"description": "Two paragraphs"})
+    assert db.query(IndexOutbox).count() == 3
+
+    sink, embed = RecordingSink(), RecordingEmbedder()
+    assert OutboxIndexer(sink, embed).drain_once(db) == 3
+    assert embed == [["Draft the intro\nTwo paragraphs"]]
+    doc, vector = sink.vectors[f"task:{task['id']}"]
+    assert doc.metadata["type"] == "task" and doc.metadata["task_id"] == task["id"]
+    assert doc.metadata["user_id"] == user.id and doc.metadata["status"] == "lagging"
+    assert db.query(IndexOutbox).count() == 0
+    assert OutboxIndexer(sink, embed).drain_once(db) == 0
+
+
+def test_deleted_tasks_leave_the_index(db, client, user):
+    task = client.post("/api/v1/tasks", json={"name": "Temporary", "user_id": user.id}).json()
+    client.delete(f"/api/v1/tasks/{task['id']}")
+
+    sink, embed = RecordingSink(), RecordingEmbedder()
+    OutboxIndexer(sink, embed).drain_once(db)
+    assert sink.deleted == [f"task:{task['id']}"] and embed == []
+
+
+def test_failed_batches_are_released_for_retry(db, client, user):
+    client.post("/api/v1/tasks", json={"name": "Retry me", "user_id": user.id})
+    OutboxIndexer(RecordingSink(fail=True), RecordingEmbedder()).drain_once(db)
+
+    db.expire_all()
+    [row] = db.query(IndexOutbox).all()
+    assert row.attempts == 1 and "vector store unavailable" in row.error
+    sink = RecordingSink()
+    assert OutboxIndexer(sink, RecordingEmbedder()).drain_once(db) == 1
+    assert len(sink.vectors) == 1
@@ -0,0 +1,131 @@
+import json
+import httpx
+import pytest
+from app.models.database_models import User, QuestionnaireJob
+from app.services.job_queue import JobWorkerPool, sign_webhook, webhook_url_error
+from app.services.question_service import QuestionService
+from benchmarks.load import StubOpenAIService
+
+
+class FailingOpenAIService(StubOpenAIService):
+    def text_completion(self, prompt, **kwargs):
+        raise Exception("OpenAI API error: upstream unavailable")
+
+
+@pytest.fixture(autouse=True)
+def job_settings(monkeypatch):
+    # The tests run the workers themselves, and never resolve webhook hosts
+    monkeypatch.setattr("app.services.job_queue.settings.JOBS_EXTERNAL_WORKERS", True)
+    monkeypatch.setattr("app.services.job_queue.settings.JOBS_WEBHOOK_ALLOWED_HOSTS", "hooks.example.com")
+
+
+@pytest.fixture
+def user(db):
+    user = User(name="Jobs", email="jobs@example.com")
+    db.add(user)
+    db.commit()
+    yield user
+    db.query(QuestionnaireJob).delete()
+    db.delete(user)
+    db.commit()
+
+
+class WebhookReceiver(list):
+    """Records webhook requests instead of sending them."""
+
+    def __init__(self):
+        super().__init__()
+        self.client = httpx.Client(transport=httpx.MockTransport(self.handle))
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.append(request)
+        return httpx.Response(204)
+
+
+@pytest.fixture
+def webhooks():
+    return WebhookReceiver()
+
+
+def make_pool(openai_service, webhooks, **kwargs) -> JobWorkerPool:
+    return JobWorkerPool(QuestionService(openai_service), concurrency=1, webhook_client=webhooks.client, **kwargs)
+
+
+def queue(client, user, **extra):
+    body = {"user_id": user.id, "question_answers": {"1": "I plan my week on Sundays"}, **extra}
+    return client.post("/api/v1/jobs/process-answers", json=body)
+
+
+def test_queue_returns_202_and_worker_completes_job(client, user, webhooks, monkeypatch):
+    monkeypatch.setattr("app.services.job_queue.settings.JOBS_WEBHOOK_SECRET", "s3cret")
+    response = queue(client, user, webhook_url="https://hooks.example.com/jobs")
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["location"] == f"/api/v1/jobs/{job_id}"
+    assert client.get(f"/api/v1/jobs/{job_id}").json()["status"] == "queued"
+
+    pool = make_pool(StubOpenAIService(median_ms=1), webhooks)
+    assert pool.run_once() == "completed"
+    pool.webhook_executor.shutdown(wait=True)
+
+    job = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert job["status"] == "completed"
+    assert job["response"] and "Jobs" in job["prompt"]
+    assert job["attempts"] == 1 and job["finished_at"] and job["webhook_delivered_at"]
+
+    [delivery] = webhooks
+    assert json.loads(delivery.content)["job_id"] == job_id
+    assert delivery.headers["x-job-signature"] == sign_webhook(delivery.content, "s3cret")
+
+
+def test_claimed_job_is_not_handed_out_twice(db, client, user, webhooks):
+    queue(client, user)
+    pool = make_pool(StubOpenAIService(median_ms=1), webhooks)
+    assert len(pool.claim(db)) == 1
+    assert pool.claim(db) == []
+
+
+def test_failures_are_retried_then_fail(db, client, user, webhooks):
+    job_id = queue(client, user).json()["job_id"]
+    pool = make_pool(FailingOpenAIService(), webhooks, max_attempts=2)
+    assert pool.run_once() == "queued"
+    # Backoff keeps the job out of reach until run_after passes
+    assert pool.run_once() is None
+    db.query(QuestionnaireJob).filter(QuestionnaireJob.id == job_id).update({"run_after": None})
+    db.commit()
+    assert pool.run_once() == "failed"
+
+    job = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert job["attempts"] == 2 and "upstream unavailable" in job["error"]
+
+
+def test_expired_lease_is_reclaimed(db, client, user, webhooks):
+    job_id = queue(client, user).json()["job_id"]
+    pool = make_pool(StubOpenAIService(median_ms=1), webhooks, lease_seconds=0.001)
+    assert pool.claim(db) == [job_id]
+    # The first worker died without finishing; the job is claimed again after its lease
+    assert pool.run_once() == "completed"
+    assert client.get(f"/api/v1/jobs/{job_id}").json()["attempts"] == 2
+
+
+def test_unknown_job_and_invalid_requests(client, user):
+    assert client.get("/api/v1/jobs/999999").status_code == 404
+    assert queue(client, user, question_answers={}).status_code == 400
+    assert queue(client, user, webhook_url="ftp://example.com").status_code == 400
+
+
+def test_queueing_without_workers_is_refused(client, user, monkeypatch):
+    monkeypatch.setattr("app.services.job_queue.settings.JOBS_EXTERNAL_WORKERS", False)
+    assert queue(client, user).status_code == 503
+
+
+def test_webhooks_to_internal_or_unlisted_hosts_are_refused(client, user, monkeypatch):
+    assert webhook_url_error("https://hooks.example.com/jobs") is None
+    assert webhook_url_error("https://api.hooks.example.com/jobs") is None
+    assert "not allowed" in webhook_url_error("https://evil.example.com/jobs")
+    assert queue(client, user, webhook_url="https://evil.example.com/jobs").status_code == 400
+
+    monkeypatch.setattr("app.services.job_queue.settings.JOBS_WEBHOOK_ALLOWED_HOSTS", "")
+    for url in ("http://127.0.0.1:8000/", "http://localhost/", "http://169.254.169.254/latest", "http://10.0.0.5/", "http://[::ffff:192.168.1.1]/"):
+        assert "non-public" in webhook_url_error(url), url
+    assert webhook_url_error("http://8.8.8.8/hook") is None
@@ -0,0 +1,34 @@
+import json
+from benchmarks.load import check_slo, main, saturation_point
+
+
+def level(concurrency, throughput, p95=10.0):
+    return {"concurrency": concurrency, "throughput_ops": throughput, "scenarios": {
+        "poll_tasks": {"latency_p95_ms": p95, "latency_p99_ms": p95, "error_rate": 0.0}
+    }}
+
+
+def test_saturation_point():
+    assert saturation_point([level(1, 10), level(2, 19), level(4, 20)], 0.1) == 2
+    assert saturation_point([level(1, 10), level(2, 20)], 0.1) is None
+
+
+def test_check_slo():
+    slo = {"concurrency": 2, "min_throughput_ops": 15, "scenarios": {"poll_tasks": {"latency_p95_ms": 50}}}
+    assert check_slo([level(2, 20)], slo) == []
+    assert check_slo([level(2, 10, p95=80)], slo) == [
+        "throughput 10 ops/s < 15", "poll_tasks latency_p95_ms 80 > 50"
+    ]
+
+
+def test_short_sweep(tmp_path):
+    slo = tmp_path / "slo.json"
+    slo.write_text(json.dumps({"concurrency": 2, "scenarios": {}}))
+    output = tmp_path / "run.json"
+    assert main([
+        "--levels", "1", "2", "--duration", "0.3", "--tasks", "3", "--llm-latency-ms", "5",
+        "--slo", str(slo), "--output", str(output)
+    ]) == 0
+    run = json.loads(output.read_text())
+    assert [l["concurrency"] for l in run["levels"]] == [1, 2]
+    assert all(l["operations"] > 0 and l["error_rate"] == 0.0 for l in run["levels"])
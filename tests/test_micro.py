@@ -0,0 +1,22 @@
+import json
+from benchmarks.micro import find_regressions, main
+
+
+def test_find_regressions():
+    baseline = {"a[10]": {"min_us": 100.0}, "b[10]": {"min_us": 100.0}}
+    results = {"a[10]": {"min_us": 124.0}, "b[10]": {"min_us": 130.0}, "c[10]": {"min_us": 1.0}}
+    assert find_regressions(results, baseline, 0.25) == ["b[10]: 100.0us -> 130.0us (+30%)"]
+
+
+def test_every_case_runs(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    args = ["--sizes", "10", "--repeat", "2", "--min-time", "0.001", "--baseline", str(baseline), "--output", str(tmp_path / "run.json")]
+    assert main(args + ["--update-baseline"]) == 0
+    recorded = json.loads(baseline.read_text())["results"]
+    assert "list_tasks_response[10]" in recorded and "encode_messages[10]" in recorded
+
+    # A baseline that is far faster than reality must fail the run
+    for result in recorded.values():
+        result["min_us"] /= 100
+    baseline.write_text(json.dumps({"results": recorded}))
+    assert main(args) == 1
@@ -0,0 +1,122 @@
+import os
+import threading
+import numpy as np
+from langchain.schema import Document
+from benchmarks.retrieval import HashingEmbeddings
+from rag.numpy_store import NumpyVectorStore
+
+DOCS = {
+    "task:1": Document(page_content="water the plants", metadata={"user_id": 1, "type": "task", "status": "lagging"}),
+    "task:2": Document(page_content="call the bank about the loan", metadata={"user_id": 1, "type": "task", "status": "open"}),
+    "chat:1": Document(page_content="we talked about the bank loan", metadata={"user_id": 1, "type": "chat"}),
+    "task:3": Document(page_content="call the bank", metadata={"user_id": 2, "type": "task", "status": "lagging"}),
+}
+DOCS_BY_TEXT = {d.page_content: id_ for id_, d in DOCS.items()}
+
+
+def make_store(path=None) -> NumpyVectorStore:
+    store = NumpyVectorStore(HashingEmbeddings(), path=path)
+    store.upsert(list(DOCS), list(DOCS.values()), store.embedding.embed_documents([d.page_content for d in DOCS.values()]))
+    return store
+
+
+def test_top_k_matches_brute_force_cosine():
+    store = make_store()
+    query = store.embedding.embed_query("bank loan")
+    vectors = np.asarray(store.embedding.embed_documents([d.page_content for d in DOCS.values()]))
+    cosine = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    expected = [list(DOCS)[i] for i in np.argsort(-cosine)[:2]]
+
+    results = store.similarity_search_with_score_by_vector(query, k=2)
+    assert [DOCS_BY_TEXT[d.page_content] for d, _ in results] == expected
+    assert np.allclose([score for _, score in results], np.sort(cosine)[::-1][:2], atol=1e-5)
+
+
+def test_filters_restrict_user_and_metadata():
+    store = make_store()
+    found = store.similarity_search("call the bank", k=5, filter={"user_id": 1, "type": "task", "status": "lagging"})
+    assert [d.page_content for d in found] == ["water the plants"]
+    assert store.similarity_search("bank", k=5, filter={"user_id": 3}) == []
+    assert {d.metadata["user_id"] for d in store.similarity_search("bank", k=5, filter={"type": "task"})} == {1, 2}
+
+
+def test_flush_and_reload_round_trip(tmp_path):
+    store = make_store(str(tmp_path))
+    store.delete(["task:2"])
+    store.flush()
+    reloaded = NumpyVectorStore(HashingEmbeddings(), path=str(tmp_path))
+    for query in ("bank", "plants"):
+        assert store.similarity_search(query, k=3) == reloaded.similarity_search(query, k=3)
+
+    # Writes after a reload go to a copy, and only the latest matrix per shard is kept
+    reloaded.add_texts(["renew the passport"], metadatas=[{"user_id": 1, "type": "task"}], ids=["task:4"])
+    reloaded.flush()
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("1.") and name.endswith(".npy")]) == 1
+    assert "renew the passport" in [d.page_content for d in NumpyVectorStore(HashingEmbeddings(), path=str(tmp_path)).similarity_search("passport", k=1)]
+
+
+def test_interrupted_flush_keeps_the_previous_version(tmp_path):
+    make_store(str(tmp_path)).flush()
+    # A flush that died after writing its new matrix but before replacing the JSON
+    np.save(tmp_path / "1.deadbeef0000.npy", np.zeros((1, 8), dtype=np.float32))
+    (tmp_path / "1.json.tmp").write_text("{")
+    reloaded = NumpyVectorStore(HashingEmbeddings(), path=str(tmp_path))
+    assert len(reloaded.similarity_search("bank", k=5, filter={"user_id": 1})) == 3
+
+
+def test_generated_ids_survive_deletes():
+    store = NumpyVectorStore(HashingEmbeddings())
+    first, second = store.add_texts(["water the plants", "call the bank"])
+    store.delete([first])
+    [third] = store.add_texts(["book the dentist"])
+    assert third not in (first, second)
+    assert {d.page_content for d in store.similarity_search("bank", k=5)} == {"call the bank", "book the dentist"}
+
+
+
+def test_searches_pick_up_shards_flushed_by_another_store(tmp_path):
+    writer = make_store(str(tmp_path))
+    writer.flush()
+    reader = NumpyVectorStore(HashingEmbeddings(), path=str(tmp_path))
+
+    writer.add_texts(["renew the passport"], metadatas=[{"user_id": 2, "type": "task"}], ids=["task:4"])
+    writer.delete(["task:1"])
+    assert "renew the passport" not in [d.page_content for d in reader.similarity_search("passport", k=5)]
+    writer.flush()
+    found = [d.page_content for d in reader.similarity_search("passport", k=5)]
+    assert "renew the passport" in found and "water the plants" not in found
+
+    # Unflushed local changes are not overwritten by the file
+    reader.add_texts(["book the dentist"], metadatas=[{"user_id": 2}], ids=["task:5"])
+    writer.add_texts(["pay the rent"], metadatas=[{"user_id": 2}], ids=["task:6"])
+    writer.flush()
+    assert "book the dentist" in [d.page_content for d in reader.similarity_search("dentist", k=5, filter={"user_id": 2})]
+
+
+def test_concurrent_writes_and_searches(tmp_path):
+    store = make_store(str(tmp_path))
+    errors = []
+
+    def write(worker):
+        try:
+            for i in range(50):
+                store.add_texts([f"task {worker}-{i}"], metadatas=[{"user_id": worker}], ids=[f"task:{worker}-{i}"])
+                if i % 10 == 0:
+                    store.flush()
+        except Exception as e:
+            errors.append(e)
+
+    def search():
+        try:
+            for _ in range(50):
+                store.similarity_search("task", k=3)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in (1, 2)] + [threading.Thread(target=search) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(store.similarity_search("task", k=200)) == len(DOCS) + 100
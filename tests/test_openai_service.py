@@ -0,0 +1,95 @@
+import threading
+import time
+import pytest
+from app.config import settings
+from app.deadline import Deadline, DeadlineExceeded
+from app.services import openai_service
+from app.services.openai_service import OpenAIService, llm_hedge_wins, llm_latency, llm_prompt_tokens
+from benchmarks.openai_stub import StubUpstream
+from tests.test_openai_stub import stub_client
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(settings, "LLM_BACKOFF_BASE_SECONDS", 0.0)
+    return OpenAIService()
+
+
+def test_retries_stop_after_llm_max_retries(service, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    upstream = StubUpstream("instant", error_429=1.0)
+    service.client = stub_client(upstream)
+    with pytest.raises(Exception, match="Error code: 429"):
+        service.chat_completion(MESSAGES)
+    assert upstream.stats["injected_429"] == 3
+
+
+def test_backoff_that_would_overrun_the_deadline_is_not_slept(service, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKOFF_BASE_SECONDS", 10.0)
+    monkeypatch.setattr(openai_service.random, "uniform", lambda low, high: high)
+    upstream = StubUpstream("instant", error_429=1.0)
+    service.client = stub_client(upstream)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded, match="retrying"):
+        service.chat_completion(MESSAGES, deadline=Deadline.after(1.0))
+    assert time.monotonic() - started < 1.0
+    assert upstream.stats["injected_429"] == 1
+
+
+def test_expired_deadline_sends_nothing(service):
+    upstream = StubUpstream("instant")
+    service.client = stub_client(upstream)
+    with pytest.raises(DeadlineExceeded):
+        service.chat_completion(MESSAGES, deadline=Deadline.after(0))
+    assert upstream.stats == {}
+
+
+def test_hedge_delay_needs_samples_and_skips_streams(service, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 5)
+    model = "hedge-delay-test"
+    for _ in range(4):
+        llm_latency.observe(0.2, operation="chat", model=model)
+    assert service._hedge_delay("chat", model) is None
+
+    llm_latency.observe(0.2, operation="chat", model=model)
+    assert service._hedge_delay("chat", model) == llm_latency.quantile(settings.LLM_HEDGE_QUANTILE, operation="chat", model=model)
+    assert service._hedge_delay("chat_stream", model) is None
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", False)
+    assert service._hedge_delay("chat", model) is None
+
+
+def test_slow_call_is_hedged_and_the_faster_answer_wins(service, monkeypatch):
+    model = "hedge-race-test"
+    monkeypatch.setattr(service, "_hedge_delay", lambda operation, model: 0.05)
+    calls = []
+    lock = threading.Lock()
+
+    def request(client):
+        with lock:
+            calls.append(time.monotonic())
+            first = len(calls) == 1
+        if first:
+            time.sleep(1.0)
+            return "primary"
+        return "hedge"
+
+    wins = llm_hedge_wins.value(operation="chat", model=model)
+    started = time.monotonic()
+    assert service._call_with_budget("chat", model, Deadline.after(5.0), request) == "hedge"
+    assert time.monotonic() - started < 1.0
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.05
+    assert llm_hedge_wins.value(operation="chat", model=model) == wins + 1
+
+
+def test_text_completions_count_prompt_tokens(service):
+    service.client = stub_client(StubUpstream("instant"))
+    model = "gpt-3.5-turbo-instruct"
+    before = llm_prompt_tokens.value(operation="completion", model=model)
+    result = service.text_completion("Write a haiku about tasks", model=model, max_tokens=10)
+    assert result["usage"]["prompt_tokens"] > 0 and result["usage"]["cached_tokens"] == 0
+    assert llm_prompt_tokens.value(operation="completion", model=model) == before + result["usage"]["prompt_tokens"]
@@ -0,0 +1,77 @@
+import openai
+import pytest
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.services.openai_service import OpenAIService
+from benchmarks.openai_stub import Cassette, StubUpstream, chat_completion, create_stub_app, request_key
+
+
+def stub_client(upstream: StubUpstream) -> openai.OpenAI:
+    # TestClient is an httpx.Client, so the SDK talks to the stub in-process
+    return openai.OpenAI(api_key="stub", base_url="http://stub/v1", max_retries=0,
+                         http_client=TestClient(create_stub_app(upstream), base_url="http://stub"))
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(settings, "LLM_BACKOFF_BASE_SECONDS", 0.0)
+    service = OpenAIService()
+    service.client = stub_client(StubUpstream("instant"))
+    return service
+
+
+def test_outputs_are_deterministic(service):
+    messages = [{"role": "user", "content": "I can't focus today"}]
+    first = service.chat_completion(messages)
+    assert first["response"] == service.chat_completion(messages)["response"]
+    assert first["usage"]["completion_tokens"] > 0
+    assert service.text_completion("Summarize my week")["generated_text"]
+
+
+def test_embeddings_and_models(service):
+    vectors = service.create_embeddings(["a", "b", "a"])
+    assert len(vectors) == 3 and len(vectors[0]) == 1536
+    assert vectors[0] == vectors[2] and vectors[0] != vectors[1]
+    assert "gpt-3.5-turbo" in service.get_models()
+
+
+def test_streaming_matches_full_response():
+    client = stub_client(StubUpstream("instant"))
+    messages = [{"role": "user", "content": "hello"}]
+    streamed = "".join(
+        chunk.choices[0].delta.content or ""
+        for chunk in client.chat.completions.create(model="gpt-4o-mini", messages=messages, stream=True)
+        if chunk.choices
+    )
+    assert streamed == client.chat.completions.create(model="gpt-4o-mini", messages=messages).choices[0].message.content
+
+
+def test_stream_chat_completion(service):
+    messages = [{"role": "user", "content": "hello"}]
+    events = list(service.stream_chat_completion(messages))
+    assert [e["type"] for e in events[-2:]] == ["delta", "done"]
+    done = events[-1]
+    assert done["response"] == "".join(e["content"] for e in events[:-1])
+    assert done["response"] == service.chat_completion(messages)["response"]
+    assert done["usage"]["completion_tokens"] > 0
+
+
+def test_injected_rate_limits_are_retried(service):
+    upstream = StubUpstream("instant", error_429=0.5, seed=1)
+    service.client = stub_client(upstream)
+    for _ in range(5):
+        service.chat_completion([{"role": "user", "content": "hi"}])
+    assert upstream.stats["injected_429"] > 0
+
+
+def test_replay_serves_the_cassette(tmp_path):
+    body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "recorded"}]}
+    response = chat_completion(body)
+    response["choices"][0]["message"]["content"] = "from the cassette"
+    Cassette(str(tmp_path / "session.jsonl")).add(request_key("/chat/completions", body), "/chat/completions", body, 200, response, 0.0)
+
+    upstream = StubUpstream("instant", mode="replay", cassette=str(tmp_path / "session.jsonl"))
+    reply = stub_client(upstream).chat.completions.create(**body)
+    assert reply.choices[0].message.content == "from the cassette"
+    assert upstream.stats["replayed"] == 1
@@ -0,0 +1,42 @@
+import json
+import pytest
+from app.config import settings
+from app.tokenizer import count_tokens
+from rag.prompt_assembly import STATIC_PREFIX, PromptAssembler, style_keywords
+
+
+def test_style_keywords_render_within_the_persona_budget(monkeypatch):
+    assert style_keywords(json.dumps(["warm", "direct"])) == "warm, direct"
+    assert style_keywords(json.dumps({"tone": "calm"})) == "calm"
+    monkeypatch.setattr("rag.prompt_assembly.settings.PROMPT_BUDGET_PERSONA_TOKENS", 10)
+    assert count_tokens(style_keywords(json.dumps(["reassuring"] * 100))) <= 10
+
+
+def test_static_prefix_stays_within_the_system_budget(monkeypatch):
+    assert PromptAssembler().static_tokens == count_tokens(STATIC_PREFIX) <= settings.PROMPT_BUDGET_SYSTEM_TOKENS
+    monkeypatch.setattr("rag.prompt_assembly.settings.PROMPT_BUDGET_SYSTEM_TOKENS", 100)
+    with pytest.raises(ValueError, match="PROMPT_BUDGET_SYSTEM_TOKENS"):
+        PromptAssembler()
+
+
+def test_persona_prefix_is_shared_and_messages_run_static_to_volatile():
+    assembler = PromptAssembler()
+    first = assembler.build_messages("INTJ", "Sam", "2026-01-01T09:00:00", "- Task", "", keywords='["calm"]', user_message="hi")
+    second = assembler.build_messages("INTJ", "Alex", "2026-01-02T09:00:00", "- Other", "", keywords='["calm"]')
+    assert first[0] == second[0] and "calm" in first[0]["content"]
+    assert "Sam" in first[1]["content"] and "Sam" not in first[0]["content"]
+    assert first[-1] == {"role": "user", "content": "hi"}
+
+
+def test_precompile_uses_the_oldest_chat_style_of_a_persona(db):
+    from app.models.database_models import MBTIType, ChatStyle
+    mbti = MBTIType(persona_id="ISFP", name="Adventurer")
+    db.add(mbti)
+    db.flush()
+    db.add_all([ChatStyle(mbti_type_id=mbti.id, keywords='["gentle"]'), ChatStyle(mbti_type_id=mbti.id, keywords='["blunt"]')])
+    db.flush()
+
+    assembler = PromptAssembler()
+    assert assembler.precompile(db) >= 1
+    prefix = assembler.persona_prefix("ISFP")
+    assert "gentle" in prefix and "blunt" not in prefix
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy.orm import selectinload
+from app.models.database_models import User, Task
+from app.query_budget import QueryBudget, QueryBudgetExceeded, statement_shape
+
+
+@pytest.fixture
+def users(db):
+    for i in range(5):
+        user = User(name=f"user {i}", email=f"budget-{i}@example.com")
+        user.tasks = [Task(name=f"task {i}.{j}") for j in range(2)]
+        db.add(user)
+    db.commit()
+    yield db.query(User).filter(User.email.like("budget-%")).all()
+    for user in db.query(User).filter(User.email.like("budget-%")):
+        db.delete(user)
+    db.commit()
+
+
+def test_statement_shape_ignores_parameters():
+    assert statement_shape("SELECT * FROM tasks WHERE id = ?") == statement_shape("SELECT * FROM tasks WHERE id = 42")
+    assert statement_shape("SELECT * FROM tasks WHERE id IN (?, ?, ?)") == "SELECT * FROM tasks WHERE id IN (?)"
+
+
+def test_lazy_relationships_are_reported_as_n_plus_one(db, users):
+    db.expire_all()
+    with pytest.raises(QueryBudgetExceeded, match="likely N\\+1, 5x"):
+        with QueryBudget(max_repeats=1):
+            for user in db.query(User).filter(User.email.like("budget-%")):
+                len(user.tasks)
+
+
+def test_eager_loading_stays_within_budget(db, users):
+    db.expire_all()
+    with QueryBudget(2, max_repeats=1) as budget:
+        for user in db.query(User).options(selectinload(User.tasks)).filter(User.email.like("budget-%")):
+            len(user.tasks)
+    assert budget.count == 2
+
+
+def test_warn_mode_does_not_raise(db, users, capsys):
+    with QueryBudget(0, on_exceed="warn"):
+        db.query(User).count()
+    assert "Query budget exceeded" in capsys.readouterr().out
+
+
+@pytest.mark.query_budget(2)
+def test_list_tasks_endpoint(client, users):
+    response = client.get("/api/v1/tasks", params={"user_id": users[0].id})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+def test_get_task_endpoint(client, users, query_budget):
+    task_id = users[0].tasks[0].id
+    with query_budget(1) as budget:
+        assert client.get(f"/api/v1/tasks/{task_id}").status_code == 200
+    assert budget.count == 1
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+import pytest
+from app.models.database_models import User, TaskEvent
+from app.services.task_feed import TaskFeedHub
+from app.services.task_update_service import update_tasks
+
+
+@pytest.fixture
+def user(db):
+    user = User(name="Feed", email="feed@example.com")
+    db.add(user)
+    db.commit()
+    yield user
+    db.query(TaskEvent).delete()
+    db.delete(user)
+    db.commit()
+
+
+def events(db, user_id):
+    db.expire_all()
+    return [(e.task_id, e.version, e.deleted) for e in db.query(TaskEvent).filter(TaskEvent.user_id == user_id).order_by(TaskEvent.id)]
+
+
+def parse(message: str):
+    fields = dict(line.split(": ", 1) for line in message.strip().splitlines())
+    return fields.get("event"), json.loads(fields["data"]) if "data" in fields else None
+
+
+def test_task_writes_bump_versions_and_log_events(db, client, user):
+    task = client.post("/api/v1/tasks", json={"name": "Stretch", "user_id": user.id}).json()
+    assert task["version"] == 1
+    assert client.put(f"/api/v1/tasks/{task['id']}", json={"name": "Stretch for 10 minutes"}).json()["version"] == 2
+    assert client.put(f"/api/v1/tasks/{task['id']}/complete").json()["version"] == 3
+    assert update_tasks(db, {task["id"]: {"priority": 1}})[0]["version"] == 4
+    client.delete(f"/api/v1/tasks/{task['id']}")
+
+    assert events(db, user.id) == [(task["id"], v, False) for v in (1, 2, 3, 4)] + [(task["id"], 5, True)]
+
+
+def test_backlog_replays_only_what_can_be_replayed(db, client, user):
+    ids = [client.post("/api/v1/tasks", json={"name": f"Task {i}", "user_id": user.id}).json()["id"] for i in range(3)]
+    first, *rest = db.query(TaskEvent.id).filter(TaskEvent.user_id == user.id).order_by(TaskEvent.id).all()
+    hub = TaskFeedHub(max_pending=5)
+
+    backlog, head = hub.backlog(db, user.id, first.id)
+    assert [event["task_id"] for event in backlog] == ids[1:] and head == rest[-1].id
+    assert hub.backlog(db, user.id, None) == ([], head)
+    # More missed events than a stream may hold, or a token older than the retained log
+    assert TaskFeedHub(max_pending=1).backlog(db, user.id, first.id)[0] is None
+    db.query(TaskEvent).filter(TaskEvent.id <= first.id).delete()
+    db.commit()
+    assert hub.backlog(db, user.id, first.id - 1)[0] is None
+
+
+def test_stream_replays_then_follows_live_events(monkeypatch):
+    monkeypatch.setattr("app.services.task_feed.settings.TASK_FEED_HEARTBEAT_SECONDS", 0.05)
+    hub = TaskFeedHub(max_pending=2)
+    event = lambda event_id, user_id=7: {"id": event_id, "user_id": user_id, "task_id": 1, "version": event_id, "deleted": False}
+
+    async def scenario():
+        subscription = hub.subscribe(7)
+        stream = hub.stream(subscription, [event(4)], 4)
+        assert parse(await stream.__anext__()) == ("task", event(4))
+        assert parse(await stream.__anext__()) == ("ready", {"last_event_id": 4})
+        # Already replayed, another user's, then a new one
+        hub.publish([event(4), event(5, user_id=8), event(6)])
+        assert parse(await stream.__anext__()) == ("task", event(6))
+        assert await stream.__anext__() == ": keepalive\n\n"
+
+        hub.publish([event(7), event(8), event(9)])
+        messages = [message async for message in stream]
+        assert [parse(m)[1]["id"] for m in messages] == [7, 8]
+        assert hub._subscriptions == {}
+
+    asyncio.run(scenario())
+
+
+def test_reset_when_backlog_is_unavailable():
+    hub = TaskFeedHub()
+
+    async def scenario():
+        stream = hub.stream(hub.subscribe(7), None, 12)
+        assert parse(await stream.__anext__())[0] == "reset"
+        assert parse(await stream.__anext__()) == ("ready", {"last_event_id": 12})
+        await stream.aclose()
+        assert hub._subscriptions == {}
+
+    asyncio.run(scenario())
+
+
+def test_catch_up_publishes_events_that_commit_out_of_order(db, user, monkeypatch):
+    hub = TaskFeedHub()
+    published = []
+    monkeypatch.setattr(hub, "publish", lambda events: published.extend(e["id"] for e in events))
+    base = (db.query(TaskEvent.id).order_by(TaskEvent.id.desc()).limit(1).scalar() or 0) + 10
+    add = lambda event_id, user_id=user.id: db.add(TaskEvent(id=event_id, user_id=user_id, task_id=1, version=1, deleted=False)) or db.commit()
+
+    async def scenario():
+        hub.subscribe(user.id)
+        add(base)
+        hub.last_event_id = base
+        assert hub.catch_up() == 0
+        # base + 1 and base + 2 are still in flight when base + 3 is read
+        add(base + 3)
+        hub.catch_up()
+        add(base + 2)
+        add(base + 1, user_id=user.id + 1000)
+        hub.catch_up()
+        hub.catch_up()
+
+    asyncio.run(scenario())
+    assert published == [base + 3, base + 2]
+
+
+def test_poll_unregisters_its_listener():
+    from app.services import task_update_service
+    hub = TaskFeedHub(poll_interval=0.01)
+    stop = threading.Event()
+    listeners = len(task_update_service._listeners)
+    thread = threading.Thread(target=hub._poll, args=(stop,))
+    thread.start()
+    stop.set()
+    thread.join(5)
+    assert len(task_update_service._listeners) == listeners
@@ -0,0 +1,59 @@
+import pytest
+from app.models.database_models import User, Task, IndexOutbox, TaskEvent
+from app.services import task_update_service
+from app.services.task_update_service import TaskUpdateError, parse_task_updates, update_tasks
+
+
+@pytest.fixture
+def users(db):
+    db.query(IndexOutbox).delete()
+    db.query(TaskEvent).delete()
+    owner, other = User(name="Owner", email="owner@example.com"), User(name="Other", email="other@example.com")
+    owner.tasks = [Task(name="Read"), Task(name="Write")]
+    other.tasks = [Task(name="Not yours")]
+    db.add_all([owner, other])
+    db.commit()
+    yield owner, other
+    db.query(IndexOutbox).delete()
+    db.query(TaskEvent).delete()
+    db.delete(owner)
+    db.delete(other)
+    db.commit()
+
+
+def test_updates_are_validated_and_merged_per_task():
+    updates = parse_task_updates([
+        {"task_id": "3", "field": "priority", "value": "2"},
+        {"task_id": 3, "field": "description", "value": None},
+        {"task_id": 4, "field": "is_completed", "value": True},
+    ])
+    assert updates == {3: {"priority": 2, "description": None}, 4: {"is_completed": True}}
+
+    for bad, message in [
+        ({"task_id": 1, "field": "user_id", "value": 2}, "cannot be updated"),
+        ({"task_id": 1, "field": "name", "value": None}, "cannot be null"),
+        ({"task_id": 1, "field": "priority", "value": "high"}, "Invalid value"),
+        ({"task_id": 1, "field": "name"}, "needs task_id, field and value"),
+    ]:
+        with pytest.raises(TaskUpdateError, match=message):
+            parse_task_updates(bad)
+
+
+def test_one_statement_updates_different_fields_of_several_tasks(db, users, monkeypatch):
+    (read, write), [foreign] = users[0].tasks, users[1].tasks
+    notified = []
+    monkeypatch.setattr(task_update_service, "_listeners", [notified.append])
+
+    updates = {read.id: {"priority": 1}, write.id: {"name": "Write the summary", "is_completed": True}, foreign.id: {"priority": 5}}
+    changed = {task["id"]: task for task in update_tasks(db, updates, user_id=users[0].id)}
+
+    assert set(changed) == {read.id, write.id}
+    assert changed[read.id]["priority"] == 1 and changed[read.id]["name"] == "Read"
+    assert changed[write.id]["name"] == "Write the summary" and changed[write.id]["is_completed"]
+    assert all(task["version"] == 2 for task in changed.values())
+    assert notified == [list(changed.values())]
+
+    db.expire_all()
+    assert db.get(Task, foreign.id).priority != 5
+    assert {row.entity_id for row in db.query(IndexOutbox).filter(IndexOutbox.user_id == users[0].id)} == {read.id, write.id}
+    assert {(event.task_id, event.version) for event in db.query(TaskEvent).filter(TaskEvent.user_id == users[0].id)} == {(read.id, 2), (write.id, 2)}
@@ -0,0 +1,15 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.telemetry import instrument_engine
+
+
+def test_failed_statement_does_not_leak_its_start_time():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        assert conn.info["query_start_time"] == []
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_start_time"] == []
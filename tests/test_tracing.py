@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+import pytest
+from app.config import settings
+from app.services.openai_service import OpenAIService
+from app.tracing import InMemoryExporter, Tracer, get_tracer, parse_traceparent, set_tracer
+
+TRACEPARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+@pytest.fixture
+def spans():
+    exporter = InMemoryExporter()
+    previous = set_tracer(Tracer(exporter, sample_rate=1.0))
+    yield exporter
+    set_tracer(previous)
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(TRACEPARENT) == ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)
+    assert parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    assert parse_traceparent("garbage") is None
+
+
+def test_request_and_sql_spans_share_a_trace(client, spans):
+    response = client.get("/api/v1/tasks", params={"user_id": 1}, headers={"traceparent": TRACEPARENT})
+    assert response.status_code == 200
+
+    [root] = spans.find("GET /api/v1/tasks")
+    assert root.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert root.parent_id == "00f067aa0ba902b7"
+    assert root.attributes["http.status_code"] == 200
+    assert response.headers["traceparent"] == root.traceparent
+
+    queries = spans.find("db.query")
+    assert queries and all(q.parent_id == root.span_id for q in queries)
+
+
+def test_unsampled_traces_record_nothing(client, spans):
+    set_tracer(Tracer(spans, sample_rate=0.0))
+    client.get("/api/v1/tasks", params={"user_id": 1})
+    assert spans.spans == []
+
+
+def test_openai_span_has_token_counts(spans, monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test")
+    usage = SimpleNamespace(prompt_tokens=12, completion_tokens=5, total_tokens=17)
+    with get_tracer().trace("job"):
+        OpenAIService()._call_with_budget("chat", "gpt-test", None, lambda client: SimpleNamespace(usage=usage))
+
+    [span] = spans.find("openai.chat")
+    assert span.attributes["llm.model"] == "gpt-test"
+    assert span.attributes["llm.total_tokens"] == 17
+    assert span.parent_id == spans.find("job")[0].span_id